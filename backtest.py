@@ -0,0 +1,195 @@
+"""枢轴点回测：每个交易日用前一根K线计算 P/R1-R3/S1-S3，统计各价位的触及、反弹、突破比例，
+以及两个简单策略的收益；单只股票全程向量化计算，多只股票用进程池并行
+
+用法:
+    python backtest.py --watchlist codes.txt --start 2021-01-01 --date 2024-05-10
+    python backtest.py --all --workers 8 --output backtest.csv
+"""
+import argparse
+import concurrent.futures
+import datetime
+import sys
+
+import numpy as np
+import pandas as pd
+
+import bar_cache
+import providers
+from pivots import DEFAULT_METHOD, LEVELS, METHODS, pivot_arrays
+from scanner import load_watchlist, query_universe
+
+# 按股票累加的计数/求和字段，汇总时再换算成比例
+COUNT_FIELDS = ['days', 'touches', 'bounces', 'breaks',
+                'fade_trades', 'fade_wins', 'fade_return',
+                'breakout_trades', 'breakout_wins', 'breakout_return']
+
+
+def level_stats(bars, cost=0.0, method=DEFAULT_METHOD):
+    """bars 为按日期升序的 OHLC 表，返回 {字段: 长度为 len(LEVELS) 的数组}
+
+    - 触及：当日最高价与最低价之间包含该价位
+    - 反弹：触及后收盘仍在开盘价同一侧（开在上方视为支撑，开在下方视为压力）
+    - 突破：触及后收盘到了另一侧
+    - fade：开盘前按前一日收盘价所在一侧在该价位挂单（收在上方挂买单、下方挂卖单），
+      成交后当日收盘平仓；跳空越过价位时按开盘价成交
+    - breakout：收盘突破后顺势开仓，次日收盘平仓
+    价位按不复权价格计算；bars 有 factor 列（后复权因子）时 breakout 的收益按复权收盘价计算，
+    避免除权除息日的价格缺口算成亏损。cost 为每笔交易的往返成本（比例），从每笔收益中扣除；
+    method 见 pivots.METHODS
+    """
+    open_price = bars['open'].to_numpy(dtype=np.float64)
+    high = bars['high'].to_numpy(dtype=np.float64)
+    low = bars['low'].to_numpy(dtype=np.float64)
+    close = bars['close'].to_numpy(dtype=np.float64)
+    adjusted = close * bars['factor'].to_numpy(dtype=np.float64) if 'factor' in bars else close
+    counts = {field: np.zeros(len(LEVELS)) for field in COUNT_FIELDS}
+    if len(close) < 2:
+        return counts
+
+    # 第 t 天的价位来自第 t-1 天的K线，形状 (n-1, 7)
+    prior = pivot_arrays(high[:-1], low[:-1], close[:-1], method=method,
+                         open_price=open_price[:-1])
+    levels = np.column_stack([prior[name] for name in LEVELS])
+    prior_close = close[:-1, None]
+    open_price, high, low, close = (a[1:, None] for a in (open_price, high, low, close))
+
+    touched = (low <= levels) & (high >= levels)
+    opened_above = open_price >= levels
+    closed_above = close > levels
+    bounced = touched & (opened_above == closed_above)
+    broke = touched & (opened_above != closed_above)
+
+    # fade：挂单方向在开盘前由前一日收盘决定；低开跌破支撑（高开越过压力）时挂单按开盘价成交
+    support = prior_close >= levels
+    side = np.where(support, 1.0, -1.0)
+    filled = np.where(support, low <= levels, high >= levels)
+    entry = np.where(support, np.minimum(open_price, levels), np.maximum(open_price, levels))
+    fade = np.where(filled, side * (close / entry - 1) - cost, np.nan)
+
+    # breakout：突破当日收盘顺势开仓，次日收盘平仓，最后一天没有次日不计
+    adjusted = adjusted[1:]
+    next_return = np.append(adjusted[1:] / adjusted[:-1] - 1, np.nan)[:, None]
+    breakout = np.where(broke, np.where(closed_above, 1.0, -1.0) * next_return - cost, np.nan)
+
+    counts['days'][:] = len(levels)
+    counts['touches'] = touched.sum(axis=0).astype(np.float64)
+    counts['bounces'] = bounced.sum(axis=0).astype(np.float64)
+    counts['breaks'] = broke.sum(axis=0).astype(np.float64)
+    for name, returns in (('fade', fade), ('breakout', breakout)):
+        valid = ~np.isnan(returns)
+        counts[f'{name}_trades'] = valid.sum(axis=0).astype(np.float64)
+        counts[f'{name}_wins'] = (returns > 0).sum(axis=0).astype(np.float64)
+        counts[f'{name}_return'] = np.nansum(returns, axis=0)
+    return counts
+
+
+def summarize(counts):
+    """把累加的计数换算成比例，每个价位一行，收益为每笔平均收益（%）"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = pd.DataFrame({
+            'level': LEVELS,
+            'days': counts['days'].astype(int),
+            'touch_rate': counts['touches'] / counts['days'] * 100,
+            'bounce_rate': counts['bounces'] / counts['touches'] * 100,
+            'break_rate': counts['breaks'] / counts['touches'] * 100,
+        })
+        for name in ('fade', 'breakout'):
+            trades = counts[f'{name}_trades']
+            result[f'{name}_trades'] = trades.astype(int)
+            result[f'{name}_win_rate'] = counts[f'{name}_wins'] / trades * 100
+            result[f'{name}_avg_pct'] = counts[f'{name}_return'] / trades * 100
+    return result
+
+
+def adjust_factors(dates, factors):
+    """把除权除息日的后复权因子对齐到每根K线；第一次除权之前的因子为 1"""
+    if factors.empty:
+        return np.ones(len(dates))
+    event_dates = np.asarray(factors['date'], dtype='datetime64[D]')
+    idx = np.searchsorted(event_dates, np.asarray(dates, dtype='datetime64[D]'), side='right') - 1
+    values = factors['factor'].to_numpy(dtype=np.float64)
+    return np.where(idx >= 0, values[np.maximum(idx, 0)], 1.0)
+
+
+def backtest_symbol(code, start_date, end_date, cost=0.0, method=DEFAULT_METHOD):
+    """在工作进程中执行：取日线（走本地缓存）和复权因子，返回该股票的计数"""
+    bars = bar_cache.get_cache().get_bars(code, 'd', start_date, end_date)
+    factors = bar_cache.get_cache().get_adjust_factors(code, end_date)
+    bars = bars.assign(factor=adjust_factors(bars['date'], factors))
+    return level_stats(bars, cost, method)
+
+
+def _backtest_one(args):
+    code = args[0]
+    try:
+        return code, backtest_symbol(*args), None
+    except Exception as e:
+        return code, None, f"{code}: {e}"
+
+
+def backtest(codes, start_date, end_date, workers=4, cost=0.0, method=DEFAULT_METHOD):
+    """返回 (全部股票汇总表, {code: 单只股票计数}, 错误列表)"""
+    total = {field: np.zeros(len(LEVELS)) for field in COUNT_FIELDS}
+    per_symbol, errors = {}, []
+    tasks = [(code, start_date, end_date, cost, method) for code in codes]
+
+    def collect(outcomes):
+        for code, counts, error in outcomes:
+            if error:
+                errors.append(error)
+                continue
+            per_symbol[code] = counts
+            for field in COUNT_FIELDS:
+                total[field] += counts[field]
+
+    if workers <= 1:
+        collect(map(_backtest_one, tasks))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            collect(pool.map(_backtest_one, tasks, chunksize=16))
+    return summarize(total), per_symbol, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="回测枢轴点价位的触及、反弹、突破比例和简单策略收益")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--watchlist', help="股票代码文件，每行一个代码")
+    source.add_argument('--all', action='store_true', help="回测全部沪深A股")
+    today = datetime.date.today()
+    parser.add_argument('--start', default=(today - datetime.timedelta(days=3 * 365)).isoformat(),
+                        help="开始日期 YYYY-MM-DD，默认三年前")
+    parser.add_argument('--date', default=today.isoformat(), help="截止日期 YYYY-MM-DD，默认今天")
+    parser.add_argument('--workers', type=int, default=4, help="并发进程数")
+    parser.add_argument('--method', choices=list(METHODS), default=DEFAULT_METHOD,
+                        help="枢轴点算法")
+    parser.add_argument('--cost', type=float, default=0.0, help="每笔交易往返成本，单位 %%")
+    parser.add_argument('--by-symbol', action='store_true', help="同时输出每只股票的结果")
+    parser.add_argument('--output', help="结果写入 CSV 文件，默认输出到终端")
+    parser.add_argument('--provider', help="数据源，例如 local:fixtures/、synthetic:latency=0.1，"
+                                           "默认取环境变量 FINCE_PROVIDER 或 baostock")
+    args = parser.parse_args(argv)
+    if args.provider:
+        providers.configure(args.provider)
+
+    codes = load_watchlist(args.watchlist) if args.watchlist else query_universe(args.date)
+    result, per_symbol, errors = backtest(codes, args.start, args.date,
+                                          workers=args.workers, cost=args.cost / 100,
+                                          method=args.method)
+    for error in errors:
+        print(f"回测失败 {error}", file=sys.stderr)
+    if not per_symbol:
+        print("没有回测到数据", file=sys.stderr)
+        return 1
+    if args.by_symbol:
+        frames = [summarize(counts).assign(code=code) for code, counts in per_symbol.items()]
+        result = pd.concat([result.assign(code='ALL')] + frames, ignore_index=True)
+        result = result[['code'] + [c for c in result.columns if c != 'code']]
+    if args.output:
+        result.to_csv(args.output, index=False, encoding='utf-8-sig')
+    else:
+        print(result.to_string(index=False, float_format=lambda v: f'{v:.2f}'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""本地K线缓存：按 (code, frequency, date) 落盘，重叠区间直接读本地，只向数据源请求缺失的日期段。
+读出的K线与 columnar 的列类型一致：date 为 datetime64，价格为 float64。
+后复权因子同样按代码和日期段缓存（coverage 里的 frequency 记为 'adjust'）"""
+import datetime
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+import columnar
+import providers
+import timing
+from single_flight import SingleFlight
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'market_data.db')
+FIELDS = ['date', 'open', 'high', 'low', 'close']
+# coverage 表里复权因子使用的 frequency
+ADJUST = 'adjust'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    code TEXT NOT NULL,
+    frequency TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL, high REAL, low REAL, close REAL,
+    PRIMARY KEY (code, frequency, date)
+);
+-- 已经向服务器完整请求过的日期段（非交易日没有K线，只能靠这张表判断是否已取过）
+CREATE TABLE IF NOT EXISTS coverage (
+    code TEXT NOT NULL,
+    frequency TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_coverage ON coverage (code, frequency);
+-- 除权除息日及当日起生效的后复权因子；后复权因子不会追溯修改，缓存后不需要刷新
+CREATE TABLE IF NOT EXISTS adjust_factors (
+    code TEXT NOT NULL,
+    date TEXT NOT NULL,
+    factor REAL NOT NULL,
+    PRIMARY KEY (code, date)
+);
+"""
+
+
+def _to_date(value):
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _settled_until(frequency, today=None):
+    # 当天的日线、本周的周线还在变化，只把之前的区间记为已缓存
+    today = today or datetime.date.today()
+    if today.weekday() >= 5:
+        # 周末当周与当天的数据都已经固定
+        return today
+    if frequency == 'w':
+        return today - datetime.timedelta(days=today.weekday() + 1)
+    return today - datetime.timedelta(days=1)
+
+
+def query_provider(code, frequency, start_date, end_date):
+    return providers.get_provider().history(code, ','.join(FIELDS), frequency,
+                                            start_date, end_date)
+
+
+def query_adjust_factors(code, start_date, end_date):
+    return providers.get_provider().adjust_factors(code, start_date, end_date)
+
+
+class BarCache:
+    def __init__(self, path=DB_PATH, fetch=query_provider, fetch_adjust=query_adjust_factors):
+        self.path = path
+        self.fetch = fetch
+        self.fetch_adjust = fetch_adjust
+        self._lock = threading.Lock()
+        # 多个会话同时请求同一 (code, frequency, 日期段) 时只向数据源发一次
+        self.flight = SingleFlight()
+        # 批量扫描时多个进程会同时写同一个库，用 WAL 并放宽锁等待时间
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def _spans(self, code, frequency):
+        rows = self._conn.execute(
+            "SELECT start_date, end_date FROM coverage "
+            "WHERE code = ? AND frequency = ? ORDER BY start_date",
+            (code, frequency)).fetchall()
+        return [(_to_date(s), _to_date(e)) for s, e in rows]
+
+    def missing_ranges(self, code, frequency, start_date, end_date):
+        start, end = _to_date(start_date), _to_date(end_date)
+        with self._lock:
+            spans = self._spans(code, frequency)
+        gaps = []
+        cursor = start
+        for span_start, span_end in spans:
+            if span_end < cursor:
+                continue
+            if span_start > end:
+                break
+            if span_start > cursor:
+                gaps.append((cursor, span_start - datetime.timedelta(days=1)))
+            cursor = max(cursor, span_end + datetime.timedelta(days=1))
+            if cursor > end:
+                break
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def _store(self, code, frequency, start, end, data):
+        rows = []
+        if data is not None and not data.empty:
+            # 整列转换后再拼成行，不逐个字段调用 float()
+            data = columnar.typed_frame(data[FIELDS])
+            n = len(data)
+            rows = list(zip([code] * n, [frequency] * n,
+                            columnar.date_strings(data['date']).tolist(),
+                            *(data[column].to_numpy().tolist()
+                              for column in ('open', 'high', 'low', 'close'))))
+        settled = min(end, _settled_until(frequency))
+        with self._lock:
+            # 先删除该区间的旧数据，避免未收盘时写入的临时K线残留
+            self._conn.execute(
+                "DELETE FROM bars WHERE code = ? AND frequency = ? "
+                "AND date BETWEEN ? AND ?",
+                (code, frequency, start.isoformat(), end.isoformat()))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            if start <= settled:
+                self._add_span(code, frequency, start, settled)
+            self._conn.commit()
+
+    def _add_span(self, code, frequency, start, end):
+        # 合并重叠或相邻的区间，保证 coverage 表里每个品种只有少量记录
+        spans = self._spans(code, frequency) + [(start, end)]
+        spans.sort()
+        merged = [spans[0]]
+        for span_start, span_end in spans[1:]:
+            last_start, last_end = merged[-1]
+            if span_start <= last_end + datetime.timedelta(days=1):
+                merged[-1] = (last_start, max(last_end, span_end))
+            else:
+                merged.append((span_start, span_end))
+        self._conn.execute(
+            "DELETE FROM coverage WHERE code = ? AND frequency = ?",
+            (code, frequency))
+        self._conn.executemany(
+            "INSERT INTO coverage VALUES (?, ?, ?, ?)",
+            [(code, frequency, s.isoformat(), e.isoformat()) for s, e in merged])
+
+    def _fill_gap(self, code, frequency, gap_start, gap_end):
+        # 等待期间前一次合并的请求可能已经写入了这一段
+        if not self.missing_ranges(code, frequency, gap_start, gap_end):
+            return
+        data = self.fetch(code, frequency, gap_start.isoformat(), gap_end.isoformat())
+        with timing.span('cache_write', 'parse', frequency=frequency):
+            self._store(code, frequency, gap_start, gap_end, data)
+
+    def get_bars(self, code, frequency, start_date, end_date):
+        for gap_start, gap_end in self.missing_ranges(code, frequency,
+                                                      start_date, end_date):
+            # 只有发起者取数并写库，同时到达的请求等它完成后直接读库
+            with timing.span('fetch_bars', 'network', code=code, frequency=frequency):
+                self.flight.do((code, frequency, gap_start, gap_end),
+                               self._fill_gap, code, frequency, gap_start, gap_end)
+
+        with self._lock, timing.span('cache_read', 'parse', frequency=frequency):
+            rows = self._conn.execute(
+                "SELECT date, open, high, low, close FROM bars "
+                "WHERE code = ? AND frequency = ? AND date BETWEEN ? AND ? "
+                "ORDER BY date",
+                (code, frequency, _to_date(start_date).isoformat(),
+                 _to_date(end_date).isoformat())).fetchall()
+            return columnar.parse_rows(rows, FIELDS)
+
+    def _fill_adjust_gap(self, code, gap_start, gap_end):
+        if not self.missing_ranges(code, ADJUST, gap_start, gap_end):
+            return
+        data = self.fetch_adjust(code, gap_start.isoformat(), gap_end.isoformat())
+        rows = [(code, str(date), float(factor))
+                for date, factor in zip(data['date'], data['factor'])]
+        settled = min(gap_end, _settled_until(ADJUST))
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM adjust_factors WHERE code = ? AND date BETWEEN ? AND ?",
+                (code, gap_start.isoformat(), gap_end.isoformat()))
+            self._conn.executemany("INSERT OR REPLACE INTO adjust_factors VALUES (?, ?, ?)", rows)
+            if gap_start <= settled:
+                self._add_span(code, ADJUST, gap_start, settled)
+            self._conn.commit()
+
+    def get_adjust_factors(self, code, end_date):
+        """end_date 之前（含）全部除权除息日的后复权因子，列为 date、factor；
+        因子从上市起累计，总是从 providers.FIRST_DATE 开始取，已缓存的日期段不再请求"""
+        for gap_start, gap_end in self.missing_ranges(code, ADJUST, providers.FIRST_DATE,
+                                                      end_date):
+            with timing.span('fetch_adjust', 'network', code=code):
+                self.flight.do((code, ADJUST, gap_start, gap_end),
+                               self._fill_adjust_gap, code, gap_start, gap_end)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date, factor FROM adjust_factors WHERE code = ? AND date <= ? "
+                "ORDER BY date", (code, _to_date(end_date).isoformat())).fetchall()
+        return pd.DataFrame(rows, columns=['date', 'factor'])
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            # 离线数据源使用内存库，不和真实行情混在一起
+            _default_cache = BarCache(providers.get_provider().cache_path or DB_PATH)
+    return _default_cache
@@ -0,0 +1,118 @@
+"""检查请求合并：N 个线程（相当于 N 个 Streamlit 会话）同时查询同一只股票，
+每个 (code, frequency, 日期段) 和基本信息都应只向上游发出一次查询。
+另外让 N 个线程直接调用 BarCache.get_bars（HTTP 接口、扫描的用法），检查缓存层的合并
+
+用法:
+    python bench/bench_coalesce.py --sessions 50 --latency 0.3
+"""
+import argparse
+import collections
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import baostock as bs
+
+import bar_cache
+import stock_data
+import symbols
+import trade_calendar
+from bench_fetch import install_fake_baostock
+from bs_session import session
+
+
+def count_queries(counter):
+    """包装桩函数，按查询参数计数"""
+    history, basic = bs.query_history_k_data_plus, bs.query_stock_basic
+    lock = threading.Lock()
+
+    def query_history_k_data_plus(code, fields, start_date=None, end_date=None,
+                                  frequency='d', **kwargs):
+        with lock:
+            counter[(code, frequency, start_date, end_date)] += 1
+        return history(code, fields, start_date=start_date, end_date=end_date,
+                       frequency=frequency, **kwargs)
+
+    def query_stock_basic(code=None, **kwargs):
+        with lock:
+            counter[(code, 'basic')] += 1
+        return basic(code=code, **kwargs)
+
+    bs.query_history_k_data_plus = query_history_k_data_plus
+    bs.query_stock_basic = query_stock_basic
+
+
+def run_concurrently(sessions, func, *args):
+    barrier = threading.Barrier(sessions)
+    results, errors = [None] * sessions, []
+
+    def session_thread(i):
+        barrier.wait()
+        try:
+            results[i] = func(*args)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=session_thread, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=50, help="同时发起查询的会话数")
+    parser.add_argument('--latency', type=float, default=0.3, help="每次请求注入的延迟（秒）")
+    args = parser.parse_args(argv)
+
+    install_fake_baostock(args.latency)
+    session.keepalive_interval = 0
+    counter = collections.Counter()
+    count_queries(counter)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # 交易日历预先加载，只统计行情查询
+        trade_calendar._default_calendar = trade_calendar.TradeCalendar(
+            os.path.join(tmpdir, 'calendar.db'))
+        trade_calendar.get_calendar().trading_days('2024-05-10', 10)
+        # 代码表留空，让基本信息查询也经过合并
+        symbols._default_master = symbols.SymbolMaster(os.path.join(tmpdir, 'symbols.db'))
+        bar_cache._default_cache = bar_cache.BarCache(os.path.join(tmpdir, 'bars.db'))
+
+        results, errors, elapsed = run_concurrently(
+            args.sessions, stock_data.fetch_stock_data, '600519', '2024-05-10')
+        same = all(r is not None and r['daily'].equals(results[0]['daily'])
+                   and r['weekly'].equals(results[0]['weekly']) for r in results)
+        print(f"{args.sessions} 个会话同时 fetch_stock_data，耗时 {elapsed * 1000:.0f} ms"
+              f"（{elapsed / args.latency:.2f} x latency），合并 {stock_data._flight.shared} 个请求")
+
+        cache = bar_cache.get_cache()
+        bars, bar_errors, elapsed = run_concurrently(
+            args.sessions, cache.get_bars, 'sz.000001', 'd', '2024-04-01', '2024-05-10')
+        errors += bar_errors
+        same = same and all(b is not None and b.equals(bars[0]) for b in bars)
+        print(f"{args.sessions} 个线程同时 get_bars，耗时 {elapsed * 1000:.0f} ms"
+              f"（{elapsed / args.latency:.2f} x latency），合并 {cache.flight.shared} 个请求")
+        bar_cache._default_cache = None
+        trade_calendar._default_calendar = None
+        symbols._default_master = None
+
+    for key, count in sorted(counter.items()):
+        print(f"  {' '.join(map(str, key)):<45} 上游查询 {count} 次")
+    failed = errors or not same or any(count != 1 for count in counter.values())
+    if failed:
+        print(f"失败: 错误 {len(errors)} 个，结果一致 {same}", file=sys.stderr)
+        return 1
+    print("通过: 每个查询只发出一次，所有会话得到相同结果")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
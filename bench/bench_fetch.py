@@ -0,0 +1,129 @@
+"""对比串行与并发获取一只股票数据的耗时（baostock 用注入延迟的桩代替，不需要联网）
+
+用法:
+    python bench/bench_fetch.py --latency 0.3 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import baostock as bs
+import pandas as pd
+
+import bar_cache
+import stock_data
+import symbols
+import trade_calendar
+from bs_session import session
+
+
+class _FakeResult:
+    """只有一页数据的结果集，同时支持 get_data() 和按行读取（columnar.parse_result）"""
+    def __init__(self, data):
+        self.error_code = '0'
+        self.error_msg = ''
+        self._data = data
+        self.fields = list(data.columns)
+        self.data = data.values.tolist()
+        self.cur_row_num = 0
+
+    def next(self):
+        return self.cur_row_num < len(self.data)
+
+    def get_data(self):
+        return self._data
+
+
+def install_fake_baostock(latency):
+    def login(*args, **kwargs):
+        time.sleep(latency)
+        return _FakeResult(pd.DataFrame())
+
+    def query_stock_basic(code='', **kwargs):
+        time.sleep(latency)
+        if not code:
+            # 不指定代码时返回全部证券（代码表），含与 sz.000001 同号的指数
+            return _FakeResult(pd.DataFrame({
+                'code': ['sh.000001', 'sh.600519', 'sz.000001'],
+                'code_name': ['上证指数', '贵州茅台', '平安银行'],
+                'type': ['2', '1', '1'], 'status': ['1', '1', '1']}))
+        return _FakeResult(pd.DataFrame({'code': [code], 'code_name': ['测试股票']}))
+
+    def query_history_k_data_plus(code, fields, start_date=None, end_date=None,
+                                  frequency='d', **kwargs):
+        time.sleep(latency)
+        days = pd.bdate_range(start_date, end_date)
+        if frequency == 'w':
+            days = days[days.weekday == 4]
+        return _FakeResult(pd.DataFrame({
+            'date': days.strftime('%Y-%m-%d'),
+            'open': '10.00', 'high': '10.50', 'low': '9.80', 'close': '10.20'}))
+
+    def query_trade_dates(start_date=None, end_date=None, **kwargs):
+        time.sleep(latency)
+        days = pd.date_range(start_date, end_date)
+        return _FakeResult(pd.DataFrame({
+            'calendar_date': days.strftime('%Y-%m-%d'),
+            'is_trading_day': (days.weekday < 5).astype(int).astype(str)}))
+
+    bs.login = login
+    bs.query_trade_dates = query_trade_dates
+    bs.logout = lambda *args, **kwargs: _FakeResult(pd.DataFrame())
+    bs.query_stock_basic = query_stock_basic
+    bs.query_history_k_data_plus = query_history_k_data_plus
+
+
+def fetch_sequential(code, end_date):
+    # 修改前的做法：三个查询依次执行
+    code = stock_data.normalize_code(code)
+    end = pd.Timestamp(end_date)
+    cache = bar_cache.get_cache()
+    session.query(bs.query_stock_basic, code=code)
+    cache.get_bars(code, 'd', (end - pd.Timedelta(days=7)).strftime('%Y-%m-%d'), end_date)
+    cache.get_bars(code, 'w', (end - pd.Timedelta(days=30)).strftime('%Y-%m-%d'), end_date)
+
+
+def run(fetch, repeat, tmpdir):
+    timings = []
+    for i in range(repeat):
+        # 每次使用新的缓存库，保证每次都要请求“服务器”
+        bar_cache._default_cache = bar_cache.BarCache(os.path.join(tmpdir, f'{fetch.__name__}_{i}.db'))
+        start = time.perf_counter()
+        fetch('600519', '2024-05-10')
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.3, help="每次请求注入的延迟（秒）")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    install_fake_baostock(args.latency)
+    session.keepalive_interval = 0
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        trade_calendar._default_calendar = trade_calendar.TradeCalendar(
+            os.path.join(tmpdir, 'calendar.db'))
+        # 代码表留空，两种做法都查询基本信息
+        symbols._default_master = symbols.SymbolMaster(os.path.join(tmpdir, 'symbols.db'))
+        # 预先登录所有连接并加载交易日历，只比较查询本身的耗时
+        bar_cache._default_cache = bar_cache.BarCache(os.path.join(tmpdir, 'warmup.db'))
+        stock_data.fetch_stock_data('600519', '2024-05-10')
+        for fetch in (fetch_sequential, stock_data.fetch_stock_data):
+            timings = run(fetch, args.repeat, tmpdir)
+            print(f"{fetch.__name__:<20} median {statistics.median(timings) * 1000:8.1f} ms"
+                  f"  ({statistics.median(timings) / args.latency:.2f} x latency)")
+        bar_cache._default_cache = None
+        trade_calendar._default_calendar = None
+        symbols._default_master = None
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""测量全市场规模下一次算出全部枢轴点算法的耗时，并与逐个算法分别计算对比
+
+用法:
+    python bench/bench_pivots.py --symbols 5000 --bars 1 250 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from pivots import METHODS, pivot_arrays, pivot_family
+
+
+def make_ohlc(size, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 10 + rng.random(size) * 90
+    open_price = close * (1 + rng.normal(0, 0.01, size))
+    high = np.maximum(open_price, close) * (1 + rng.random(size) * 0.02)
+    low = np.minimum(open_price, close) * (1 - rng.random(size) * 0.02)
+    return open_price, high, low, close
+
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--bars', type=int, nargs='+', default=[1, 250])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"{'symbols x bars':>16} {'separate ms':>12} {'family ms':>10}")
+    for bars in args.bars:
+        open_price, high, low, close = make_ohlc(args.symbols * bars)
+
+        def separate():
+            for method in METHODS:
+                pivot_arrays(high, low, close, method=method, open_price=open_price)
+
+        def family():
+            pivot_family(high, low, close, open_price)
+
+        label = f'{args.symbols} x {bars}'
+        print(f"{label:>16} {time_call(separate, args.repeat) * 1000:>12.2f}"
+              f" {time_call(family, args.repeat) * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
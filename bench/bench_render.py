@@ -0,0 +1,89 @@
+"""对比逐点绘图（每个圆点、每条价位线一个 Line2D）与集合图元绘图在不同K线数量下的耗时
+
+用法:
+    python bench/bench_render.py --bars 3 30 300 3000 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from kline_chart import LABEL_LIMIT, LEVEL_STYLES, PivotChart
+from pivots import pivot_points
+
+
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 10 + np.cumsum(rng.normal(0, 0.2, n))
+    open_price = close + rng.normal(0, 0.1, n)
+    high = np.maximum(open_price, close) + rng.random(n) * 0.2
+    low = np.minimum(open_price, close) - rng.random(n) * 0.2
+    dates = pd.bdate_range('2010-01-04', periods=n).strftime('%Y-%m-%d')
+    return pivot_points(pd.DataFrame({
+        'date': dates, 'open': open_price, 'high': high, 'low': low, 'close': close}))
+
+
+def draw_per_point(ax, bars):
+    # 改造前 draw_kline 的做法：逐根K线、逐个价位调用 ax.bar/ax.plot/ax.text
+    labels = len(bars) <= LABEL_LIMIT
+    for i, row in enumerate(bars.itertuples(index=False)):
+        x = i + 1
+        color = 'red' if row.close > row.open else 'green'
+        ax.bar(x, abs(row.close - row.open), 0.15, bottom=min(row.open, row.close), color=color)
+        ax.plot([x, x], [row.low, row.high], color='black', linewidth=1)
+        for price in (row.open, row.high, row.low, row.close):
+            ax.plot(x, price, 'o', color='blue', markersize=4)
+            if labels:
+                ax.text(x + 0.1, price, f'{price:.2f}', color='blue', va='center', fontsize=8)
+        for column, label, line_color, _ in LEVEL_STYLES:
+            price = getattr(row, column)
+            ax.plot([x - 0.2, x + 0.2], [price, price], color=line_color, linestyle='--', alpha=0.5)
+            if labels:
+                ax.text(x + 0.3, price, f'{label}: {price:.2f}', color=line_color,
+                        va='center', fontsize=8)
+
+
+def draw_collections(ax, bars):
+    PivotChart(ax).update(bars)
+
+
+def time_render(draw, bars, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig = Figure(figsize=(8, 4), dpi=100)
+        canvas = FigureCanvasAgg(fig)
+        draw(fig.add_subplot(111), bars)
+        canvas.draw()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bars', type=int, nargs='+', default=[3, 30, 300, 3000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    # 预热字体缓存，避免第一次绘图的耗时算进结果
+    time_render(draw_collections, make_bars(3), 1)
+    print(f"{'bars':>6} {'per-point ms':>14} {'collections ms':>16} {'speedup':>8}")
+    for n in args.bars:
+        bars = make_bars(n)
+        legacy = time_render(draw_per_point, bars, args.repeat)
+        collections = time_render(draw_collections, bars, args.repeat)
+        print(f"{n:>6} {legacy * 1000:>14.1f} {collections * 1000:>16.1f} {legacy / collections:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""分阶段测量一次查询的耗时：登录、三个查询、get_data() 组装 DataFrame（对比 columnar 按列解析）、枢轴点计算、
+draw_kline（按显示宽度取 dpi，移动/桌面两种模式）、PNG 编码、Tk 界面的原地更新（Agg 后端）。
+数据源用注入延迟的桩代替，结果按百分位输出，并可保存为 JSON 与之前的提交对比
+
+用法:
+    python bench/bench_stages.py --bars 3 300 3000 --symbols 1 50 --json bench.json
+    python bench/bench_stages.py --compare bench.json --json bench_new.json
+
+draw_kline 需要当前目录下有 NotoSansCJK-Light.otf，没有时跳过这两个阶段
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from baostock.data.resultset import ResultData
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import bar_cache
+import columnar
+import stock_data
+import symbols
+import trade_calendar
+from bench_fetch import install_fake_baostock
+from bench_render import make_bars
+from bs_session import session
+from kline_chart import PivotChart, figure_bytes
+from pivots import pivot_points
+
+FONT_FILE = 'NotoSansCJK-Light.otf'
+PERCENTILES = (50, 90, 99)
+
+
+def stage_login(args, bars, symbols):
+    def run():
+        # 先登出再登录，测量建立一条连接的完整开销
+        session.logout()
+        session.ensure_login()
+    return run
+
+
+def stage_fetch(args, bars, symbols, tmpdir):
+    codes = [f'sh.{600000 + i}' for i in range(symbols)]
+    end_date = '2024-05-10'
+    counter = [0]
+
+    def run():
+        # 每次使用新的缓存库，保证三个查询都会发到“服务器”
+        counter[0] += 1
+        bar_cache._default_cache = bar_cache.BarCache(
+            os.path.join(tmpdir, f'fetch_{bars}_{symbols}_{counter[0]}.db'))
+        for code in codes:
+            stock_data.fetch_stock_data(code, end_date, lookback=bars)
+    return run
+
+
+def _result_sets(bars, symbols):
+    # baostock 的结果是字符串二维列表，价格是定长小数
+    frame = make_bars(bars)
+    prices = frame[['open', 'high', 'low', 'close']].to_numpy()
+    rows = [[date] + [f'{price:.4f}' for price in row]
+            for date, row in zip(frame['date'], prices)]
+    results = []
+    for _ in range(symbols):
+        rs = ResultData()
+        rs.fields = ['date', 'open', 'high', 'low', 'close']
+        results.append((rs, rows))
+    return results
+
+
+def stage_get_data(args, bars, symbols):
+    # 原来的做法：get_data() 逐行组装成字符串 DataFrame，再逐个字段 float()
+    results = _result_sets(bars, symbols)
+
+    def run():
+        for rs, data in results:
+            rs.data = list(data)
+            rs.cur_row_num = 0
+            frame = rs.get_data()
+            [(r.date, float(r.open), float(r.high), float(r.low), float(r.close))
+             for r in frame.itertuples(index=False)]
+    return run
+
+
+def stage_parse_columns(args, bars, symbols):
+    # columnar.parse_result：按列直接转换成 datetime64 / float64
+    results = _result_sets(bars, symbols)
+
+    def run():
+        for rs, data in results:
+            rs.data = list(data)
+            rs.cur_row_num = 0
+            columnar.parse_result(rs)
+    return run
+
+
+def stage_pivots(args, bars, symbols):
+    frames = [make_bars(bars, seed)[['date', 'open', 'high', 'low', 'close']]
+              for seed in range(symbols)]
+
+    def run():
+        for frame in frames:
+            pivot_points(frame)
+    return run
+
+
+def _draw_kline_stage(is_mobile):
+    def stage(args, bars, symbols):
+        import main_st
+        data = {'daily': make_bars(bars), 'weekly': make_bars(1), 'name': '测试股票',
+                'code': 'sh.600519', 'lookback': bars}
+
+        def run():
+            fig = main_st.draw_kline(data, is_mobile, bars)
+            # 与 _render_kline 相同：编码成 PNG 交给 st.image
+            figure_bytes(fig, 'png')
+        return run
+    return stage
+
+
+def stage_tk_update(args, bars, symbols):
+    # 与 main.py 相同的图表构造，换成 Agg 画布；只测量换股票时的更新和重绘
+    fig = Figure(figsize=(8, 6), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.grid(True, linestyle='--', alpha=0.3)
+    chart = PivotChart(ax)
+    frames = [make_bars(bars, seed) for seed in range(2)]
+    weekly = make_bars(1)
+    flip = [0]
+
+    def run():
+        flip[0] ^= 1
+        chart.update(frames[flip[0]], weekly, title='bench')
+        canvas.draw()
+    return run
+
+
+def percentiles(timings):
+    values = np.asarray(timings) * 1000
+    result = {f'p{p}_ms': float(np.percentile(values, p)) for p in PERCENTILES}
+    result.update(min_ms=float(values.min()), mean_ms=float(values.mean()),
+                  max_ms=float(values.max()))
+    return result
+
+
+def measure(run, repeat, warmup=1):
+    for _ in range(warmup):
+        run()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['stage'], r['bars'], r['symbols']): r for r in baseline['results']}
+    print(f"\n对比 {baseline_path}（提交 {baseline['meta'].get('commit')}），p50 变化:")
+    for row in results:
+        old = previous.get((row['stage'], row['bars'], row['symbols']))
+        if old:
+            change = (row['p50_ms'] / old['p50_ms'] - 1) * 100 if old['p50_ms'] else 0.0
+            print(f"{row['stage']:<16} {row['bars']:>6} {row['symbols']:>7}"
+                  f" {old['p50_ms']:>10.2f} -> {row['p50_ms']:>10.2f} ms ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bars', type=int, nargs='+', default=[3, 300, 3000])
+    parser.add_argument('--symbols', type=int, nargs='+', default=[1, 50])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help="桩数据源每次请求的延迟（秒）")
+    parser.add_argument('--stages', nargs='+', help="只运行指定阶段")
+    parser.add_argument('--json', help="把结果写入 JSON 文件")
+    parser.add_argument('--compare', help="与之前保存的 JSON 结果对比")
+    args = parser.parse_args(argv)
+
+    install_fake_baostock(args.latency)
+    session.keepalive_interval = 0
+    # 测试机上缺少中文字体时，逐字的缺字警告会淹没结果
+    warnings.filterwarnings('ignore', message='Glyph .* missing from')
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        trade_calendar._default_calendar = trade_calendar.TradeCalendar(
+            os.path.join(tmpdir, 'calendar.db'))
+        # 代码补全会建代码表，同样放在临时目录，不写仓库里的 market_data.db
+        symbols._default_master = symbols.SymbolMaster(os.path.join(tmpdir, 'symbols.db'))
+        # 阶段名 -> (构造函数, 是否随股票数变化, 是否随K线数变化)
+        stages = {
+            'login': (stage_login, False, False),
+            'fetch': (lambda a, b, s: stage_fetch(a, b, s, tmpdir), True, True),
+            'get_data': (stage_get_data, True, True),
+            'parse_columns': (stage_parse_columns, True, True),
+            'pivots': (stage_pivots, True, True),
+            'draw_kline_mobile': (_draw_kline_stage(True), False, True),
+            'draw_kline_pc': (_draw_kline_stage(False), False, True),
+            'tk_update': (stage_tk_update, False, True),
+        }
+        if not os.path.exists(FONT_FILE):
+            print(f"当前目录没有 {FONT_FILE}，跳过 draw_kline 阶段", file=sys.stderr)
+            del stages['draw_kline_mobile'], stages['draw_kline_pc']
+
+        results = []
+        print(f"{'stage':<18} {'bars':>6} {'symbols':>7}"
+              + ''.join(f" {'p' + str(p) + ' ms':>10}" for p in PERCENTILES))
+        for name, (build, by_symbols, by_bars) in stages.items():
+            if args.stages and name not in args.stages:
+                continue
+            # fetch 阶段要经过真实的等待时间，只取最少的组合
+            for bars in (args.bars if by_bars else [args.bars[0]]):
+                for count in (args.symbols if by_symbols else [1]):
+                    repeat = min(args.repeat, 3) if name == 'fetch' and count > 1 else args.repeat
+                    row = {'stage': name, 'bars': bars, 'symbols': count, 'repeat': repeat}
+                    row.update(percentiles(measure(build(args, bars, count), repeat)))
+                    results.append(row)
+                    print(f"{name:<18} {bars:>6} {count:>7}"
+                          + ''.join(f" {row[f'p{p}_ms']:>10.2f}" for p in PERCENTILES))
+        bar_cache._default_cache = None
+        trade_calendar._default_calendar = None
+        symbols._default_master = None
+
+    if args.compare:
+        print_comparison(results, args.compare)
+    if args.json:
+        meta = {'commit': git_commit(), 'time': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(), 'platform': platform.platform(),
+                'args': vars(args)}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
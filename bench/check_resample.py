@@ -0,0 +1,118 @@
+"""检查由日线合成的周线、月线与数据源自己的周线、月线是否一致：默认读取本地夹具目录，
+--record 时先从数据源（默认 baostock）下载日线、周线、月线和交易日历写入夹具目录。
+默认区间覆盖 2023、2024 年的国庆、春节和跨年周，tests/test_resample.py 用同一个夹具目录做比较
+
+用法:
+    python bench/check_resample.py 600519 000001 sh.000001 --fixtures fixtures/resample --record
+    python bench/check_resample.py 600519 000001 sh.000001 --fixtures fixtures/resample
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import providers
+import resample
+import trade_calendar
+from bar_cache import FIELDS
+from columnar import date_strings
+from stock_data import normalize_code
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+# 2023 年国庆到 2025 年春节：含整周休市、节前周四收盘、2024-12-30 这样跨年的周
+DEFAULT_START = '2023-09-01'
+DEFAULT_END = '2025-02-28'
+
+
+def record(codes, root, start_date, end_date):
+    """把数据源的日线、周线、月线和交易日历写成 LocalFileProvider 的目录布局"""
+    provider = providers.get_provider()
+    os.makedirs(root, exist_ok=True)
+    # 交易日历多记录到结束日期之后，用来判断最后一周、最后一个月是否已经走完
+    calendar_end = (datetime.date.fromisoformat(end_date) + datetime.timedelta(days=40)).isoformat()
+    calendar = provider.trade_dates(start_date, calendar_end)
+    calendar[calendar['is_trading_day'] == '1'][['calendar_date']].to_csv(
+        os.path.join(root, 'trade_dates.csv'), index=False)
+    for code in codes:
+        for frequency in ('d',) + tuple(resample.PERIODS):
+            data = provider.history(code, ','.join(FIELDS), frequency, start_date, end_date)
+            data = data.assign(date=date_strings(data['date']))
+            data.to_csv(os.path.join(root, f'{code}.{frequency}.csv'), index=False)
+        print(f"{code}: 已写入 {root}")
+
+
+def compare(code, period, start_date, end_date, tolerance):
+    """返回不一致的描述列表；区间开头的周期可能只有部分日线，不参与比较"""
+    provider = providers.get_provider()
+    daily = provider.history(code, ','.join(FIELDS), 'd', start_date, end_date)
+    expected = provider.history(code, ','.join(FIELDS), period, start_date, end_date)
+    actual = resample.resample_bars(daily, period, complete_only=True)
+    if actual.empty:
+        return [f"{code} {resample.PERIODS[period]}: 区间内没有日线"]
+    first = date_strings(actual['date'])[0]
+    expected = expected[date_strings(expected['date']) > first].reset_index(drop=True)
+    actual = actual[date_strings(actual['date']) > first].reset_index(drop=True)
+
+    name = f"{code} {resample.PERIODS[period]}"
+    expected_dates, actual_dates = date_strings(expected['date']), date_strings(actual['date'])
+    if not np.array_equal(expected_dates, actual_dates):
+        missing = sorted(set(expected_dates) - set(actual_dates))
+        extra = sorted(set(actual_dates) - set(expected_dates))
+        return [f"{name}: 日期不一致，缺少 {missing[:5]}，多出 {extra[:5]}"]
+    problems = []
+    for column in PRICE_COLUMNS:
+        diff = np.abs(actual[column].to_numpy() - expected[column].to_numpy())
+        bad = np.flatnonzero(diff > tolerance)
+        for i in bad[:5]:
+            problems.append(f"{name} {actual_dates[i]} {column}: 合成 {actual[column][i]:.4f}，"
+                            f"数据源 {expected[column][i]:.4f}")
+    print(f"{name}: 比较 {len(actual)} 根，{'一致' if not problems else '不一致'}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('codes', nargs='+', help="股票代码")
+    parser.add_argument('--fixtures', help="夹具目录；不指定时直接与 --provider 的数据比较")
+    parser.add_argument('--record', action='store_true', help="先从 --provider 下载夹具")
+    parser.add_argument('--provider', default='baostock', help="下载或直接比较时使用的数据源")
+    parser.add_argument('--start', default=DEFAULT_START)
+    parser.add_argument('--end', default=DEFAULT_END)
+    parser.add_argument('--tolerance', type=float, default=1e-4, help="价格允许的绝对误差")
+    args = parser.parse_args(argv)
+
+    # 代码补全查的是当前数据源的代码表，先切换数据源再补全
+    if args.record:
+        if not args.fixtures:
+            parser.error("--record 需要指定 --fixtures")
+        providers.configure(args.provider)
+        record([normalize_code(code) for code in args.codes], args.fixtures, args.start, args.end)
+    providers.configure(f'local:{args.fixtures}' if args.fixtures else args.provider)
+    codes = [normalize_code(code) for code in args.codes]
+
+    problems = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # 交易日历来自同一个数据源，不读写真实的缓存库
+        trade_calendar._default_calendar = trade_calendar.TradeCalendar(
+            os.path.join(tmpdir, 'calendar.db'))
+        for code in codes:
+            for period in resample.PERIODS:
+                problems += compare(code, period, args.start, args.end, args.tolerance)
+        trade_calendar._default_calendar = None
+
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    if problems:
+        print(f"失败: {len(problems)} 处不一致", file=sys.stderr)
+        return 1
+    print("通过: 合成的周线、月线与数据源一致")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
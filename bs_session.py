@@ -0,0 +1,177 @@
+"""进程内共享的 baostock 会话：首次查询时登录，空闲时保活，连接失效后自动重新登录
+
+baostock 客户端把连接保存在 baostock.common.context.default_socket 这个模块级变量里，
+同一进程内只能有一个连接。这里把它改成线程局部变量，再用一个小连接池管理多个已登录的连接，
+这样日线、周线、基本信息等互不依赖的查询可以在不同线程里同时进行。
+"""
+import atexit
+import datetime
+import threading
+import time
+import types
+
+import baostock as bs
+import baostock.common.context as bs_context
+
+import timing
+
+# 出现这些错误码说明登录已失效或连接已断开，需要重新登录后重试
+_RELOGIN_CODES = {
+    '10001001',  # 用户未登陆
+    '10002001', '10002002', '10002003', '10002004',
+    '10002005', '10002006', '10002007', '10002008',  # 各类网络错误
+}
+
+
+class _ThreadLocalContext(types.ModuleType):
+    _local = threading.local()
+
+    @property
+    def default_socket(self):
+        try:
+            return self._local.socket
+        except AttributeError:
+            # 让 hasattr(context, "default_socket") 返回 False，baostock 会按未登录处理
+            raise AttributeError('default_socket') from None
+
+    @default_socket.setter
+    def default_socket(self, value):
+        self._local.socket = value
+
+
+bs_context.__class__ = _ThreadLocalContext
+
+
+class _Connection:
+    def __init__(self):
+        self.socket = None
+        self.logged_in = False
+        self.last_used = 0.0
+
+
+class BaostockSession:
+    def __init__(self, max_connections=3, keepalive_interval=240):
+        self.max_connections = max_connections
+        self.keepalive_interval = keepalive_interval
+        self._cond = threading.Condition()
+        self._idle = []
+        self._all = []
+        self._keepalive_thread = None
+        atexit.register(self.logout)
+
+    @property
+    def logged_in(self):
+        return any(conn.logged_in for conn in self._all)
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and len(self._all) >= self.max_connections:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            conn = _Connection()
+            self._all.append(conn)
+            return conn
+
+    def _release(self, conn):
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @staticmethod
+    def _bind(conn):
+        # 让当前线程里的 baostock 调用使用这个连接的 socket
+        bs_context.default_socket = conn.socket
+
+    def _login(self, conn):
+        self._bind(conn)
+        with timing.span('login', 'network'):
+            rs = bs.login()
+        # login() 会新建 socket 并写入当前线程的 context
+        conn.socket = getattr(bs_context, 'default_socket', None)
+        if rs.error_code != '0':
+            conn.logged_in = False
+            raise RuntimeError(f"baostock 登录失败: {rs.error_msg}")
+        conn.logged_in = True
+        conn.last_used = time.monotonic()
+        self._start_keepalive()
+
+    def ensure_login(self):
+        conn = self._acquire()
+        try:
+            if not conn.logged_in:
+                self._login(conn)
+        finally:
+            self._release(conn)
+
+    def query(self, func, *args, parse=None, **kwargs):
+        """从连接池取一个已登录的连接执行 baostock 查询，返回完整的 DataFrame；
+        parse(rs) 用来替换默认的 rs.get_data()，例如 columnar.parse_result 直接解析成带类型的列"""
+        conn = self._acquire()
+        try:
+            if not conn.logged_in:
+                self._login(conn)
+            self._bind(conn)
+            name = f'query:{func.__name__}'
+            with timing.span(name, 'network'):
+                rs = func(*args, **kwargs)
+            if rs.error_code in _RELOGIN_CODES:
+                self._login(conn)
+                with timing.span(name, 'network', retry=True):
+                    rs = func(*args, **kwargs)
+            if rs.error_code != '0':
+                raise RuntimeError(f"baostock 查询失败: {rs.error_msg}")
+            # get_data() 可能继续翻页请求，同样要在占用连接期间完成
+            with timing.span('get_data', 'parse'):
+                data = parse(rs) if parse else rs.get_data()
+            conn.last_used = time.monotonic()
+            return data
+        finally:
+            self._release(conn)
+
+    def logout(self):
+        with self._cond:
+            connections = [conn for conn in self._idle if conn.logged_in]
+        for conn in connections:
+            conn.logged_in = False
+            try:
+                self._bind(conn)
+                bs.logout()
+            except Exception as e:
+                print(f"baostock 登出失败: {e}")
+
+    def _start_keepalive(self):
+        with self._cond:
+            if not self.keepalive_interval or self._keepalive_thread is not None:
+                return
+            self._keepalive_thread = threading.Thread(
+                target=self._keepalive_loop, name='baostock-keepalive', daemon=True)
+            self._keepalive_thread.start()
+
+    def _keepalive_loop(self):
+        while True:
+            time.sleep(self.keepalive_interval)
+            now = time.monotonic()
+            with self._cond:
+                # 只检查空闲的连接，正在查询的连接本身就是活跃的
+                stale = [conn for conn in self._idle
+                         if conn.logged_in and now - conn.last_used >= self.keepalive_interval]
+                for conn in stale:
+                    self._idle.remove(conn)
+            for conn in stale:
+                # 空闲太久时发一个轻量查询，防止服务端断开连接
+                today = datetime.date.today().isoformat()
+                try:
+                    self._bind(conn)
+                    ok = bs.query_trade_dates(start_date=today, end_date=today).error_code == '0'
+                except Exception:
+                    ok = False
+                if ok:
+                    conn.last_used = time.monotonic()
+                else:
+                    # 标记为未登录，下一次使用时重新登录
+                    conn.logged_in = False
+                self._release(conn)
+
+
+session = BaostockSession()
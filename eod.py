@@ -0,0 +1,311 @@
+"""盘后任务：收盘后为全部A股补齐当天的日线（本地K线缓存只请求缺的日期），
+算出下一交易日要用的日线、周线、月线各算法枢轴点，写入按 (代码, 交易日) 索引的表。
+两个前端和 HTTP 接口按代码查表即可，不再请求 baostock、也不重新计算。
+
+任务可以中断后重跑：每批代码的枢轴点和完成标记在同一个事务里提交，重跑时跳过已完成的代码；
+同一天重复运行结果不变。停牌的代码，以及其它代码已有当天日线而它没有的代码，用最近一根K线算出
+价位并标记完成；只有全市场都还没有当天日线（还没发布）时才不标记完成，下次运行时再补。
+
+用法:
+    python eod.py run                       # 最近一个交易日，全部沪深A股
+    python eod.py run --date 2024-05-10 --watchlist codes.txt
+    python eod.py show 600519 --session 2024-05-13
+    python eod.py status
+
+定时运行（baostock 一般在 17:30 之后更新当天数据）:
+    Windows:  schtasks /create /tn fince-eod /sc weekly /d MON,TUE,WED,THU,FRI /st 19:00 /tr "<目录>\\eod.bat run"
+    Linux:    0 19 * * 1-5  cd <目录> && python eod.py run
+"""
+import argparse
+import concurrent.futures
+import datetime
+import math
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+import bar_cache
+import providers
+import trade_calendar
+from columnar import date_string
+from pivots import DEFAULT_METHOD, LEVELS, METHODS, pivot_family
+from scanner import load_watchlist, query_trade_status
+from stock_data import last_bars, normalize_code
+
+PERIODS = ('daily', 'weekly', 'monthly')
+OHLC = ('open', 'high', 'low', 'close')
+# 每批代码一个事务，中断时最多重做一批
+BATCH_SIZE = 200
+
+_SCHEMA = """
+-- session 为这些价位适用的交易日：日线取 session 前一交易日，周线、月线取此前最近走完的一根
+CREATE TABLE IF NOT EXISTS pivot_levels (
+    code TEXT NOT NULL,
+    session TEXT NOT NULL,
+    period TEXT NOT NULL,
+    method TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL, high REAL, low REAL, close REAL,
+    pivot REAL, r1 REAL, r2 REAL, r3 REAL, s1 REAL, s2 REAL, s3 REAL,
+    PRIMARY KEY (code, session, period, method)
+) WITHOUT ROWID;
+-- 已完成的 (交易日, 代码)，重跑时跳过
+CREATE TABLE IF NOT EXISTS eod_progress (
+    trade_date TEXT NOT NULL,
+    code TEXT NOT NULL,
+    PRIMARY KEY (trade_date, code)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS eod_runs (
+    trade_date TEXT PRIMARY KEY,
+    session TEXT NOT NULL,
+    symbols INTEGER NOT NULL,
+    done INTEGER NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+"""
+
+_COLUMNS = ('date',) + OHLC + tuple(LEVELS)
+
+
+class LevelStore:
+    def __init__(self, path=bar_cache.DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def session_levels(self, code, session, method=DEFAULT_METHOD):
+        """code 在 session 这个交易日适用的 {'daily', 'weekly', 'monthly'}，各为 OHLC 和价位的字典
+        （没有的价位为 None，没有周线/月线时为 None）；盘后任务还没算到时返回 None"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT period, {', '.join(_COLUMNS)} FROM pivot_levels "
+                "WHERE code = ? AND session = ? AND method = ?", (code, session, method)).fetchall()
+        if not rows:
+            return None
+        found = {row[0]: dict(zip(_COLUMNS, row[1:])) for row in rows}
+        return {period: found.get(period) for period in PERIODS}
+
+    def done_codes(self, trade_date):
+        with self._lock:
+            return {row[0] for row in self._conn.execute(
+                "SELECT code FROM eod_progress WHERE trade_date = ?", (trade_date,))}
+
+    def write_batch(self, trade_date, rows, codes):
+        """枢轴点和完成标记在同一个事务里写入；重复写入同样的内容结果不变"""
+        placeholders = ', '.join('?' * (4 + len(_COLUMNS)))
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO pivot_levels VALUES ({placeholders})", rows)
+                self._conn.executemany("INSERT OR REPLACE INTO eod_progress VALUES (?, ?)",
+                                       [(trade_date, code) for code in codes])
+
+    def record_run(self, trade_date, session, symbols, done, started_at, finished_at=None):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO eod_runs VALUES (?, ?, ?, ?, ?, ?)",
+                                   (trade_date, session, symbols, done, started_at, finished_at))
+
+    def runs(self, limit=10):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT trade_date, session, symbols, done, started_at, finished_at "
+                "FROM eod_runs ORDER BY trade_date DESC LIMIT ?", (limit,)).fetchall()
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_store():
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = LevelStore(providers.get_provider().cache_path or bar_cache.DB_PATH)
+    return _default_store
+
+
+def _symbol_bars(args):
+    """在工作进程中执行：补齐日线并返回各周期最近一根K线的 (date, open, high, low, close)"""
+    code, trade_date = args
+    try:
+        bars = last_bars(code, trade_date)
+    except Exception as e:
+        return code, None, str(e)
+    latest = {}
+    for period, data in zip(PERIODS, bars.values()):
+        if not data.empty:
+            bar = data.iloc[-1]
+            latest[period] = (date_string(bar['date']),) + tuple(float(bar[c]) for c in OHLC)
+    return code, latest, None
+
+
+def level_rows(session, bars, methods):
+    """bars 为 [(code, {period: (date, open, high, low, close)})]，按周期一次算出所有代码、所有算法"""
+    rows = []
+    for period in PERIODS:
+        items = [(code, latest[period]) for code, latest in bars if period in latest]
+        if not items:
+            continue
+        ohlc = np.array([bar[1:] for _, bar in items], dtype=np.float64)
+        family = pivot_family(ohlc[:, 1], ohlc[:, 2], ohlc[:, 3], open_price=ohlc[:, 0],
+                              methods=methods)
+        for method, levels in family.items():
+            values = np.column_stack([levels[name] for name in LEVELS])
+            for (code, bar), level in zip(items, values.tolist()):
+                # NaN（迪马克没有的价位）存成 NULL
+                rows.append((code, session, period, method) + bar
+                            + tuple(None if math.isnan(v) else v for v in level))
+    return rows
+
+
+def run(trade_date=None, codes=None, workers=4, methods=None, store=None, batch_size=BATCH_SIZE):
+    """处理 trade_date（默认最近一个交易日）还没完成的代码，返回 (完成数, 代码总数, 错误列表)"""
+    store = store or get_store()
+    calendar = trade_calendar.get_calendar()
+    trade_date = trade_date or datetime.date.today().isoformat()
+    days = calendar.trading_days(trade_date, 1)
+    if not days:
+        raise RuntimeError(f"{trade_date} 之前没有交易日")
+    trade_date = days[-1]
+    session = calendar.next_trading_day(trade_date)
+    if session is None:
+        raise RuntimeError(f"交易日历里还没有 {trade_date} 之后的交易日")
+
+    try:
+        status_date, trading = query_trade_status(trade_date)
+    except RuntimeError:
+        # 自选列表配合没有证券列表的本地数据源时拿不到交易状态，按当天日线判断
+        status_date, trading = None, {}
+    # 当天的证券列表还没发布时用之前最近一个交易日的列表，但停牌状态按未知处理
+    codes = codes or sorted(trading)
+    if not codes:
+        raise RuntimeError(f"{trade_date} 没有可处理的代码")
+    if status_date != trade_date:
+        trading = {}
+    done = store.done_codes(trade_date)
+    pending = [code for code in codes if code not in done]
+    started_at = datetime.datetime.now().isoformat(timespec='seconds')
+    print(f"{trade_date} -> {session}: 共 {len(codes)} 个代码，已完成 {len(done & set(codes))}，"
+          f"待处理 {len(pending)}", file=sys.stderr)
+
+    # 已有代码完成说明当天日线已经发布；没有当天日线又没停牌的代码先放在 waiting 里，
+    # 确认有其它代码拿到了当天日线后按最近一根K线写入
+    published = bool(done)
+    errors, waiting, suspended, stale = [], [], 0, 0
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for i in range(0, len(pending), batch_size):
+            tasks = [(code, trade_date) for code in pending[i:i + batch_size]]
+            outcomes = pool.map(_symbol_bars, tasks, chunksize=16) if pool else map(_symbol_bars, tasks)
+            ready = []
+            for code, latest, error in outcomes:
+                if error:
+                    errors.append(f"{code}: {error}")
+                elif latest.get('daily', (None,))[0] == trade_date:
+                    published = True
+                    ready.append((code, latest))
+                elif not trading.get(code, True):
+                    suspended += 1
+                    ready.append((code, latest))
+                else:
+                    waiting.append((code, latest))
+            if published and waiting:
+                stale += len(waiting)
+                ready += waiting
+                waiting = []
+            store.write_batch(trade_date, level_rows(session, ready, methods),
+                              [code for code, _ in ready])
+            done.update(code for code, _ in ready)
+            print(f"  {min(i + batch_size, len(pending))}/{len(pending)}", file=sys.stderr)
+    finally:
+        if pool:
+            pool.shutdown()
+        completed = len(done & set(codes))
+        finished_at = datetime.datetime.now().isoformat(timespec='seconds') \
+            if completed == len(codes) else None
+        store.record_run(trade_date, session, len(codes), completed, started_at, finished_at)
+    if suspended or stale:
+        print(f"停牌 {suspended} 个、缺当天日线 {stale} 个，按最近一根K线计算", file=sys.stderr)
+    if waiting:
+        print(f"全市场都还没有 {trade_date} 的日线，{len(waiting)} 个代码稍后重跑补上",
+              file=sys.stderr)
+    return completed, len(codes), errors
+
+
+def command_run(args):
+    codes = load_watchlist(args.watchlist) if args.watchlist else None
+    start = time.perf_counter()
+    completed, total, errors = run(args.date, codes, args.workers, args.method)
+    for error in errors:
+        print(f"失败 {error}", file=sys.stderr)
+    print(f"完成 {completed}/{total}，耗时 {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    # 没有全部完成时返回非零，定时任务可以据此重试
+    return 0 if completed == total else 1
+
+
+def command_show(args):
+    code = normalize_code(args.code)
+    session = args.session or trade_calendar.get_calendar().next_trading_day(
+        datetime.date.today().isoformat())
+    levels = get_store().session_levels(code, session, args.method)
+    if not levels:
+        print(f"{code} 没有 {session} 的盘后枢轴点", file=sys.stderr)
+        return 1
+    for period, values in levels.items():
+        if values:
+            cells = [f"{name} {values[name]:.2f}" for name in LEVELS if values[name] is not None]
+            print(f"{code} {session} {period:<8}{values['date']}  " + '  '.join(cells))
+    return 0
+
+
+def command_status(args):
+    for trade_date, session, symbols, done, started_at, finished_at in get_store().runs():
+        state = f"完成于 {finished_at}" if finished_at else "未完成"
+        print(f"{trade_date} -> {session}  {done}/{symbols}  开始 {started_at}  {state}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="盘后计算下一交易日的枢轴点")
+    parser.add_argument('--provider', help="数据源，例如 local:fixtures/、synthetic:latency=0.1，"
+                                           "默认取环境变量 FINCE_PROVIDER 或 baostock")
+    parser.add_argument('--db', help="枢轴点表所在的库，默认与本地K线缓存相同")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    runner = commands.add_parser('run', help="补齐K线并计算枢轴点，可中断后重跑")
+    runner.add_argument('--date', help="交易日 YYYY-MM-DD，默认今天或之前最近的交易日")
+    runner.add_argument('--watchlist', help="只处理文件中的代码，默认全部沪深A股")
+    runner.add_argument('--workers', type=int, default=4, help="并发进程数")
+    runner.add_argument('--method', action='append', choices=list(METHODS),
+                        help="只计算指定算法，可重复指定，默认全部算法")
+    runner.set_defaults(handler=command_run)
+
+    show = commands.add_parser('show', help="查看某个代码的盘后枢轴点")
+    show.add_argument('code')
+    show.add_argument('--session', help="适用的交易日，默认下一个交易日")
+    show.add_argument('--method', choices=list(METHODS), default=DEFAULT_METHOD)
+    show.set_defaults(handler=command_show)
+
+    status = commands.add_parser('status', help="最近几次运行的进度")
+    status.set_defaults(handler=command_status)
+
+    args = parser.parse_args(argv)
+    if args.provider:
+        providers.configure(args.provider)
+    if args.db:
+        global _default_store
+        _default_store = LevelStore(args.db)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""后台取数线程：界面线程提交请求、轮询结果，新请求会取代还没完成的旧请求"""
+import queue
+import threading
+
+
+class FetchWorker:
+    def __init__(self, func):
+        self._func = func
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = None
+        self._latest_id = 0
+        self._running = None
+        # (request_id, result, error)，由界面线程取走
+        self.results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='fetch-worker', daemon=True)
+        self._thread.start()
+
+    def submit(self, *args):
+        """提交新请求并返回请求编号；尚未开始的旧请求直接丢弃"""
+        with self._lock:
+            self._latest_id += 1
+            self._pending = (self._latest_id, args)
+            self._wakeup.set()
+            return self._latest_id
+
+    def is_current(self, request_id):
+        return request_id == self._latest_id
+
+    def is_busy_with(self, *args):
+        # 最新的请求就是同样的参数且还没完成时，不必重复提交
+        with self._lock:
+            current = (self._latest_id, args)
+            return current in (self._pending, self._running)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                self._wakeup.clear()
+                item, self._pending = self._pending, None
+                if item is None:
+                    continue
+                request_id, args = item
+                self._running = item
+            try:
+                result, error = self._func(*args), None
+            except Exception as e:
+                result, error = None, e
+            # baostock 的请求无法中途打断，被取代的请求在完成后丢弃结果
+            with self._lock:
+                self._running = None
+                if request_id == self._latest_id:
+                    self.results.put((request_id, result, error))
@@ -0,0 +1,257 @@
+"""无界面的命令行与 HTTP 接口：按代码返回最近一根日线、周线和月线的枢轴点（JSON），
+与两个前端共用取数和计算逻辑，不导入 tkinter/streamlit
+
+用法:
+    python fince.py pivots 600519 --date 2024-05-10 --json
+    python fince.py pivots --file codes.txt --json --workers 8 > levels.jsonl
+    type codes.txt | python fince.py pivots --json
+    python fince.py serve --port 8080
+
+HTTP 接口:
+    GET  /pivots/600519?date=2024-05-10&method=classic
+    GET  /pivots?codes=600519,000001&date=2024-05-10
+    POST /pivots    {"codes": ["600519", "000001"], "date": "2024-05-10", "method": "classic"}
+    GET  /health
+"""
+import argparse
+import concurrent.futures
+import datetime
+import functools
+import http.server
+import json
+import math
+import sys
+import urllib.parse
+
+import eod
+import providers
+import symbols
+import trade_calendar
+from columnar import date_string
+from pivots import DEFAULT_METHOD, METHODS, calculate_pivot_points
+from stock_data import data_version, last_bars, normalize_code
+
+# 一次 HTTP 请求最多查询的代码数
+MAX_CODES_PER_REQUEST = 5000
+
+
+def _rounded(values):
+    # DeMark 等算法没有的价位是 NaN（盘后表里是 NULL），JSON 里输出 null
+    return {name: value if name == 'date' else
+            None if value is None or math.isnan(value) else round(value, 4)
+            for name, value in values.items()}
+
+
+def _bar_levels(bar, method):
+    values = {'date': date_string(bar['date'])}
+    for column in ('open', 'high', 'low', 'close'):
+        values[column] = float(bar[column])
+    values.update(calculate_pivot_points(bar['high'], bar['low'], bar['close'],
+                                         open_price=bar['open'], method=method))
+    return _rounded(values)
+
+
+def symbol_levels(code, end_date, method=DEFAULT_METHOD):
+    """end_date 当天或之前最近一根日线、已走完的周线和月线的 OHLC 和枢轴点；
+    盘后任务已经算好的直接读表，否则由同一段日线合成周线、月线后计算；没有K线时抛出 LookupError"""
+    code = normalize_code(code)
+    session = trade_calendar.get_calendar().next_trading_day(end_date)
+    stored = eod.get_store().session_levels(code, session, method) if session else None
+    if stored:
+        return {'code': code, 'method': method,
+                **{period: _rounded(values) if values else None
+                   for period, values in stored.items()}}
+    bars = last_bars(code, end_date)
+    if bars['daily'].empty:
+        raise LookupError(f"{code} 在 {end_date} 之前没有K线")
+    return {'code': code, 'method': method,
+            **{period: _bar_levels(data.iloc[-1], method) if not data.empty else None
+               for period, data in bars.items()}}
+
+
+@functools.lru_cache(maxsize=20000)
+def _cached_levels(code, end_date, method, version):
+    return symbol_levels(code, end_date, method)
+
+
+def lookup(code, end_date, method=DEFAULT_METHOD):
+    """带进程内缓存的 symbol_levels：历史日期一直命中，交易时段内按 data_version 失效；
+    失败时返回 {'code', 'error'}"""
+    try:
+        return _cached_levels(normalize_code(code), end_date, method, data_version(end_date))
+    except Exception as e:
+        return {'code': code, 'error': str(e)}
+
+
+def _lookup_task(args):
+    return lookup(*args)
+
+
+def lookup_many(codes, end_date, method=DEFAULT_METHOD, workers=4):
+    """按输入顺序逐个产出结果；多进程时每个进程有自己的 baostock 连接"""
+    tasks = [(code, end_date, method) for code in codes]
+    if workers <= 1 or len(tasks) <= 1:
+        yield from map(_lookup_task, tasks)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_lookup_task, tasks, chunksize=16)
+
+
+def read_codes(lines):
+    codes = []
+    for line in lines:
+        # 每行一个或多个代码，# 之后是注释
+        codes.extend(line.split('#')[0].replace(',', ' ').split())
+    return codes
+
+
+def _check_date(value):
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"日期格式应为 YYYY-MM-DD: {value}")
+
+
+class PivotHandler(http.server.BaseHTTPRequestHandler):
+    server_version = 'fince'
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _answer(self, codes, params):
+        try:
+            end_date = _check_date(params.get('date') or datetime.date.today().isoformat())
+            method = params.get('method') or DEFAULT_METHOD
+            if method not in METHODS:
+                raise ValueError(f"未知的算法: {method}，可选 {', '.join(METHODS)}")
+            if not codes:
+                raise ValueError("没有指定股票代码")
+            if len(codes) > MAX_CODES_PER_REQUEST:
+                raise ValueError(f"一次最多查询 {MAX_CODES_PER_REQUEST} 个代码")
+        except ValueError as e:
+            return self._send(400, {'error': str(e)})
+        results = [lookup(code, end_date, method) for code in codes]
+        if len(results) == 1 and 'error' in results[0]:
+            return self._send(404, results[0])
+        self._send(200, results[0] if len(results) == 1 else {'results': results})
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        if parts == ['health']:
+            return self._send(200, {'status': 'ok', 'provider': providers.get_provider().name})
+        if parts[:1] != ['pivots'] or len(parts) > 2:
+            return self._send(404, {'error': f"未知的路径: {url.path}"})
+        codes = parts[1:] if len(parts) == 2 else read_codes([params.get('codes', '')])
+        self._answer(codes, params)
+
+    def do_POST(self):
+        if urllib.parse.urlsplit(self.path).path.rstrip('/') != '/pivots':
+            return self._send(404, {'error': f"未知的路径: {self.path}"})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            codes = body.get('codes') or []
+            if not isinstance(codes, list):
+                raise ValueError("codes 应为代码列表")
+        except (ValueError, AttributeError) as e:
+            return self._send(400, {'error': f"请求体不是有效的 JSON: {e}"})
+        self._answer([str(code) for code in codes], body)
+
+    def log_message(self, format, *args):
+        # 默认的逐条访问日志在高频调用时会拖慢响应，只在 verbose 时输出
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(host='127.0.0.1', port=8080, verbose=False):
+    """多线程 HTTP 服务；各线程共用 bs_session 的连接池和本地K线缓存"""
+    server = http.server.ThreadingHTTPServer((host, port), PivotHandler)
+    server.verbose = verbose
+    # 代码表过期时在后台重建，代码补全交易所前缀只查本地
+    symbols.start_refresh()
+    print(f"枢轴点接口已启动: http://{host}:{server.server_address[1]}/pivots/600519", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _format_row(result):
+    if 'error' in result:
+        return f"{result['code']:<10} 错误: {result['error']}"
+    daily, weekly, monthly = result['daily'], result['weekly'] or {}, result.get('monthly') or {}
+    cells = [f"{result['code']:<10}", daily['date']]
+    for name in ('s3', 's2', 's1', 'pivot', 'r1', 'r2', 'r3'):
+        cells.append('-' if daily[name] is None else f"{daily[name]:.2f}")
+    cells.append('周P ' + ('-' if weekly.get('pivot') is None else f"{weekly['pivot']:.2f}"))
+    cells.append('月P ' + ('-' if monthly.get('pivot') is None else f"{monthly['pivot']:.2f}"))
+    return '  '.join(cells)
+
+
+def command_pivots(args):
+    codes = list(args.codes)
+    for path in args.file or []:
+        with open(path, 'r', encoding='utf-8') as f:
+            codes.extend(read_codes(f))
+    if not codes or '-' in codes:
+        codes = [code for code in codes if code != '-'] + read_codes(sys.stdin)
+    if not codes:
+        print("没有指定股票代码", file=sys.stderr)
+        return 2
+
+    failed = 0
+    for result in lookup_many(codes, args.date, args.method, args.workers):
+        failed += 'error' in result
+        if args.json:
+            # 每个代码一行 JSON，结果逐个输出，下游可以边读边处理
+            print(json.dumps(result, ensure_ascii=False, separators=(',', ':')), flush=True)
+        else:
+            print(_format_row(result))
+    return 1 if failed == len(codes) else 0
+
+
+def command_serve(args):
+    serve(args.host, args.port, args.verbose)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="枢轴点命令行工具与 HTTP 接口")
+    parser.add_argument('--provider', help="数据源，例如 local:fixtures/、synthetic:latency=0.1，"
+                                           "默认取环境变量 FINCE_PROVIDER 或 baostock")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    pivots = commands.add_parser('pivots', help="计算最近一根日线、周线和月线的枢轴点")
+    pivots.add_argument('codes', nargs='*', help="股票代码；不指定或为 - 时从标准输入读取")
+    pivots.add_argument('--file', action='append', help="代码文件，每行一个代码，可重复指定")
+    pivots.add_argument('--date', type=_check_date, default=datetime.date.today().isoformat(),
+                        help="截止日期 YYYY-MM-DD，默认今天")
+    pivots.add_argument('--method', choices=list(METHODS), default=DEFAULT_METHOD,
+                        help="枢轴点算法")
+    pivots.add_argument('--json', action='store_true', help="每个代码输出一行 JSON")
+    pivots.add_argument('--workers', type=int, default=4, help="代码较多时的并发进程数")
+    pivots.set_defaults(handler=command_pivots)
+
+    server = commands.add_parser('serve', help="启动 HTTP 接口")
+    server.add_argument('--host', default='127.0.0.1')
+    server.add_argument('--port', type=int, default=8080)
+    server.add_argument('--verbose', action='store_true', help="输出访问日志")
+    server.set_defaults(handler=command_serve)
+
+    args = parser.parse_args(argv)
+    if args.provider:
+        providers.configure(args.provider)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
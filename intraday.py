@@ -0,0 +1,193 @@
+"""分时模式：取当天 5/15/30/60 分钟K线，叠加前一交易日的枢轴点；定时刷新时只追加新K线。
+回放模式用录制下来的K线离线驱动同样的流程
+
+用法（录制一天的分钟K线，供回放使用）:
+    python intraday.py 600519 --date 2024-05-10 --frequency 5 --output 600519_0510.json
+"""
+import argparse
+import datetime
+import json
+import sys
+
+import pandas as pd
+
+import bar_cache
+import eod
+import providers
+import trade_calendar
+from columnar import date_string
+from stock_data import normalize_code
+
+MINUTE_FREQUENCIES = list(providers.MINUTE_FREQUENCIES)
+MINUTE_FIELDS = ['date', 'time', 'open', 'high', 'low', 'close']
+BAR_COLUMNS = ['time', 'open', 'high', 'low', 'close']
+# 上午 9:30-11:30、下午 13:00-15:00，各 120 分钟
+SESSIONS = (('09:30', 120), ('13:00', 120))
+# 收盘后当天的K线还没取全时，两次请求之间至少间隔的秒数
+AFTER_CLOSE_SECONDS = 600
+
+
+def session_times(frequency):
+    """一个交易日内各根分钟K线的结束时间（'HH:MM'），与 baostock 的 time 字段对齐"""
+    step = int(frequency)
+    times = []
+    for start, minutes in SESSIONS:
+        begin = datetime.datetime.strptime(start, '%H:%M')
+        for offset in range(step, minutes + 1, step):
+            times.append((begin + datetime.timedelta(minutes=offset)).strftime('%H:%M'))
+    return times
+
+
+def _empty_bars():
+    return pd.DataFrame({column: pd.Series(dtype='object' if column == 'time' else 'float64')
+                         for column in BAR_COLUMNS})
+
+
+def _normalize(data):
+    # baostock 的 time 形如 20240510093500000，只保留 HH:MM
+    if data is None or data.empty:
+        return _empty_bars()
+    time = data['time'].astype(str)
+    result = pd.DataFrame({'time': time.str[8:10] + ':' + time.str[10:12]})
+    for column in ('open', 'high', 'low', 'close'):
+        result[column] = data[column].to_numpy(dtype='float64')
+    return result
+
+
+def query_minute_bars(code, frequency, date):
+    data = providers.get_provider().history(code, ','.join(MINUTE_FIELDS), frequency, date, date)
+    return _normalize(data)
+
+
+def previous_day_bar(code, date):
+    """前一交易日的日K线 {'date', 'open', 'high', 'low', 'close'}，用来计算当天的枢轴点；
+    盘后任务已经算过这一天时直接读表"""
+    stored = eod.get_store().session_levels(code, date)
+    if stored and stored['daily']:
+        return {name: stored['daily'][name] for name in ('date', 'open', 'high', 'low', 'close')}
+    previous = trade_calendar.get_calendar().previous_trading_days(date, 1)
+    if not previous:
+        return None
+    daily = bar_cache.get_cache().get_bars(code, 'd', previous[-1], previous[-1])
+    if daily.empty:
+        return None
+    row = daily.iloc[-1]
+    return {'date': date_string(row['date']),
+            'open': float(row['open']), 'high': float(row['high']),
+            'low': float(row['low']), 'close': float(row['close'])}
+
+
+class IntradayFeed:
+    """实时数据源：poll() 返回上次之后新增（或仍在变化的最后一根）K线。
+    数据源只能按日期取整天的K线，所以当天只在可能有新K线时才请求：开盘前、午休和下一根K线
+    还没走完时不请求；上次请求没有新K线时至少等一根K线的时长，收盘后等 AFTER_CLOSE_SECONDS"""
+
+    def __init__(self, code, frequency, date, fetch=query_minute_bars):
+        self.code = normalize_code(code)
+        self.frequency = frequency
+        self.date = date
+        self.fetch = fetch
+        self.previous = None
+        self.bars = _empty_bars()
+        self.finished = False
+        self.fetched_at = None
+        self._fruitless = False
+
+    def due(self, now=None):
+        """现在请求是否可能拿到新K线；历史日期总是需要（取一次就结束）"""
+        now = now or datetime.datetime.now()
+        if self.date != now.date().isoformat():
+            return True
+        times = session_times(self.frequency)
+        last_time = self.bars['time'].iloc[-1] if len(self.bars) else ''
+        upcoming = [time for time in times if time > last_time]
+        clock = now.strftime('%H:%M')
+        if upcoming and clock < upcoming[0]:
+            return False
+        if self._fruitless:
+            wait = AFTER_CLOSE_SECONDS if clock >= times[-1] else int(self.frequency) * 60
+            return (now - self.fetched_at).total_seconds() >= wait
+        return True
+
+    def poll(self, now=None):
+        if self.previous is None:
+            self.previous = previous_day_bar(self.code, self.date)
+        now = now or datetime.datetime.now()
+        if not self.due(now):
+            return _empty_bars()
+        data = self.fetch(self.code, self.frequency, self.date)
+        self.fetched_at = now
+        self._fruitless = len(data) <= len(self.bars)
+        # 最后一根K线在走完之前还会变化，和之后的新K线一起替换
+        last_time = self.bars['time'].iloc[-1] if len(self.bars) else ''
+        new = data[data['time'] >= last_time].reset_index(drop=True)
+        kept = self.bars[self.bars['time'] < last_time]
+        self.bars = pd.concat([kept, new], ignore_index=True)
+        # 历史日期取一次就是完整的一天，不需要继续刷新
+        self.finished = self.date < now.date().isoformat() or (
+            len(self.bars) >= len(session_times(self.frequency)))
+        return new
+
+    def to_recording(self):
+        return {'code': self.code, 'frequency': self.frequency, 'date': self.date,
+                'previous': self.previous, 'bars': self.bars.to_dict('records')}
+
+
+class ReplayFeed:
+    """回放数据源：每次 poll() 按顺序吐出 step 根录制好的K线，接口与 IntradayFeed 相同"""
+
+    def __init__(self, recording, step=1):
+        self.code = recording['code']
+        self.frequency = recording['frequency']
+        self.date = recording['date']
+        self.previous = recording['previous']
+        self.step = step
+        self._recorded = pd.DataFrame(recording['bars'], columns=BAR_COLUMNS)
+        self._position = 0
+        self.bars = _empty_bars()
+        self.finished = self._recorded.empty
+
+    @classmethod
+    def load(cls, path, step=1):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), step)
+
+    def poll(self):
+        new = self._recorded.iloc[self._position:self._position + self.step].reset_index(drop=True)
+        self._position += len(new)
+        self.bars = self._recorded.iloc[:self._position]
+        self.finished = self._position >= len(self._recorded)
+        return new
+
+
+def poll_feed(feed):
+    """给后台线程用：返回 (feed, 新K线)，界面据此丢弃已切换掉的数据源的结果"""
+    return feed, feed.poll()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="录制一天的分钟K线和前一交易日K线，供分时回放使用")
+    parser.add_argument('code')
+    parser.add_argument('--date', default=datetime.date.today().isoformat(),
+                        help="日期 YYYY-MM-DD，默认今天")
+    parser.add_argument('--frequency', choices=MINUTE_FREQUENCIES, default='5', help="分钟周期")
+    parser.add_argument('--output', required=True, help="录制文件（JSON）")
+    parser.add_argument('--provider', help="数据源，例如 local:fixtures/、synthetic:latency=0.1，"
+                                           "默认取环境变量 FINCE_PROVIDER 或 baostock")
+    args = parser.parse_args(argv)
+    if args.provider:
+        providers.configure(args.provider)
+
+    feed = IntradayFeed(args.code, args.frequency, args.date)
+    feed.poll()
+    if feed.bars.empty:
+        print("没有取到分钟K线", file=sys.stderr)
+        return 1
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(feed.to_recording(), f, ensure_ascii=False)
+    print(f"已录制 {len(feed.bars)} 根K线到 {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""K线与枢轴点图：每一层只用一个图元（PolyCollection 实体、LineCollection 影线和价位线、
+一个 scatter 圆点），换股票时原地替换数据，K线数量从几根到几千根绘制耗时基本不变"""
+import io
+import math
+
+import matplotlib
+import numpy as np
+
+from columnar import date_strings
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba_array
+
+# 每根K线旁的价位：(列名, 标签, 日线颜色, 周线颜色)
+LEVEL_STYLES = [
+    ('r3', 'R3', 'red', 'darkred'),
+    ('r2', 'R2', 'red', 'darkred'),
+    ('r1', 'R1', 'red', 'darkred'),
+    ('pivot', 'P', 'black', 'purple'),
+    ('s1', 'S1', 'green', 'darkgreen'),
+    ('s2', 'S2', 'green', 'darkgreen'),
+    ('s3', 'S3', 'green', 'darkgreen'),
+]
+LEVEL_COLUMNS = [column for column, _, _, _ in LEVEL_STYLES]
+OHLC_LABELS = [('open', 'O'), ('high', 'H'), ('low', 'L'), ('close', 'C')]
+OHLC_COLUMNS = [column for column, _ in OHLC_LABELS]
+
+BAR_WIDTH = 0.15
+LEVEL_HALF_WIDTH = 0.2
+LABEL_OFFSET = 0.1
+# K线超过这个数量时不再逐根标注价格，文字是唯一随K线数线性增长的图元
+LABEL_LIMIT = 10
+MAX_TICKS = 10
+# 按显示宽度换算 dpi 时的下限，避免小图上的文字糊成一片
+MIN_DPI = 72
+
+_DAY_LEVEL_COLORS = to_rgba_array([day for _, _, day, _ in LEVEL_STYLES])
+_WEEK_LEVEL_COLORS = to_rgba_array([week for _, _, _, week in LEVEL_STYLES])
+_UP, _DOWN = to_rgba_array(['red', 'green'])
+_DAY_DOT, _WEEK_DOT = to_rgba_array(['blue', 'purple'])
+
+
+def downsample(frame, buckets):
+    """K线多于 buckets 根时把相邻K线合并成一根：开盘取第一根、最高取最大、最低取最小，
+    收盘、日期和枢轴点取桶内最后一根；buckets 一般取坐标轴的像素宽度"""
+    n = len(frame)
+    if buckets <= 0 or n <= buckets:
+        return frame
+    starts = np.unique(np.arange(buckets) * n // buckets)
+    ends = np.append(starts[1:], n) - 1
+    result = frame.iloc[ends].copy()
+    result['open'] = frame['open'].to_numpy(dtype=np.float64)[starts]
+    result['high'] = np.maximum.reduceat(frame['high'].to_numpy(dtype=np.float64), starts)
+    result['low'] = np.minimum.reduceat(frame['low'].to_numpy(dtype=np.float64), starts)
+    return result
+
+
+def _broken_segments(x0, x1, y0, y1):
+    """把 n 条线段拼成一条 (3n, 2) 的折线，线段之间用 NaN 断开，绘制时只有一条路径"""
+    points = np.full((len(x0), 3, 2), np.nan)
+    points[:, 0, 0], points[:, 0, 1] = x0, y0
+    points[:, 1, 0], points[:, 1, 1] = x1, y1
+    return points.reshape(-1, 2)
+
+
+class PivotChart:
+    def __init__(self, ax, font_size=8, marker_size=4, fontproperties=None,
+                 ohlc_va=('center', 'center', 'center', 'center'), label_limit=LABEL_LIMIT,
+                 pixels_per_bar=3):
+        self.ax = ax
+        self.pixels_per_bar = pixels_per_bar
+        self.font_size = font_size
+        self.fontproperties = fontproperties
+        self.ohlc_va = ohlc_va
+        self.label_limit = label_limit
+
+        self.bodies = ax.add_collection(PolyCollection([], linewidths=0))
+        self.wicks = ax.add_collection(LineCollection([], colors='black', linewidths=1))
+        self.levels = ax.add_collection(LineCollection([], linestyles='--', alpha=0.5))
+        self.dots = ax.scatter([], [], s=marker_size ** 2, zorder=3)
+        # 文字标注复用同一批 Text 对象，多余的隐藏
+        self._texts = []
+
+    def _text(self, index):
+        while len(self._texts) <= index:
+            text = self.ax.text(0, 0, '', ha='left', fontproperties=self.fontproperties)
+            text.set_fontsize(self.font_size)
+            self._texts.append(text)
+        return self._texts[index]
+
+    def update(self, daily, weekly=None, title=None):
+        """daily/weekly 为带枢轴点列的 DataFrame（见 pivots.pivot_points），
+        日线依次放在 x=1..n，周线只取最后一行放在最右侧；
+        日线多到每根不足 pixels_per_bar 像素时先按像素宽度合并"""
+        self.set_visible(True)
+        daily = downsample(daily, int(self.ax.bbox.width // self.pixels_per_bar))
+        frames = [daily]
+        if weekly is not None and not weekly.empty:
+            frames.append(weekly.tail(1))
+        n = sum(len(frame) for frame in frames)
+        is_weekly = np.arange(n) >= len(daily)
+
+        ohlc = np.vstack([frame[OHLC_COLUMNS].to_numpy(dtype=np.float64) for frame in frames])
+        levels = np.vstack([frame[LEVEL_COLUMNS].to_numpy(dtype=np.float64) for frame in frames])
+        open_price, high, low, close = ohlc.T
+        x = np.arange(1, n + 1, dtype=np.float64)
+
+        # 实体：每根K线一个四边形
+        bottom = np.minimum(open_price, close)
+        top = np.maximum(open_price, close)
+        left, right = x - BAR_WIDTH / 2, x + BAR_WIDTH / 2
+        self.bodies.set_verts(np.stack([
+            np.column_stack([left, bottom]), np.column_stack([left, top]),
+            np.column_stack([right, top]), np.column_stack([right, bottom])], axis=1))
+        self.bodies.set_facecolor(np.where((close > open_price)[:, None], _UP, _DOWN))
+
+        # 影线：所有竖线段连成一条用 NaN 断开的折线
+        self.wicks.set_segments([_broken_segments(x, x, low, high)])
+
+        # 价位线：同一价位（日线/周线分开）的短横线连成一条折线，最多 14 条路径
+        paths, colors = [], []
+        for mask, palette in ((~is_weekly, _DAY_LEVEL_COLORS), (is_weekly, _WEEK_LEVEL_COLORS)):
+            if not mask.any():
+                continue
+            for j in range(len(LEVEL_STYLES)):
+                y = levels[mask, j]
+                paths.append(_broken_segments(x[mask] - LEVEL_HALF_WIDTH,
+                                              x[mask] + LEVEL_HALF_WIDTH, y, y))
+                colors.append(palette[j])
+        self.levels.set_segments(paths)
+        self.levels.set_color(colors)
+
+        # OHLC 圆点：全部放进一个 scatter
+        self.dots.set_offsets(np.column_stack([np.repeat(x, 4), ohlc.ravel()]))
+        self.dots.set_color(np.where(np.repeat(is_weekly, 4)[:, None], _WEEK_DOT, _DAY_DOT))
+
+        show_labels = n <= self.label_limit
+        used = self._update_labels(x, ohlc, levels, is_weekly) if show_labels else 0
+        for text in self._texts[used:]:
+            text.set_visible(False)
+
+        # 集合类图元不参与 relim，按数据直接算坐标范围
+        # 部分算法（迪马克）只有一档支撑/压力，缺失的价位为 NaN
+        y_min = np.nanmin(np.fmin(low, np.nanmin(levels, axis=1))) if n else 0
+        y_max = np.nanmax(np.fmax(high, np.nanmax(levels, axis=1))) if n else 1
+        margin = (y_max - y_min) * 0.05 or 1
+        self.ax.set_ylim(y_min - margin, y_max + margin)
+        # 有标注时右侧留出空间显示价位标签
+        self.ax.set_xlim(0.2 if show_labels else 0.5, n + (1.0 if show_labels else 0.5))
+
+        dates = date_strings(daily['date']).tolist()
+        if len(frames) > 1:
+            dates.append('周K线')
+        step = max(1, math.ceil(n / MAX_TICKS))
+        ticks = list(range(n - 1, -1, -step))[::-1]
+        self.ax.set_xticks([x[i] for i in ticks])
+        self.ax.set_xticklabels([dates[i] for i in ticks], rotation=0)
+        if title is not None:
+            self.ax.set_title(title, fontproperties=self.fontproperties or 'SimHei')
+
+    def set_visible(self, visible):
+        # 与分时图共用一个坐标轴时，切换模式只隐藏另一套图元
+        for artist in (self.bodies, self.wicks, self.levels, self.dots):
+            artist.set_visible(visible)
+        if not visible:
+            for text in self._texts:
+                text.set_visible(False)
+
+    def _update_labels(self, x, ohlc, levels, is_weekly):
+        index = 0
+        for i in range(len(x)):
+            weekly = is_weekly[i]
+            dot_color = 'purple' if weekly else 'blue'
+            for (column, label), price, va in zip(OHLC_LABELS, ohlc[i], self.ohlc_va):
+                # 周线标注带 W 前缀，日线只标价格
+                text = self._text(index)
+                text.set_text(f'W{label}: {price:.2f}' if weekly else f'{price:.2f}')
+                text.set_position((x[i] + LABEL_OFFSET, price))
+                text.set_color(dot_color)
+                text.set_va(va)
+                text.set_visible(True)
+                index += 1
+            for (column, label, day_color, week_color), price in zip(LEVEL_STYLES, levels[i]):
+                if np.isnan(price):
+                    continue
+                text = self._text(index)
+                text.set_text(f"{'W' if weekly else ''}{label}: {price:.2f}")
+                text.set_position((x[i] + LEVEL_HALF_WIDTH + LABEL_OFFSET, price))
+                text.set_color(week_color if weekly else day_color)
+                text.set_va('center')
+                text.set_visible(True)
+                index += 1
+        return index
+
+
+class IntradayChart:
+    """分时图：当天收盘价折线叠加前一交易日的枢轴点水平线。
+    横轴按交易时段固定为整天的K线位置，追加K线时只更新折线数据，不重建图元"""
+
+    def __init__(self, ax, font_size=8, fontproperties=None):
+        self.ax = ax
+        self.font_size = font_size
+        self.fontproperties = fontproperties
+        self.price_line, = ax.plot([], [], color='blue', linewidth=1.2, zorder=3)
+        self.levels = ax.add_collection(LineCollection([], linestyles='--', alpha=0.5))
+        self._level_texts = []
+        for _, _, color, _ in LEVEL_STYLES:
+            text = ax.text(0, 0, '', ha='left', va='center', color=color,
+                           fontproperties=fontproperties)
+            text.set_fontsize(font_size)
+            self._level_texts.append(text)
+        self._slots = {}
+        self._times = []
+        self._close = np.empty(0)
+        self._low = np.empty(0)
+        self._high = np.empty(0)
+        self._level_values = np.empty(0)
+        self.set_visible(False)
+
+    def set_visible(self, visible):
+        self.price_line.set_visible(visible)
+        self.levels.set_visible(visible)
+        for text in self._level_texts:
+            text.set_visible(visible and bool(text.get_text()))
+
+    def reset(self, times, levels=None, title=None):
+        """开始新的一天：times 为当天各根K线的时间（见 intraday.session_times），
+        levels 为 {价位列名: 价格}，缺失或为 NaN 的价位不画"""
+        self._slots = {time: i + 1 for i, time in enumerate(times)}
+        self._times, self._close = [], np.empty(0)
+        self._low, self._high = np.empty(0), np.empty(0)
+        self.price_line.set_data([], [])
+        n = len(times)
+        self.ax.set_xlim(0.5, n + 0.5 + max(1, n // 8))
+
+        paths, colors, values = [], [], []
+        for (column, label, color, _), text in zip(LEVEL_STYLES, self._level_texts):
+            price = (levels or {}).get(column, np.nan)
+            if np.isnan(price):
+                text.set_text('')
+                continue
+            paths.append([(0.5, price), (n + 0.5, price)])
+            colors.append(color)
+            values.append(price)
+            text.set_text(f'{label}: {price:.2f}')
+            text.set_position((n + 0.5 + LABEL_OFFSET, price))
+        self.levels.set_segments(paths)
+        self.levels.set_color(colors)
+        self._level_values = np.array(values, dtype=np.float64)
+
+        step = max(1, math.ceil(n / MAX_TICKS))
+        ticks = list(range(n - 1, -1, -step))[::-1]
+        self.ax.set_xticks([i + 1 for i in ticks])
+        self.ax.set_xticklabels([times[i] for i in ticks], rotation=0)
+        if title is not None:
+            self.ax.set_title(title, fontproperties=self.fontproperties or 'SimHei')
+        self._update_ylim()
+        self.set_visible(True)
+
+    def append(self, bars):
+        """追加新K线（含 time/high/low/close 列）；与已有K线时间相同或更晚的部分会被替换"""
+        if bars is None or len(bars) == 0:
+            return
+        times = [str(time) for time in bars['time']]
+        keep = len(self._times)
+        while keep and self._times[keep - 1] >= times[0]:
+            keep -= 1
+        self._times = self._times[:keep] + times
+        self._close = np.concatenate([self._close[:keep], bars['close'].to_numpy(dtype=np.float64)])
+        self._low = np.concatenate([self._low[:keep], bars['low'].to_numpy(dtype=np.float64)])
+        self._high = np.concatenate([self._high[:keep], bars['high'].to_numpy(dtype=np.float64)])
+        x = np.array([self._slots.get(time, np.nan) for time in self._times], dtype=np.float64)
+        self.price_line.set_data(x, self._close)
+        self._update_ylim()
+
+    def _update_ylim(self):
+        values = np.concatenate([self._low, self._high, self._level_values])
+        if not len(values):
+            return
+        y_min, y_max = np.nanmin(values), np.nanmax(values)
+        margin = (y_max - y_min) * 0.05 or 1
+        self.ax.set_ylim(y_min - margin, y_max + margin)
+
+
+def dpi_for_width(figure_width, pixels):
+    """让 figure_width 英寸宽的图正好渲染成 pixels 像素宽，不再固定用 400 dpi"""
+    return max(MIN_DPI, pixels / figure_width)
+
+
+def figure_bytes(fig, fmt='png'):
+    """把图渲染成 PNG（PIL 优化压缩）或 SVG（文字转成路径，浏览器不需要中文字体）的字节"""
+    buffer = io.BytesIO()
+    if fmt == 'svg':
+        with matplotlib.rc_context({'svg.fonttype': 'path'}):
+            fig.savefig(buffer, format='svg', bbox_inches='tight')
+    else:
+        fig.savefig(buffer, format='png', bbox_inches='tight', pil_kwargs={'optimize': True})
+    return buffer.getvalue()
@@ -5,11 +5,19 @@ from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg,
                                              NavigationToolbar2Tk)
 import matplotlib.pyplot as plt
 import ctypes  # 添加这行
-import baostock as bs
 import datetime
-from tkinter import messagebox
+from tkinter import messagebox, filedialog
 import os
 import json
+import queue
+import pandas as pd
+import intraday
+import pivots
+import stock_data
+import symbols
+import timing
+from fetch_worker import FetchWorker
+from kline_chart import IntradayChart, PivotChart
 # 在创建窗口之前添加这两行
 try:
     ctypes.windll.shcore.SetProcessDpiAwareness(1)
@@ -63,12 +71,27 @@ def on_select_stock(event):
         index = selection[0]
         selected_stock = stock_history[index]
         stock_code_entry.delete(0, tk.END)
-        stock_code_entry.insert(0, selected_stock['code'].replace('sh.', '').replace('sz.', ''))
+        # 保留交易所前缀，同号的指数和股票（如 sh.000001 与 sz.000001）不会混淆
+        stock_code_entry.insert(0, selected_stock['code'])
         get_stock_data()
 
 # 加载历史记录
 stock_history = load_stock_list()
 
+def format_price(value):
+    # 迪马克等算法只有一档支撑/压力，缺失的价位显示为 -
+    return '-' if value != value else f"{value:.2f}"
+
+def selected_method():
+    return METHOD_NAMES.get(method_combo.get(), pivots.DEFAULT_METHOD)
+
+def on_method_change(event=None):
+    # 切换算法后重画当前股票；没有股票时按输入框重新计算
+    if _last_data is not None:
+        show_stock_data(_last_data)
+    elif close_entry.get():
+        calculate_pivot_points()
+
 def calculate_pivot_points():
     try:
         high = float(high_entry.get())
@@ -76,292 +99,142 @@ def calculate_pivot_points():
         close = float(close_entry.get())
         open_price = float(open_entry.get())
         
-        # 计算枢轴点
-        pivot = (high + low + close) / 3
-        
-        # 计算支撑位和压力位
-        s1 = (2 * pivot) - high
-        s2 = pivot - (high - low)
-        s3 = low - 2 * (high - pivot)
-        r1 = (2 * pivot) - low
-        r2 = pivot + (high - low)
-        r3 = high + 2 * (pivot - low)
+        # 计算枢轴点及支撑位和压力位
+        pp = pivots.calculate_pivot_points(high, low, close, open_price, method=selected_method())
+        pivot, r1, r2, r3 = pp['pivot'], pp['r1'], pp['r2'], pp['r3']
+        s1, s2, s3 = pp['s1'], pp['s2'], pp['s3']
         
         # 更新标签
-        pivot_label.config(text=f"枢轴点(P): {pivot:.2f}")
-        r1_label.config(text=f"压力位1(R1): {r1:.2f}")
-        r2_label.config(text=f"压力位2(R2): {r2:.2f}")
-        r3_label.config(text=f"压力位3(R3): {r3:.2f}")
-        s1_label.config(text=f"支撑位1(S1): {s1:.2f}")
-        s2_label.config(text=f"支撑位2(S2): {s2:.2f}")
-        s3_label.config(text=f"支撑位3(S3): {s3:.2f}")
-        
-        # 清除旧图
-        ax.clear()
-        
-        # 绘制K线图
-        width = 0.6
-        if close > open_price:
-            color = 'red'
-        else:
-            color = 'green'
-            
-        # 绘制实体部分
-        ax.bar(1, close - open_price, width, bottom=min(open_price, close), color=color)
-        # 绘制上下影线
-        ax.plot([1, 1], [low, high], color='black', linewidth=1)
+        pivot_label.config(text=f"枢轴点(P): {format_price(pivot)}")
+        r1_label.config(text=f"压力位1(R1): {format_price(r1)}")
+        r2_label.config(text=f"压力位2(R2): {format_price(r2)}")
+        r3_label.config(text=f"压力位3(R3): {format_price(r3)}")
+        s1_label.config(text=f"支撑位1(S1): {format_price(s1)}")
+        s2_label.config(text=f"支撑位2(S2): {format_price(s2)}")
+        s3_label.config(text=f"支撑位3(S3): {format_price(s3)}")
         
-        # 绘制支撑位和压力位
-        lines = [
-            (r3, 'R3', 'red'),
-            (r2, 'R2', 'red'),
-            (r1, 'R1', 'red'),
-            (pivot, 'P', 'black'),
-            (s1, 'S1', 'green'),
-            (s2, 'S2', 'green'),
-            (s3, 'S3', 'green')
-        ]
-        
-        for price, label, color in lines:
-            ax.axhline(y=price, color=color, linestyle='--', alpha=0.5)
-            ax.text(1.2, price, f'{label}: {price:.2f}', color=color)
-        
-        # 设置图表范围和标签
-        ax.set_xlim(0.5, 1.5)
-        ax.set_ylim(min(low, s3) * 0.99, max(high, r3) * 1.01)
-        ax.set_title('股票价格与枢轴点')
-        ax.set_ylabel('价格')
-        ax.grid(True, linestyle='--', alpha=0.3)
-        
-        # 更新画布
-        canvas.draw()
+        # 原地更新图表
+        stop_intraday()
+        bar = pivots.pivot_points(pd.DataFrame([{
+            'date': '', 'open': open_price, 'high': high, 'low': low, 'close': close}]),
+            method=selected_method())
+        chart.update(bar, title='股票价格与枢轴点')
+        canvas.draw_idle()
         
     except ValueError:
         print("请输入有效的数字")
 
+def traced(name, func):
+    """后台线程里的调用记录到新的 trace，返回 (结果, trace)；trace 在界面重绘完成后结束"""
+    def run(*args):
+        trace = timing.Trace(name)
+        with timing.resume(trace):
+            return func(*args), trace
+    return run
+
+# 取数放到后台线程，界面线程通过 root.after 轮询结果，避免窗口卡住
+fetch_worker = FetchWorker(traced('show_stock', stock_data.fetch_stock_data))
+FETCH_DEBOUNCE_MS = 250
+FETCH_POLL_MS = 50
+# 输入联想最多列出的证券数
+SUGGEST_LIMIT = 8
+_debounce_id = None
+_awaiting_id = None
+_last_data = None
+_draw_trace = None
+
 def get_stock_data():
+    global _debounce_id
+    # 连续点击时只在最后一次点击后发起请求
+    if _debounce_id is not None:
+        root.after_cancel(_debounce_id)
+    _debounce_id = root.after(FETCH_DEBOUNCE_MS, submit_fetch)
+
+def submit_fetch():
+    global _debounce_id, _awaiting_id
+    _debounce_id = None
+    code = stock_code_entry.get()
+    end_date = date_entry.get()
     try:
-        code = stock_code_entry.get()
-        end_date = date_entry.get()
-        
-        # 格式化股票代码
-        if code.startswith('6'):
-            code = 'sh.' + code
-        else:
-            code = 'sz.' + code
-            
-        # 登录系统
-        bs.login()
-        
-        # 获取股票基本信息
-        rs = bs.query_stock_basic(code=code)
-        stock_info = rs.get_data()
-        if stock_info.empty:
-            messagebox.showerror("错误", "没有找到股票信息")
-            return
-        stock_name = stock_info['code_name'][0]
-        
-        # 获取日线数据
-        end_date_obj = datetime.datetime.strptime(end_date, '%Y-%m-%d')
-        start_date = (end_date_obj - datetime.timedelta(days=7)).strftime('%Y-%m-%d')
-        
-        rs = bs.query_history_k_data_plus(code,
-            "date,open,high,low,close",
-            start_date=start_date,
-            end_date=end_date,
-            frequency="d")
-        daily_data = rs.get_data()
-        
-        # 获取周线数据（获取更长时间以确保至少有一周完整数据）
-        week_start_date = (end_date_obj - datetime.timedelta(days=30)).strftime('%Y-%m-%d')
-        rs = bs.query_history_k_data_plus(code,
-            "date,open,high,low,close",
-            start_date=week_start_date,
-            end_date=end_date,
-            frequency="w")
-        weekly_data = rs.get_data()
+        lookback = max(1, int(lookback_entry.get()))
+    except ValueError:
+        messagebox.showerror("错误", "请输入有效的天数")
+        return
+    if fetch_worker.is_busy_with(code, end_date, lookback):
+        return
+    
+    polling = _awaiting_id is not None
+    _awaiting_id = fetch_worker.submit(code, end_date, lookback)
+    fetch_progress.start(10)
+    if not polling:
+        root.after(FETCH_POLL_MS, poll_fetch_results)
+
+def poll_fetch_results():
+    global _awaiting_id
+    try:
+        while True:
+            request_id, result, error = fetch_worker.results.get_nowait()
+            # 被新请求取代的结果直接丢弃
+            if request_id != _awaiting_id:
+                continue
+            _awaiting_id = None
+            fetch_progress.stop()
+            if error is not None:
+                messagebox.showerror("错误", str(error))
+            else:
+                show_stock_data(*result)
+    except queue.Empty:
+        pass
+    
+    if _awaiting_id is not None:
+        root.after(FETCH_POLL_MS, poll_fetch_results)
+
+def draw_traced(trace):
+    # 真正的重绘发生在 Tk 空闲时，由 timed_canvas_draw 记录耗时并结束 trace
+    global _draw_trace
+    _draw_trace = trace
+    canvas.draw_idle()
+
+def timed_canvas_draw():
+    global _draw_trace
+    trace, _draw_trace = _draw_trace, None
+    if trace is None:
+        return _canvas_draw()
+    with timing.resume(trace), timing.span('canvas_draw', 'render'):
+        _canvas_draw()
+    trace.finish()
+    status_label.config(text=f"{trace.name}: {trace.summary()}")
+
+def show_stock_data(data, trace=None):
+    global _last_data
+    # 切换算法时用已有数据重画，只记录计算和绘图
+    trace = trace or timing.Trace('redraw')
+    try:
+        code, stock_name = data['code'], data['name']
+        lookback = data['lookback']
+        daily_data, weekly_data = data['daily'], data['weekly']
         
         if daily_data.empty or weekly_data.empty:
             messagebox.showerror("错误", "没有找到数据")
             return
             
-        # 获取最近三个交���日的数据
-        last_three_days = daily_data.tail(3)
-        # 获取最近一周的数据
-        last_week = weekly_data.tail(1).iloc[0]
-        
-        # 计算周线枢轴点
-        week_high = float(last_week['high'])
-        week_low = float(last_week['low'])
-        week_close = float(last_week['close'])
-        
-        week_pivot = (week_high + week_low + week_close) / 3
-        week_s1 = (2 * week_pivot) - week_high
-        week_s2 = week_pivot - (week_high - week_low)
-        week_s3 = week_low - 2 * (week_high - week_pivot)
-        week_r1 = (2 * week_pivot) - week_low
-        week_r2 = week_pivot + (week_high - week_low)
-        week_r3 = week_high + 2 * (week_pivot - week_low)
-        
-        # 清除旧图并调整布局
-        ax.clear()
-        fig.subplots_adjust(left=0.08, right=0.92, top=0.9, bottom=0.15)
-        
-        # 获取所有价格点（包括周线）
-        all_prices = []
-        # 添加周线价格点
-        all_prices.extend([week_high, week_low, week_close, 
-                         week_pivot, week_s1, week_s2, week_s3, 
-                         week_r1, week_r2, week_r3])
-        
-        # 添加日线价格点
-        for i, (_, row) in enumerate(last_three_days.iterrows()):
-            # 计算枢轴点
-            high = float(row['high'])
-            low = float(row['low'])
-            close = float(row['close'])
-            open_price = float(row['open'])
-            
-            pivot = (high + low + close) / 3
-            s1 = (2 * pivot) - high
-            s2 = pivot - (high - low)
-            s3 = low - 2 * (high - pivot)
-            r1 = (2 * pivot) - low
-            r2 = pivot + (high - low)
-            r3 = high + 2 * (pivot - low)
-            
-            # 绘制K线
-            width = 0.15
-            if close > open_price:
-                color = 'red'
-                bottom = open_price
-                height = close - open_price
-            else:
-                color = 'green'
-                bottom = close
-                height = open_price - close
-                
-            # 绘制实体部分
-            ax.bar(i+1, height, width, bottom=bottom, color=color)
-            # 绘制上下影线
-            ax.plot([i+1, i+1], [low, high], color='black', linewidth=1)
-            
-            # 标注OHLC价格和圆点
-            ohlc_points = [
-                (open_price, 'O'),
-                (high, 'H'),
-                (low, 'L'),
-                (close, 'C')
-            ]
-            
-            for price, label in ohlc_points:
-                # 绘制圆点
-                ax.plot(i+1, price, 'o', color='blue', markersize=4)
-                # 添加价���标注
-                ax.text(i+1 + 0.1, price, f'{price:.2f}', 
-                       color='blue', va='center', ha='left', fontsize=8)
-            
-            # 为每天绘制独立的支撑位和压力位线条
-            lines = [
-                (r3, 'R3', 'red'),
-                (r2, 'R2', 'red'),
-                (r1, 'R1', 'red'),
-                (pivot, 'P', 'black'),
-                (s1, 'S1', 'green'),
-                (s2, 'S2', 'green'),
-                (s3, 'S3', 'green')
-            ]
-            
-            # 计算线条的开始和结束位置
-            x_start = i + 1 - 0.2
-            x_end = i + 1 + 0.2
-            
-            for price, label, line_color in lines:
-                # 绘制短线
-                ax.plot([x_start, x_end], [price, price], 
-                       color=line_color, linestyle='--', alpha=0.5)
-                
-                # 添加带英文首字母的价格标注
-                ax.text(x_end + 0.1, price, f'{label}: {price:.2f}', 
-                       color=line_color, va='center', ha='left', fontsize=8)
+        # 获取最近 lookback 个交易日和最近一周的数据，并一次性算出枢轴点
+        method = selected_method()
+        with timing.resume(trace), timing.span('pivots', 'compute', bars=lookback):
+            last_days = pivots.pivot_points(daily_data.tail(lookback), method=method)
+            last_week = pivots.pivot_points(weekly_data.tail(1), method=method)
+        _last_data = data
         
-        # 在最右侧添加周线数据
-        # 绘制周线K线
-        i = 4  # 第四个位置
-        width = 0.15
-        if float(last_week['close']) > float(last_week['open']):
-            color = 'red'
-            bottom = float(last_week['open'])
-            height = float(last_week['close']) - float(last_week['open'])
-        else:
-            color = 'green'
-            bottom = float(last_week['close'])
-            height = float(last_week['open']) - float(last_week['close'])
-
-        # 绘制周线实体部分
-        ax.bar(i, height, width, bottom=bottom, color=color)
-        # 绘制周线上下影线
-        ax.plot([i, i], [week_low, week_high], color='black', linewidth=1)
-
-        # 标注周线OHLC价格和圆点
-        week_ohlc_points = [
-            (float(last_week['open']), 'WO'),
-            (week_high, 'WH'),
-            (week_low, 'WL'),
-            (week_close, 'WC')
-        ]
-
-        for price, label in week_ohlc_points:
-            # 绘制圆点
-            ax.plot(i, price, 'o', color='purple', markersize=4)
-            # 添加价格标注
-            ax.text(i + 0.1, price, f'{label}: {price:.2f}', 
-                   color='purple', va='center', ha='left', fontsize=8)
-
-        # 绘制周线枢轴点
-        week_lines = [
-            (week_r3, 'WR3', 'darkred'),
-            (week_r2, 'WR2', 'darkred'),
-            (week_r1, 'WR1', 'darkred'),
-            (week_pivot, 'WP', 'purple'),
-            (week_s1, 'WS1', 'darkgreen'),
-            (week_s2, 'WS2', 'darkgreen'),
-            (week_s3, 'WS3', 'darkgreen')
-        ]
-
-        # 为周线绘制支撑位和压力位
-        x_start = i - 0.2
-        x_end = i + 0.2
-
-        for price, label, line_color in week_lines:
-            # 绘制短线
-            ax.plot([x_start, x_end], [price, price], 
-                   color=line_color, linestyle='--', alpha=0.5)
-            # 添加标签
-            ax.text(x_end + 0.1, price, f'{label}: {price:.2f}', 
-                   color=line_color, va='center', ha='left', fontsize=8)
-
-        # 更新x轴刻度和标签
-        ax.set_xticks([1, 2, 3, 4])
-        dates = list(last_three_days['date'])
-        dates.append('周K线')  # 将'周线'改为'周K线'
-        ax.set_xticklabels(dates, rotation=0)
-
-        # 扩大显示范围以适应所有元素
-        ax.set_xlim(0.2, 5.0)  # 扩大右侧空间以显示周线标签
-
-        # 设置图表标题和标签
-        ax.set_title(f'{stock_name}({code}) 最近三个交易日股票价格与枢轴点（周线）', fontproperties='SimHei')
-        ax.set_ylabel('价格')
-        ax.set_xticks([1, 2, 3])
-        ax.set_xticklabels(last_three_days['date'], rotation=0)
-        ax.grid(True, linestyle='--', alpha=0.3)
-        
-        # 更新画布
-        canvas.draw()
+        # 图元原地更新，不再 ax.clear() 后全部重建；draw_idle 交给 Tk 空闲时重绘
+        stop_intraday()
+        with timing.resume(trace), timing.span('chart_update', 'render'):
+            chart.update(last_days, last_week,
+                         title=f'{stock_name}({code}) 最近{len(last_days)}个交易日股票价格与'
+                               f'{pivots.method_label(method)}枢轴点（周线）')
+        draw_traced(trace)
         
         # 填充最后一天的数据到输入框
-        last_day = last_three_days.iloc[-1]
+        last_day = last_days.iloc[-1]
         open_entry.delete(0, tk.END)
         open_entry.insert(0, last_day['open'])
 
@@ -379,8 +252,94 @@ def get_stock_data():
         
     except Exception as e:
         messagebox.showerror("错误", str(e))
-    finally:
-        bs.logout()
+
+# 分时模式：定时在后台线程拉取新K线，只把新增部分追加到分时图
+intraday_worker = FetchWorker(traced('intraday', intraday.poll_feed))
+INTRADAY_REFRESH_MS = 60 * 1000
+REPLAY_INTERVAL_MS = 300
+_intraday_feed = None
+_intraday_after = None
+_levels_feed = None
+
+def start_intraday(feed):
+    global _intraday_feed
+    stop_intraday()
+    _intraday_feed = feed
+    chart.set_visible(False)
+    # 先清空上一只股票的分时线，等第一批K线和前一交易日数据到达后再画价位线
+    intraday_chart.reset(intraday.session_times(feed.frequency),
+                         title=f'{feed.code} {feed.date} {feed.frequency}分钟')
+    canvas.draw_idle()
+    poll_intraday()
+
+def start_live_intraday():
+    frequency = frequency_combo.get().replace('分钟', '')
+    start_intraday(intraday.IntradayFeed(stock_code_entry.get(), frequency, date_entry.get()))
+
+def start_replay():
+    path = filedialog.askopenfilename(filetypes=[("分时录制", "*.json")])
+    if path:
+        try:
+            start_intraday(intraday.ReplayFeed.load(path))
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("错误", f"无法读取录制文件: {e}")
+
+def stop_intraday(hide=True):
+    global _intraday_feed, _intraday_after
+    _intraday_feed = None
+    if _intraday_after is not None:
+        root.after_cancel(_intraday_after)
+        _intraday_after = None
+    if hide:
+        intraday_chart.set_visible(False)
+
+def poll_intraday():
+    global _intraday_after
+    _intraday_after = None
+    if _intraday_feed is None:
+        return
+    if not intraday_worker.is_busy_with(_intraday_feed):
+        intraday_worker.submit(_intraday_feed)
+    root.after(FETCH_POLL_MS, collect_intraday, _intraday_feed)
+
+def collect_intraday(feed):
+    global _intraday_after, _levels_feed
+    # 停止或切换数据源后，旧的轮询自行结束
+    if feed is not _intraday_feed:
+        return
+    while True:
+        try:
+            _, result, error = intraday_worker.results.get_nowait()
+        except queue.Empty:
+            root.after(FETCH_POLL_MS, collect_intraday, feed)
+            return
+        if error is not None:
+            stop_intraday()
+            messagebox.showerror("错误", f"分时数据获取失败: {error}")
+            return
+        (polled_feed, new_bars), trace = result
+        # 已切换掉的数据源的结果直接丢弃
+        if polled_feed is feed:
+            break
+
+    # 第一批结果到达时前一交易日K线也已取到，画出当天的枢轴点
+    if _levels_feed is not feed and feed.previous is not None:
+        _levels_feed = feed
+        method = selected_method()
+        previous = feed.previous
+        with timing.resume(trace), timing.span('pivots', 'compute'):
+            levels = pivots.calculate_pivot_points(previous['high'], previous['low'],
+                                                   previous['close'], previous['open'],
+                                                   method=method)
+        intraday_chart.reset(intraday.session_times(feed.frequency), levels,
+                             title=f'{feed.code} {feed.date} {feed.frequency}分钟'
+                                   f'（{pivots.method_label(method)}枢轴点，{previous["date"]}）')
+    with timing.resume(trace), timing.span('chart_update', 'render', bars=len(new_bars)):
+        intraday_chart.append(new_bars)
+    draw_traced(trace)
+    if not feed.finished:
+        delay = REPLAY_INTERVAL_MS if isinstance(feed, intraday.ReplayFeed) else INTRADAY_REFRESH_MS
+        _intraday_after = root.after(delay, poll_intraday)
 
 # 创建主窗口
 root = tk.Tk()
@@ -401,10 +360,18 @@ fig = Figure(figsize=(8, 6), dpi=100)  # 使用固定的图表尺寸
 ax = fig.add_subplot(111)
 ax.set_title('股票价格与枢轴点', fontproperties='SimHei')
 ax.set_ylabel('价格', fontproperties='SimHei')
+ax.grid(True, linestyle='--', alpha=0.3)
+# K线和枢轴点图元只创建一次，之后原地更新；分时图共用同一个坐标轴，按模式切换显示
+chart = PivotChart(ax)
+intraday_chart = IntradayChart(ax)
 
 # 设置统一的边距
 fig.subplots_adjust(left=0.08, right=0.92, top=0.9, bottom=0.15)  # 调整左右边距
 
+# 底部状态栏：最近一次查询按网络、解析、计算、绘图分类的耗时
+status_label = ttk.Label(root, text="", anchor='w', relief=tk.SUNKEN, padding="5 2 5 2")
+status_label.pack(side=tk.BOTTOM, fill=tk.X)
+
 # 创建左侧框架
 left_frame = ttk.Frame(root)
 left_frame.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.Y)
@@ -430,9 +397,17 @@ ttk.Label(input_frame, text="收盘价:").grid(row=3, column=0, padx=5, pady=5)
 close_entry = ttk.Entry(input_frame)
 close_entry.grid(row=3, column=1, padx=5, pady=5)
 
+# 枢轴点算法，切换后重画当前图表
+METHOD_NAMES = {label: name for name, (label, _) in pivots.METHODS.items()}
+ttk.Label(input_frame, text="算法:").grid(row=4, column=0, padx=5, pady=5)
+method_combo = ttk.Combobox(input_frame, values=list(METHOD_NAMES), state='readonly')
+method_combo.grid(row=4, column=1, padx=5, pady=5)
+method_combo.set(pivots.method_label(pivots.DEFAULT_METHOD))
+method_combo.bind('<<ComboboxSelected>>', on_method_change)
+
 # 添加计算按钮
 calc_button = ttk.Button(input_frame, text="计算枢轴点", command=calculate_pivot_points)
-calc_button.grid(row=4, column=0, columnspan=2, pady=10)
+calc_button.grid(row=5, column=0, columnspan=2, pady=10)
 
 # 创建结果显示框架
 result_frame = ttk.LabelFrame(left_frame, text="计算结信息", padding="5 5 5 5")
@@ -469,6 +444,65 @@ ttk.Label(stock_frame, text="股票代码:").grid(row=0, column=0, padx=5, pady=
 stock_code_entry = ttk.Entry(stock_frame, width=12)  # 设置较窄的宽度
 stock_code_entry.grid(row=0, column=1, padx=5, pady=5)
 
+# 输入联想：按代码、名称或拼音首字母前缀查本地代码表，在输入框下方列出匹配的证券
+suggest_listbox = tk.Listbox(root, height=SUGGEST_LIMIT, width=24, exportselection=False)
+_suggestions = []
+
+def update_suggestions(event=None):
+    if event is not None and event.keysym in ('Up', 'Down', 'Return', 'Escape', 'Tab'):
+        return
+    query = stock_code_entry.get().strip()
+    _suggestions[:] = symbols.get_master().search(query, SUGGEST_LIMIT) if query else []
+    if not _suggestions:
+        hide_suggestions()
+        return
+    suggest_listbox.delete(0, tk.END)
+    for symbol in _suggestions:
+        suggest_listbox.insert(tk.END, f"{symbol['code']}  {symbol['name']}")
+    suggest_listbox.configure(height=len(_suggestions))
+    suggest_listbox.place(in_=stock_code_entry, x=0, rely=1.0, y=2)
+    suggest_listbox.lift()
+
+def hide_suggestions(event=None):
+    suggest_listbox.place_forget()
+
+def choose_suggestion(event=None):
+    selection = suggest_listbox.curselection()
+    if not selection:
+        return
+    symbol = _suggestions[selection[0]]
+    stock_code_entry.delete(0, tk.END)
+    stock_code_entry.insert(0, symbol['code'])
+    hide_suggestions()
+    stock_code_entry.focus_set()
+    get_stock_data()
+
+def focus_suggestions(event=None):
+    # 方向键下移到候选列表，回车选中
+    if _suggestions and suggest_listbox.winfo_ismapped():
+        suggest_listbox.focus_set()
+        suggest_listbox.selection_clear(0, tk.END)
+        suggest_listbox.selection_set(0)
+        suggest_listbox.activate(0)
+
+def on_code_return(event=None):
+    hide_suggestions()
+    get_stock_data()
+
+def on_code_focus_out(event=None):
+    # 点击候选项时焦点先离开输入框，稍后再判断是否收起
+    root.after(100, lambda: None if root.focus_get() is suggest_listbox else hide_suggestions())
+
+stock_code_entry.bind('<KeyRelease>', update_suggestions)
+stock_code_entry.bind('<Down>', focus_suggestions)
+stock_code_entry.bind('<Return>', on_code_return)
+stock_code_entry.bind('<Escape>', hide_suggestions)
+stock_code_entry.bind('<FocusOut>', on_code_focus_out)
+suggest_listbox.bind('<Return>', choose_suggestion)
+suggest_listbox.bind('<ButtonRelease-1>', choose_suggestion)
+suggest_listbox.bind('<Escape>', lambda event: [hide_suggestions(), stock_code_entry.focus_set()])
+suggest_listbox.bind('<FocusOut>', hide_suggestions)
+
 ttk.Label(stock_frame, text="日期:").grid(row=1, column=0, padx=5, pady=5)
 date_entry = ttk.Entry(stock_frame, width=12)  # 设置较窄的宽度
 date_entry.grid(row=1, column=1, padx=5, pady=5)
@@ -477,9 +511,34 @@ date_entry.grid(row=1, column=1, padx=5, pady=5)
 today = datetime.datetime.now().strftime('%Y-%m-%d')
 date_entry.insert(0, today)
 
+ttk.Label(stock_frame, text="天数:").grid(row=2, column=0, padx=5, pady=5)
+lookback_entry = ttk.Spinbox(stock_frame, from_=1, to=5000, width=10)
+lookback_entry.grid(row=2, column=1, padx=5, pady=5)
+lookback_entry.set(stock_data.DEFAULT_LOOKBACK)
+
 # 获取数据按钮
 get_data_button = ttk.Button(stock_frame, text="获取数据", command=get_stock_data)
-get_data_button.grid(row=2, column=0, columnspan=2, pady=10)
+get_data_button.grid(row=3, column=0, columnspan=2, pady=10)
+
+# 后台取数时显示的进度条
+fetch_progress = ttk.Progressbar(stock_frame, mode='indeterminate', length=120)
+fetch_progress.grid(row=4, column=0, columnspan=2, pady=(0, 5))
+
+# 分时模式
+intraday_frame = ttk.LabelFrame(left_frame, text="分时", padding="5 5 5 5")
+intraday_frame.pack(fill=tk.X, padx=5, pady=5)
+
+ttk.Label(intraday_frame, text="周期:").grid(row=0, column=0, padx=5, pady=5)
+frequency_combo = ttk.Combobox(intraday_frame, state='readonly', width=10,
+                               values=[f'{f}分钟' for f in intraday.MINUTE_FREQUENCIES])
+frequency_combo.grid(row=0, column=1, padx=5, pady=5)
+frequency_combo.current(0)
+
+ttk.Button(intraday_frame, text="开始分时", command=start_live_intraday).grid(
+    row=1, column=0, padx=5, pady=5)
+ttk.Button(intraday_frame, text="回放", command=start_replay).grid(row=1, column=1, padx=5, pady=5)
+ttk.Button(intraday_frame, text="停止", command=lambda: stop_intraday(hide=False)).grid(
+    row=2, column=0, columnspan=2, pady=(0, 5))
 
 # 在创建左侧框架的最后添加历史记录列表框
 history_frame = ttk.LabelFrame(left_frame, text="历史记录", padding="5 5 5 5")
@@ -527,6 +586,9 @@ def on_resize(event=None):
 
 # 然后创建和配置画布
 canvas = FigureCanvasTkAgg(fig, master=right_frame)
+# draw_idle 最终调用 canvas.draw，换成带计时的版本
+_canvas_draw = canvas.draw
+canvas.draw = timed_canvas_draw
 # canvas.draw()
 
 toolbar = NavigationToolbar2Tk(canvas, right_frame)
@@ -545,6 +607,9 @@ canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
 # root.update_idletasks()
 # on_resize()
 
+# 代码表过期时在后台重建，期间联想和代码补全使用本地旧表
+symbols.start_refresh()
+
 # 添加最大化和复原操作
 root.after(500, lambda: root.state('zoomed'))  # 500ms后最大化
 root.after(1000, lambda: root.state('normal'))  # 1000ms后复原
@@ -1,18 +1,37 @@
 import streamlit as st
-import matplotlib.pyplot as plt
-import baostock as bs
+import matplotlib
 import datetime
 import os
 import json
+import math
+import threading
+import time
 import matplotlib.font_manager as fm
+from matplotlib.figure import Figure
+from stock_data import DEFAULT_LOOKBACK, data_version, fetch_stock_data, normalize_code
+from pivots import DEFAULT_METHOD, METHODS, calculate_pivot_points, method_label, pivot_points
+from kline_chart import IntradayChart, PivotChart, dpi_for_width, figure_bytes
+from intraday import MINUTE_FREQUENCIES, IntradayFeed, ReplayFeed, session_times
+from providers import get_provider
+from vega_chart import chart_frame, kline_spec
+import eod
+import symbols
+import timing
 
 # 在文件最开始，其他代码之前设置页面配置
 st.set_page_config(layout="wide")
 
 # 设置中文字体
-plt.rcParams['font.sans-serif'] = ['Microsoft YaHei',
-                                   'SimHei', 'DejaVu Sans']  # 按优先级尝试字体
-plt.rcParams['axes.unicode_minus'] = False
+matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei',
+                                          'SimHei', 'DejaVu Sans']  # 按优先级尝试字体
+matplotlib.rcParams['axes.unicode_minus'] = False
+
+# 图片的目标像素宽度：移动模式按列宽 40rem、2 倍像素比，桌面模式按原始尺寸显示
+DISPLAY_WIDTHS = {True: 1280, False: 1400}
+IMAGE_FORMATS = {'png': 'PNG', 'svg': 'SVG（矢量）'}
+RENDERERS = {'image': '图片（服务器绘制）', 'interactive': '交互（浏览器绘制）'}
+# 输入联想最多列出的证券数
+SUGGEST_LIMIT = 10
 
 # 初始化session state
 if 'stock_history' not in st.session_state:
@@ -56,173 +75,143 @@ def update_stock_history(code, name):
     st.session_state.stock_history = history[:5]
 
 
-def calculate_pivot_points(high, low, close, open_price):
-    pivot = (high + low + close) / 3
-    return {
-        'pivot': pivot,
-        'r1': (2 * pivot) - low,
-        'r2': pivot + (high - low),
-        'r3': high + 2 * (pivot - low),
-        's1': (2 * pivot) - high,
-        's2': pivot - (high - low),
-        's3': low - 2 * (high - pivot)
-    }
+@st.cache_resource
+def cache_stats():
+    # 进程内所有会话共享的缓存命中统计
+    return {'lock': threading.Lock(),
+            'data': {'calls': 0, 'misses': 0},
+            'chart': {'calls': 0, 'misses': 0}}
+
+
+def _count(kind, field):
+    stats = cache_stats()
+    with stats['lock']:
+        stats[kind][field] += 1
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _load_stock_data(code, end_date, lookback, version):
+    # 只有缓存未命中时才会执行到这里
+    _count('data', 'misses')
+    return fetch_stock_data(code, end_date, lookback)
 
 
-def get_stock_data(code, end_date):
+@st.cache_data(max_entries=128, show_spinner=False)
+def _render_kline(code, end_date, lookback, is_mobile, method, fmt, version, _data):
+    # 图表只由 (code, end_date, lookback, is_mobile, method, fmt) 和数据版本决定，_data 不参与缓存键；
+    # 只缓存和保存编码后的字节，Figure 用完即丢
+    _count('chart', 'misses')
+    fig = draw_kline(_data, is_mobile, lookback, method)
+    if fig is None:
+        return None
+    with timing.span('savefig', 'render', format=fmt):
+        return figure_bytes(fig, fmt)
+
+
+def get_stock_data(code, end_date, lookback=DEFAULT_LOOKBACK):
     try:
-        # 格式化股票代码
-        code = f'sh.{code}' if code.startswith('6') else f'sz.{code}'
-
-        bs.login()
-        # 获取股票基本信息
-        rs = bs.query_stock_basic(code=code)
-        stock_info = rs.get_data()
-        if stock_info.empty:
-            st.error("没有找到股票信息")
-            return None
-
-        # 获取日线数据
-        end_date_obj = datetime.datetime.strptime(end_date, '%Y-%m-%d')
-        start_date = (end_date_obj - datetime.timedelta(days=7)
-                      ).strftime('%Y-%m-%d')
-
-        rs = bs.query_history_k_data_plus(
-            code, "date,open,high,low,close",
-            start_date=start_date, end_date=end_date, frequency="d")
-        daily_data = rs.get_data()
-
-        # 获取周线数据
-        week_start_date = (
-            end_date_obj - datetime.timedelta(days=30)).strftime('%Y-%m-%d')
-        rs = bs.query_history_k_data_plus(
-            code, "date,open,high,low,close",
-            start_date=week_start_date, end_date=end_date, frequency="w")
-        weekly_data = rs.get_data()
-
-        return {
-            'daily': daily_data,
-            'weekly': weekly_data,
-            'name': stock_info['code_name'][0],
-            'code': code
-        }
+        # 基本信息、日线、周线三个查询并发获取；交易时段内按分钟失效，其余时间一直有效
+        _count('data', 'calls')
+        code = normalize_code(code)
+        return _load_stock_data(code, end_date, lookback, data_version(end_date))
     except Exception as e:
         st.error(str(e))
         return None
-    finally:
-        bs.logout()
 
 
-def draw_kline(data):
+def render_kline(data, end_date, is_mobile, method=DEFAULT_METHOD, fmt='png'):
+    _count('chart', 'calls')
+    return _render_kline(data['code'], end_date, data['lookback'], is_mobile, method, fmt,
+                         data_version(end_date), data)
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _build_kline_spec(code, end_date, lookback, is_mobile, method, version, _data):
+    # 交互图表只下发规格和紧凑的K线表，缩放、悬停不再回到服务器
+    _count('chart', 'misses')
+    last_days = _data['daily'].tail(lookback)
+    if last_days.empty:
+        return None
+    with timing.span('pivots', 'compute', bars=len(last_days)):
+        levels = pivot_points(last_days, method=method)
+        week = pivot_points(_data['weekly'].tail(1), method=method)
+    with timing.span('vega_spec', 'render'):
+        spec = kline_spec(f"{_data['name']}({_data['code']})近{len(last_days)}日数据"
+                          f"（{method_label(method)}）", week, height=300 if is_mobile else 450)
+        return {'spec': spec, 'data': chart_frame(levels)}
+
+
+def build_kline_spec(data, end_date, is_mobile, method=DEFAULT_METHOD):
+    _count('chart', 'calls')
+    return _build_kline_spec(data['code'], end_date, data['lookback'], is_mobile, method,
+                             data_version(end_date), data)
+
+
+def show_chart(chart, use_column_width):
+    # 交互图表保存的是 {'spec', 'data'}，图片保存的是编码后的字节
+    if isinstance(chart, dict):
+        st.vega_lite_chart(chart['data'], chart['spec'], use_container_width=True)
+    else:
+        st.image(chart_image(chart), use_column_width=use_column_width)
+
+
+def chart_image(chart):
+    # st.image 只接受字符串形式的 SVG
+    if chart.lstrip()[:5] in (b'<?xml', b'<svg '):
+        return chart.decode('utf-8')
+    return chart
+
+
+def draw_kline(data, is_mobile=None, lookback=None, method=DEFAULT_METHOD):
 
     # 根据设备类型调整图表大小和字体大小
-    is_mobile = st.session_state.get('is_mobile', True)
+    if is_mobile is None:
+        is_mobile = st.session_state.get('is_mobile', True)
+    # 不经过 pyplot，Figure 不会留在全局的图表管理器里；dpi 按显示宽度计算
     if is_mobile:
-        fig = plt.figure(figsize=(5, 3), dpi=400)
+        fig = Figure(figsize=(5, 3), dpi=dpi_for_width(5, DISPLAY_WIDTHS[True]))
         font_size = 9  # 桌面设备上的字体大小
         title_size = 11
         marker_size = 3
     else:
-        fig = plt.figure(figsize=(8, 4), dpi=400)
+        fig = Figure(figsize=(8, 4), dpi=dpi_for_width(8, DISPLAY_WIDTHS[False]))
         font_size = 8  # 桌面设备上的字体大小
         title_size = 12
         marker_size = 6
 
     ax = fig.add_subplot(111)
 
-    # 获取最近的数据（最多3天）
-    last_three_days = data['daily'].tail(3)
-    num_days = len(last_three_days)
+    # 获取最近 lookback 个交易日的数据，K线过多时 PivotChart 按像素宽度合并
+    if lookback is None:
+        lookback = data.get('lookback', DEFAULT_LOOKBACK)
+    last_days = data['daily'].tail(lookback)
+    num_days = len(last_days)
 
     if num_days == 0:
         st.error("没有找到交易数据")
         return None
 
-    # 绘制日K线
-    for i, (_, row) in enumerate(last_three_days.iterrows()):
-        open_price = float(row['open'])
-        close = float(row['close'])
-        high = float(row['high'])
-        low = float(row['low'])
-
-        # 计算枢轴点
-        pp = calculate_pivot_points(high, low, close, open_price)
-
-        # 绘制K线
-        width = 0.15
-        if close > open_price:
-            color = 'red'
-            bottom = open_price
-            height = close - open_price
-        else:
-            color = 'green'
-            bottom = close
-            height = open_price - close
-
-        # 绘制实体部分
-        ax.bar(i + 1, height, width, bottom=bottom, color=color)
-        # 绘制上下影线
-        ax.plot([i + 1, i + 1], [low, high], color='black', linewidth=1)
-
-        # 标注OHLC价格和圆点
-        ohlc_points = [
-            (open_price, 'O', 'center'),    # 底部平齐
-            (high, 'H', 'bottom'),          # 中间
-            (low, 'L', 'top'),           # 中间
-            (close, 'C', 'center')             # 顶部平齐
-        ]
-
-        # 设置字体属性
-        font_properties = fm.FontProperties(
-            fname='NotoSansCJK-Light.otf',
-            weight='light'  # 使用更细的字重
-        )
-
-        # 在绘制OHLC价格标注时使用新的字体属性
-        for price, label, position in ohlc_points:
-            # 绘制圆点
-            ax.plot(i + 1, price, 'o', color='blue', markersize=marker_size)
-            # 添加价格标注
-              
-            ax.text(i + 1 + 0.1, price , f'{price:.2f}',
-                   color='blue', va=position, ha='left',
-                   fontsize=font_size, fontproperties=font_properties)
-
-        # 为每天绘制独立的支撑位和压力位线条
-        lines = [
-            (pp['r3'], 'R3', 'red'),
-            (pp['r2'], 'R2', 'red'),
-            (pp['r1'], 'R1', 'red'),
-            (pp['pivot'], 'P', 'black'),
-            (pp['s1'], 'S1', 'green'),
-            (pp['s2'], 'S2', 'green'),
-            (pp['s3'], 'S3', 'green')
-        ]
-
-        # 计算线条的开始和结束位置
-        x_start = i + 1 - 0.2
-        x_end = i + 1 + 0.2
-
-        # 在绘制支撑/压力线标签时也使用新的字体属性
-        for price, label, line_color in lines:
-            # 绘制短线
-            ax.plot([x_start, x_end], [price, price],
-                    color=line_color, linestyle='--', alpha=0.5)
-            # 添加标签，使用更细的字体
-            ax.text(x_end + 0.1, price, f'{label}: {price:.2f}',
-                    color=line_color, va='center', ha='left',
-                    fontsize=font_size, fontproperties=font_properties)
-
-    # 设置x轴刻度和标签
-    ax.set_xticks([1, 2, 3])
-    ax.set_xticklabels(last_three_days['date'].values, rotation=0)  # 使用日期作为标签
+    # 设置字体属性
+    font_properties = fm.FontProperties(
+        fname='NotoSansCJK-Light.otf',
+        weight='light'  # 使用更细的字重
+    )
+
+    # 一次性计算所有日K线的枢轴点，K线、价位线、圆点各用一个集合图元绘制
+    chart = PivotChart(ax, font_size=font_size, marker_size=marker_size,
+                       fontproperties=font_properties,
+                       ohlc_va=('center', 'bottom', 'top', 'center'))
+    with timing.span('pivots', 'compute', bars=num_days):
+        levels = pivot_points(last_days, method=method)
+    with timing.span('chart_update', 'render'):
+        chart.update(levels)
 
     # 设置标题时增加字重和大小
     font_properties_title = font_properties.copy()
     font_properties_title.set_weight('bold')  # 设置字体加粗
     font_properties_title.set_size(title_size)
     
-    ax.set_title(f"{data['name']}({data['code']})近三日数据", 
+    ax.set_title(f"{data['name']}({data['code']})近{num_days}日数据（{method_label(method)}）", 
                  fontproperties=font_properties_title,
                  pad=10)  # 增加标题和图表的间距
 
@@ -232,49 +221,175 @@ def draw_kline(data):
         label.set_fontproperties(font_properties)
 
     # 调整图表边距
-    if is_mobile:
-        print("is_mobile")
-        ax.set_aspect(1.5)
-        plt.tight_layout(pad=0.1)
-    else:
-        print("pc")
-        ax.set_aspect(1)
-        plt.tight_layout(pad=5)  # 减小 pad 值，让标题有更多空间
+    with timing.span('tight_layout', 'render'):
+        if is_mobile:
+            ax.set_aspect(1.5)
+            fig.tight_layout(pad=0.1)
+        else:
+            ax.set_aspect(1)
+            fig.tight_layout(pad=5)  # 减小 pad 值，让标题有更多空间
 
     return fig
 
 
+def show_stock(code):
+    end_date = str(st.session_state.date_input)
+    # 缓存命中时没有网络和绘图的记录，耗时面板里只剩总时间
+    with timing.trace('show_stock') as trace:
+        data = get_stock_data(code, end_date,
+                              st.session_state.get('lookback_input', DEFAULT_LOOKBACK))
+        if data and not data['daily'].empty:
+            if (not st.session_state.stock_history
+                    or st.session_state.stock_history[0]['code'] != data['code']):
+                update_stock_history(data['code'], data['name'])
+                save_stock_list()
+            is_mobile = st.session_state.get('is_mobile', True)
+            method = st.session_state.get('method_input', DEFAULT_METHOD)
+            if st.session_state.get('renderer_input', 'image') == 'interactive':
+                chart = build_kline_spec(data, end_date, is_mobile, method)
+            else:
+                chart = render_kline(data, end_date, is_mobile, method,
+                                     st.session_state.get('format_input', 'png'))
+            if chart:
+                st.session_state.current_chart = chart
+    st.session_state.last_trace = trace
+
+
+INTRADAY_REFRESH_SECONDS = 60
+REPLAY_REFRESH_SECONDS = 1
+# 自动刷新等待时每步的秒数，也是对用户操作的最长响应延迟
+REFRESH_STEP_SECONDS = 0.5
+
+
+def intraday_image(state, fmt):
+    """按数据源现有的K线和价位新建一张分时图并编码，Figure 用完即丢，不放进会话"""
+    width = DISPLAY_WIDTHS[st.session_state.get('is_mobile', True)]
+    fig = Figure(figsize=(8, 4), dpi=dpi_for_width(8, width))
+    ax = fig.add_subplot(111)
+    ax.grid(True, linestyle='--', alpha=0.3)
+    chart = IntradayChart(ax, fontproperties=fm.FontProperties(fname='NotoSansCJK-Light.otf'))
+    chart.reset(session_times(state['feed'].frequency), state['levels'], title=state['title'])
+    with timing.span('chart_update', 'render', bars=len(state['feed'].bars)):
+        chart.append(state['feed'].bars)
+    with timing.span('savefig', 'render', format=fmt):
+        return figure_bytes(fig, fmt)
+
+
+def show_intraday(code, replay=None, force=False):
+    """分时图：会话里只保存数据源（当天的K线）和枢轴点价位，编码后的图放在 current_chart，
+    每次重跑到了刷新时间才拉取新K线并重画"""
+    end_date = str(st.session_state.date_input)
+    frequency = st.session_state.frequency_input
+    method = st.session_state.get('method_input', DEFAULT_METHOD)
+    fmt = st.session_state.get('format_input', 'png')
+    key = (replay.name if replay else normalize_code(code), frequency, end_date, method)
+    state = st.session_state.get('intraday')
+    if state is None or state['key'] != key:
+        feed = ReplayFeed(json.load(replay)) if replay else IntradayFeed(code, frequency, end_date)
+        state = {'key': key, 'feed': feed, 'levels': None, 'title': None, 'polled_at': 0.0}
+        st.session_state.intraday = state
+
+    feed = state['feed']
+    interval = REPLAY_REFRESH_SECONDS if replay else INTRADAY_REFRESH_SECONDS
+    if feed.finished or (not force and time.time() - state['polled_at'] < interval):
+        # 换了图像格式时不必重新拉取，按现有的K线重画
+        if 'current_chart' not in st.session_state and state['polled_at']:
+            st.session_state.current_chart = intraday_image(state, fmt)
+        return
+    with timing.trace('show_intraday') as trace:
+        try:
+            feed.poll()
+        except Exception as e:
+            st.error(str(e))
+            return
+        state['polled_at'] = time.time()
+        if state['levels'] is None and feed.previous is not None:
+            previous = feed.previous
+            with timing.span('pivots', 'compute'):
+                state['levels'] = calculate_pivot_points(previous['high'], previous['low'],
+                                                         previous['close'], previous['open'],
+                                                         method=method)
+            state['title'] = (f"{feed.code} {feed.date} {feed.frequency}分钟"
+                             f"（{method_label(method)}，{previous['date']}）")
+        st.session_state.current_chart = intraday_image(state, fmt)
+    st.session_state.last_trace = trace
+
+
+def intraday_wait():
+    """自动刷新时距下一次拉取还要等待的秒数，不需要刷新时返回 None"""
+    state = st.session_state.get('intraday')
+    if (st.session_state.get('frequency_input', 'd') == 'd' or state is None
+            or state['feed'].finished or not st.session_state.get('auto_refresh')):
+        return None
+    interval = REPLAY_REFRESH_SECONDS if isinstance(state['feed'], ReplayFeed) else INTRADAY_REFRESH_SECONDS
+    return max(0.0, state['polled_at'] + interval - time.time())
+
+
 if __name__ == '__main__':
 
     # 页面布局代码
     load_stock_list()
+    # 代码表过期时在后台重建，每个进程只启动一次
+    symbols.start_refresh()
 
     # 使用sidebar进行所有设置
     with st.sidebar:
         st.header("股票信息")
         # 修改输入框的处理方式
-        code = st.text_input("股票代码", key='stock_code_input')
+        query = st.text_input("股票代码", key='stock_code_input',
+                              help="代码、名称或拼音首字母，例如 600519、贵州茅台、gzmt")
+        # 输入联想：查本地代码表，多个匹配时在下拉框中选择，默认取排在最前的股票
+        matches = symbols.get_master().search(query, SUGGEST_LIMIT) if query.strip() else []
+        code = query
+        if len(matches) > 1:
+            code = st.selectbox("匹配的证券", options=matches, key='symbol_match',
+                                format_func=lambda s: f"{s['name']}({s['code']})")['code']
+        elif matches:
+            code = matches[0]['code']
         is_mobile = st.checkbox("移动设备模式", value=True, key='is_mobile')
         # st.session_state.is_mobile = is_mobile
         # 当输入框的值改变时，更新 selected_code
         if code != st.session_state.get('selected_code', ''):
             st.session_state.selected_code = code
             # 清除上一次的图表
-            if 'current_fig' in st.session_state:
-                del st.session_state.current_fig
+            if 'current_chart' in st.session_state:
+                del st.session_state.current_chart
 
         date = st.date_input("日期", datetime.date.today(), key='date_input')
+        lookback = st.number_input("天数", min_value=1, max_value=5000,
+                                   value=DEFAULT_LOOKBACK, step=1, key='lookback_input')
+        method = st.selectbox("枢轴点算法", options=list(METHODS),
+                              format_func=method_label, key='method_input',
+                              on_change=lambda: st.session_state.pop('current_chart', None))
+        frequency = st.selectbox("周期", options=['d'] + MINUTE_FREQUENCIES,
+                                 format_func=lambda f: '日线' if f == 'd' else f'{f}分钟',
+                                 key='frequency_input',
+                                 on_change=lambda: st.session_state.pop('current_chart', None))
+        renderer = 'image'
+        if frequency == 'd':
+            # 分时图逐次追加K线，只支持图片方式
+            renderer = st.selectbox("图表", options=list(RENDERERS), format_func=RENDERERS.get,
+                                    key='renderer_input',
+                                    on_change=lambda: st.session_state.pop('current_chart', None))
+        if renderer == 'image':
+            st.selectbox("图像格式", options=list(IMAGE_FORMATS), format_func=IMAGE_FORMATS.get,
+                         key='format_input',
+                         on_change=lambda: st.session_state.pop('current_chart', None))
+        replay = None
+        if frequency != 'd':
+            replay = st.file_uploader("分时回放（intraday.py 录制的文件）", type='json',
+                                      key='replay_input')
+            st.checkbox("自动刷新", value=True, key='auto_refresh')
 
         # 添加获取数据按钮
-        if st.button("获取数据") or (code and 'current_fig' not in st.session_state):
+        fetch_clicked = st.button("获取数据")
+        if frequency != 'd':
+            # 分时模式每次重跑都检查是否到了刷新时间，到了才拉取并追加新K线
+            if code or replay:
+                show_intraday(code, replay, force=fetch_clicked)
+        elif fetch_clicked or (code and 'current_chart' not in st.session_state):
             if code:
-                data = get_stock_data(code, str(st.session_state.date_input))
-                if data and not data['daily'].empty:
-                    update_stock_history(data['code'], data['name'])
-                    save_stock_list()
-                    fig = draw_kline(data)
-                    if fig:
-                        st.session_state.current_fig = fig
+                show_stock(code)
             else:
                 st.error("请输入股票代码")
 
@@ -287,23 +402,39 @@ if __name__ == '__main__':
         )
 
         # 历史记录选择处理
-        if selected and st.session_state.get('stock_code_input') == '':
-            st.session_state.selected_code = selected['code'].replace(
-                'sh.', '').replace('sz.', '')
-            data = get_stock_data(st.session_state.selected_code, str(
-                st.session_state.date_input))
-            if data and not data['daily'].empty:
-                update_stock_history(data['code'], data['name'])
-                save_stock_list()
-                fig = draw_kline(data)
-                if fig:
-                    st.session_state.current_fig = fig
+        if selected and st.session_state.get('stock_code_input') == '' and frequency == 'd':
+            st.session_state.selected_code = selected['code']
+            show_stock(st.session_state.selected_code)
 
         # st.header("显示设置")
 
+        with st.expander("缓存统计"):
+            stats = cache_stats()
+            for kind, label in (('data', '行情数据'), ('chart', '图表')):
+                calls, misses = stats[kind]['calls'], stats[kind]['misses']
+                st.caption(f"{label}: 命中 {calls - misses} / 未命中 {misses}")
+            st.caption(f"数据源: {get_provider().name}（环境变量 FINCE_PROVIDER）")
+            master = symbols.get_master()
+            st.caption(f"代码表: {len(master)} 条（更新于 {master.built_on or '未建立'}）")
+            runs = eod.get_store().runs(limit=1)
+            if runs:
+                trade_date, session, total, done = runs[0][:4]
+                st.caption(f"盘后枢轴点: {trade_date} → {session} 完成 {done}/{total}（eod.py）")
+
+        if 'last_trace' in st.session_state:
+            with st.expander("耗时"):
+                trace = st.session_state.last_trace
+                st.caption(trace.summary())
+                st.dataframe(
+                    [{'阶段': s['name'], '分类': s['category'], '开始(ms)': round(s['start_ms'], 1),
+                      '耗时(ms)': round(s['duration_ms'], 1), '线程': s['thread']}
+                     for s in trace.to_dict()['spans']],
+                    hide_index=True, use_container_width=True)
+                st.caption(f"设置环境变量 {timing.LOG_ENV_VAR} 可把每次记录追加到 JSON 行日志")
+
 
     # 主内容区显示图表
-    if 'current_fig' in st.session_state:
+    if 'current_chart' in st.session_state:
         # 根据移动设备模式设置不同的CSS样式
         if st.session_state.get('is_mobile', False):
             st.markdown(
@@ -331,7 +462,7 @@ if __name__ == '__main__':
                 """,
                 unsafe_allow_html=True,
             )
-            st.pyplot(st.session_state.current_fig, use_container_width=True)
+            show_chart(st.session_state.current_chart, use_column_width=True)
         else:
             st.markdown(
                 """
@@ -352,4 +483,17 @@ if __name__ == '__main__':
                 """,
                 unsafe_allow_html=True,
             )
-            st.pyplot(st.session_state.current_fig, use_container_width=False)
+            show_chart(st.session_state.current_chart, use_column_width=False)
+
+    # 分时自动刷新：分成短步等待，每步更新倒计时；用户有操作时 Streamlit 会在这次调用里
+    # 中断脚本并立即重跑，不必等满整个刷新间隔
+    wait = intraday_wait()
+    if wait is not None:
+        countdown = st.empty()
+        deadline = time.time() + wait
+        remaining = wait
+        while remaining > 0:
+            countdown.caption(f"{math.ceil(remaining)} 秒后刷新")
+            time.sleep(min(REFRESH_STEP_SECONDS, remaining))
+            remaining = deadline - time.time()
+        st.rerun()
@@ -0,0 +1,133 @@
+"""枢轴点计算：对整张 OHLC 表（日线、周线通用）一次向量化算出 P/R1-R3/S1-S3
+
+支持多种算法（经典、斐波那契、卡玛利拉、伍迪、迪马克），共用同一组中间量（振幅、典型价），
+一次调用可以同时算出多种算法的结果"""
+import numpy as np
+
+LEVELS = ['pivot', 'r1', 'r2', 'r3', 's1', 's2', 's3']
+DEFAULT_METHOD = 'classic'
+
+
+def compute_terms(high, low, close, open_price=None):
+    """各算法共用的中间量，只算一次"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    return {
+        'high': high,
+        'low': low,
+        'close': close,
+        'open': None if open_price is None else np.asarray(open_price, dtype=np.float64),
+        'range': high - low,
+        'typical': (high + low + close) / 3,
+    }
+
+
+def _floor_levels(pivot, high, low, price_range):
+    # 经典和伍迪只是枢轴点 P 的取法不同
+    return {
+        'pivot': pivot,
+        'r1': (2 * pivot) - low,
+        'r2': pivot + price_range,
+        'r3': high + 2 * (pivot - low),
+        's1': (2 * pivot) - high,
+        's2': pivot - price_range,
+        's3': low - 2 * (high - pivot)
+    }
+
+
+def _classic(t):
+    return _floor_levels(t['typical'], t['high'], t['low'], t['range'])
+
+
+def _woodie(t):
+    pivot = (t['high'] + t['low'] + 2 * t['close']) / 4
+    return _floor_levels(pivot, t['high'], t['low'], t['range'])
+
+
+def _fibonacci(t):
+    pivot, price_range = t['typical'], t['range']
+    return {
+        'pivot': pivot,
+        'r1': pivot + 0.382 * price_range,
+        'r2': pivot + 0.618 * price_range,
+        'r3': pivot + price_range,
+        's1': pivot - 0.382 * price_range,
+        's2': pivot - 0.618 * price_range,
+        's3': pivot - price_range
+    }
+
+
+def _camarilla(t):
+    close, step = t['close'], t['range'] * 1.1
+    return {
+        'pivot': t['typical'],
+        'r1': close + step / 12,
+        'r2': close + step / 6,
+        'r3': close + step / 4,
+        's1': close - step / 12,
+        's2': close - step / 6,
+        's3': close - step / 4
+    }
+
+
+def _demark(t):
+    # 迪马克只有一档支撑/压力，其余价位为 NaN；没有开盘价时按平盘处理
+    high, low, close = t['high'], t['low'], t['close']
+    open_price = close if t['open'] is None else t['open']
+    x = np.where(close < open_price, high + 2 * low + close,
+                 np.where(close > open_price, 2 * high + low + close, high + low + 2 * close))
+    missing = np.full_like(x, np.nan)
+    return {
+        'pivot': x / 4,
+        'r1': x / 2 - low,
+        'r2': missing,
+        'r3': missing,
+        's1': x / 2 - high,
+        's2': missing,
+        's3': missing
+    }
+
+
+# 算法注册表：名称 -> (界面显示名, 由中间量计算各价位的函数)
+METHODS = {
+    'classic': ('经典', _classic),
+    'fibonacci': ('斐波那契', _fibonacci),
+    'camarilla': ('卡玛利拉', _camarilla),
+    'woodie': ('伍迪', _woodie),
+    'demark': ('迪马克', _demark),
+}
+
+
+def method_label(method):
+    return METHODS[method][0]
+
+
+def pivot_family(high, low, close, open_price=None, methods=None):
+    """一次算出多种算法，返回 {算法名: 各价位的数组字典}，默认全部算法"""
+    terms = compute_terms(high, low, close, open_price)
+    return {method: METHODS[method][1](terms) for method in (methods or METHODS)}
+
+
+def pivot_arrays(high, low, close, method=DEFAULT_METHOD, open_price=None):
+    """输入 high/low/close 数组（或列表、Series），返回各价位的数组字典"""
+    return METHODS[method][1](compute_terms(high, low, close, open_price))
+
+
+def pivot_points(data, method=DEFAULT_METHOD):
+    """在 OHLC DataFrame 上追加枢轴点列，每一行用本行的 OHLC 计算"""
+    levels = pivot_arrays(data['high'].to_numpy(),
+                          data['low'].to_numpy(),
+                          data['close'].to_numpy(),
+                          method=method,
+                          open_price=data['open'].to_numpy() if 'open' in data else None)
+    result = data.copy()
+    for name in LEVELS:
+        result[name] = levels[name]
+    return result
+
+
+def calculate_pivot_points(high, low, close, open_price=None, method=DEFAULT_METHOD):
+    """单根K线的枢轴点，返回 float 字典"""
+    levels = pivot_arrays(high, low, close, method=method, open_price=open_price)
+    return {name: float(levels[name]) for name in LEVELS}
@@ -0,0 +1,297 @@
+"""行情数据源：baostock、本地文件（CSV/Parquet）和合成数据三种实现，接口与 baostock 的查询函数对应，
+返回同样结构的 DataFrame。通过环境变量 FINCE_PROVIDER 或命令行 --provider 选择：
+
+    baostock                                  默认，在线查询
+    local:fixtures/                           读取目录中的 CSV/Parquet 文件
+    synthetic:latency=0.2,error_rate=0.05     随机游走数据，可注入延迟和错误
+
+K线（history）按 columnar 的列类型返回：date 为 datetime64，价格为 float64，
+其余查询与 baostock 一样全部是字符串。
+
+本地目录的文件布局:
+    stocks.csv                  code,code_name
+    trade_dates.csv             calendar_date（只列交易日；缺省时取各日线文件日期的并集）
+    <code>.<frequency>.csv      例如 sh.600519.d.csv、sh.600519.5.parquet，
+                                列为 date[,time],open,high,low,close
+    <code>.adjust.csv           date,factor（除权除息日及后复权因子，缺省时视为没有除权）
+"""
+import datetime
+import glob
+import os
+import random
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import columnar
+
+ENV_VAR = 'FINCE_PROVIDER'
+DEFAULT_SPEC = 'baostock'
+MINUTE_FREQUENCIES = ('5', '15', '30', '60')
+# 查询全部复权因子时的起始日期
+FIRST_DATE = '1990-01-01'
+
+
+def _filter_dates(data, start_date, end_date, column='date'):
+    if data.empty:
+        return data
+    mask = (data[column] >= start_date) & (data[column] <= end_date)
+    return data[mask].reset_index(drop=True)
+
+
+class BaostockProvider:
+    name = 'baostock'
+    # None 表示使用默认的本地缓存库 market_data.db
+    cache_path = None
+
+    def __init__(self):
+        # 只有选用 baostock 时才导入并登录，离线数据源不依赖 baostock
+        import baostock as bs
+        from bs_session import session
+        self._bs = bs
+        self._session = session
+
+    def stock_basic(self, code=None):
+        """code 为 None 时返回全部证券（代码表用）"""
+        return self._session.query(self._bs.query_stock_basic, code=code or '')
+
+    def history(self, code, fields, frequency, start_date, end_date):
+        return self._session.query(self._bs.query_history_k_data_plus, code, fields,
+                                   start_date=start_date, end_date=end_date,
+                                   frequency=frequency, parse=columnar.parse_result)
+
+    def adjust_factors(self, code, start_date, end_date):
+        """除权除息日及当日起生效的后复权因子，列为 date、factor"""
+        data = self._session.query(self._bs.query_adjust_factor, code=code,
+                                   start_date=start_date, end_date=end_date)
+        if data.empty:
+            return pd.DataFrame(columns=['date', 'factor'])
+        return pd.DataFrame({'date': data['dividOperateDate'],
+                             'factor': data['backAdjustFactor'].astype(np.float64)})
+
+    def trade_dates(self, start_date, end_date):
+        return self._session.query(self._bs.query_trade_dates,
+                                   start_date=start_date, end_date=end_date)
+
+    def all_stock(self, day):
+        return self._session.query(self._bs.query_all_stock, day=day)
+
+
+class LocalFileProvider:
+    name = 'local'
+    # 回放数据不写入真实行情的缓存库
+    cache_path = ':memory:'
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._frames = {}
+
+    def _read(self, stem):
+        with self._lock:
+            if stem not in self._frames:
+                data = None
+                csv_path = os.path.join(self.root, stem + '.csv')
+                parquet_path = os.path.join(self.root, stem + '.parquet')
+                # 与 baostock 一样全部按字符串返回，由调用方转换类型
+                if os.path.exists(csv_path):
+                    data = pd.read_csv(csv_path, dtype=str)
+                elif os.path.exists(parquet_path):
+                    data = pd.read_parquet(parquet_path).astype(str)
+                self._frames[stem] = data
+            return self._frames[stem]
+
+    def stock_basic(self, code=None):
+        stocks = self._read('stocks')
+        if stocks is None:
+            if code is None:
+                return pd.DataFrame(columns=['code', 'code_name'])
+            return pd.DataFrame({'code': [code], 'code_name': [code]})
+        if code is None:
+            return stocks
+        return stocks[stocks['code'] == code].reset_index(drop=True)
+
+    def history(self, code, fields, frequency, start_date, end_date):
+        data = self._read(f'{code}.{frequency}')
+        if data is None:
+            return columnar.empty_frame(fields.split(','))
+        return columnar.typed_frame(_filter_dates(data, start_date, end_date)[fields.split(',')])
+
+    def adjust_factors(self, code, start_date, end_date):
+        data = self._read(f'{code}.adjust')
+        if data is None:
+            return pd.DataFrame(columns=['date', 'factor'])
+        data = _filter_dates(data, start_date, end_date)
+        return pd.DataFrame({'date': data['date'], 'factor': data['factor'].astype(np.float64)})
+
+    def trade_dates(self, start_date, end_date):
+        dates = self._read('trade_dates')
+        if dates is None:
+            days = set()
+            for path in glob.glob(os.path.join(self.root, '*.d.*')):
+                stem = os.path.basename(path).rsplit('.', 1)[0]
+                days.update(self._read(stem)['date'])
+            dates = pd.DataFrame({'calendar_date': sorted(days)})
+        calendar = pd.DataFrame({'calendar_date': pd.date_range(start_date, end_date)
+                                 .strftime('%Y-%m-%d')})
+        calendar['is_trading_day'] = np.where(
+            calendar['calendar_date'].isin(dates['calendar_date']), '1', '0')
+        return calendar
+
+    def all_stock(self, day):
+        stocks = self._read('stocks')
+        if stocks is None or day not in set(self.trade_dates(day, day)
+                                            .query("is_trading_day == '1'")['calendar_date']):
+            return pd.DataFrame(columns=['code', 'code_name'])
+        return stocks[['code', 'code_name']]
+
+
+class SyntheticProvider:
+    """确定性的随机游走行情：同一代码、同一种子每次生成的数据相同；
+    latency 为每次请求的延迟（秒），error_rate 为请求失败（抛出 RuntimeError）的概率"""
+    name = 'synthetic'
+    cache_path = ':memory:'
+    ORIGIN = '2000-01-03'
+    SYMBOLS = 50
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = float(latency)
+        self.error_rate = float(error_rate)
+        self.seed = int(seed)
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def _request(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            failed = self._rng.random() < self.error_rate
+        if failed:
+            raise RuntimeError("合成数据源模拟的请求失败")
+
+    def _daily(self, code, end_date):
+        days = pd.bdate_range(self.ORIGIN, end_date)
+        rng = np.random.default_rng([self.seed, zlib.crc32(code.encode())])
+        n = len(days)
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        open_price = close * np.exp(rng.normal(0, 0.01, n))
+        high = np.maximum(open_price, close) * (1 + rng.random(n) * 0.02)
+        low = np.minimum(open_price, close) * (1 - rng.random(n) * 0.02)
+        return pd.DataFrame({'date': days.strftime('%Y-%m-%d'), 'open': open_price,
+                             'high': high, 'low': low, 'close': close})
+
+    def _periodic(self, daily, rule):
+        # 周线、月线日期取周期内最后一个交易日；与 baostock 一样，没走完的周期没有K线
+        periods = pd.to_datetime(daily['date']).dt.to_period(rule)
+        data = daily.groupby(periods, sort=True).agg(
+            date=('date', 'last'), open=('open', 'first'), high=('high', 'max'),
+            low=('low', 'min'), close=('close', 'last')).reset_index(drop=True)
+        if len(data):
+            period_end = periods.iloc[-1].end_time.normalize()
+            last_day = pd.bdate_range(periods.iloc[-1].start_time, period_end)[-1]
+            if data['date'].iloc[-1] < last_day.strftime('%Y-%m-%d'):
+                data = data.iloc[:-1]
+        return data
+
+    def _minutes(self, code, frequency, daily):
+        from intraday import session_times
+        rows = []
+        for bar in daily.itertuples(index=False):
+            times = session_times(frequency)
+            rng = np.random.default_rng([self.seed, zlib.crc32(f'{code}{bar.date}'.encode())])
+            # 从开盘价走到收盘价的布朗桥，再裁剪到当日最高/最低价之间
+            steps = np.cumsum(rng.normal(0, 1, len(times)))
+            steps -= np.linspace(0, steps[-1], len(times))
+            path = np.linspace(bar.open, bar.close, len(times)) + steps * (bar.high - bar.low) / 10
+            path = np.clip(path, bar.low, bar.high)
+            previous = np.concatenate([[bar.open], path[:-1]])
+            stamp = bar.date.replace('-', '')
+            for t, o, c in zip(times, previous, path):
+                rows.append({'date': bar.date, 'time': f"{stamp}{t.replace(':', '')}00000",
+                             'open': o, 'high': max(o, c), 'low': min(o, c), 'close': c})
+        return pd.DataFrame(rows, columns=['date', 'time', 'open', 'high', 'low', 'close'])
+
+    def _codes(self):
+        return ([f'sh.{600000 + i}' for i in range(self.SYMBOLS // 2)]
+                + [f'sz.{i + 1:06d}' for i in range(self.SYMBOLS - self.SYMBOLS // 2)])
+
+    def stock_basic(self, code=None):
+        self._request()
+        if code is None:
+            # 全部证券，另加一个与 sz.000001 同号的指数
+            codes = self._codes() + ['sh.000001']
+            return pd.DataFrame({'code': codes,
+                                 'code_name': [f'合成{c[-6:]}' for c in codes[:-1]] + ['合成指数'],
+                                 'type': ['1'] * (len(codes) - 1) + ['2'],
+                                 'status': ['1'] * len(codes)})
+        return pd.DataFrame({'code': [code], 'code_name': [f'合成{code[-6:]}']})
+
+    def history(self, code, fields, frequency, start_date, end_date):
+        self._request()
+        daily = self._daily(code, end_date)
+        if frequency in ('w', 'm'):
+            data = self._periodic(daily, frequency.upper())
+        elif frequency in MINUTE_FREQUENCIES:
+            data = self._minutes(code, frequency, _filter_dates(daily, start_date, end_date))
+        else:
+            data = daily
+        data = _filter_dates(data, start_date, end_date)
+        return columnar.typed_frame(data[fields.split(',')])
+
+    def adjust_factors(self, code, start_date, end_date):
+        # 合成行情没有分红送转
+        self._request()
+        return pd.DataFrame(columns=['date', 'factor'])
+
+    def trade_dates(self, start_date, end_date):
+        self._request()
+        days = pd.date_range(start_date, end_date)
+        return pd.DataFrame({'calendar_date': days.strftime('%Y-%m-%d'),
+                             'is_trading_day': np.where(days.weekday < 5, '1', '0')})
+
+    def all_stock(self, day):
+        self._request()
+        if datetime.date.fromisoformat(day).weekday() >= 5:
+            return pd.DataFrame(columns=['code', 'code_name'])
+        codes = self._codes()
+        return pd.DataFrame({'code': codes, 'code_name': [f'合成{c[-6:]}' for c in codes]})
+
+
+def create_provider(spec):
+    """按配置字符串创建数据源，格式见模块说明"""
+    name, _, options = (spec or DEFAULT_SPEC).partition(':')
+    if name == 'baostock':
+        return BaostockProvider()
+    if name == 'local':
+        if not options:
+            raise ValueError("local 数据源需要指定目录，例如 local:fixtures/")
+        return LocalFileProvider(options)
+    if name == 'synthetic':
+        kwargs = dict(item.split('=', 1) for item in options.split(',') if item)
+        return SyntheticProvider(**kwargs)
+    raise ValueError(f"未知的数据源: {spec}")
+
+
+_default_provider = None
+_default_lock = threading.Lock()
+
+
+def configure(spec):
+    """切换数据源；同时写入环境变量，让扫描、回测的工作进程使用同一个数据源"""
+    global _default_provider
+    provider = create_provider(spec)
+    with _default_lock:
+        os.environ[ENV_VAR] = spec
+        _default_provider = provider
+    return provider
+
+
+def get_provider():
+    global _default_provider
+    with _default_lock:
+        if _default_provider is None:
+            _default_provider = create_provider(os.environ.get(ENV_VAR, DEFAULT_SPEC))
+    return _default_provider
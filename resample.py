@@ -0,0 +1,75 @@
+"""由日线合成周线、月线：开盘取周期内第一根、最高取最大、最低取最小、收盘取最后一根，
+日期取周期内最后一个交易日（与 baostock 的周线、月线一致），成交量、成交额求和。
+按交易日历判断周期是否已经走完，不再为周线、月线单独请求数据源"""
+import numpy as np
+import pandas as pd
+
+import trade_calendar
+
+PERIODS = {'w': '周线', 'm': '月线'}
+SUM_COLUMNS = ('volume', 'amount')
+
+
+def period_keys(dates, period):
+    """每个日期所属周期的整数编号：周从周一开始，月为自然月"""
+    days = np.asarray(dates, dtype='datetime64[D]')
+    if period == 'w':
+        # 1970-01-01 是周四，加 3 天后按 7 整除得到以周一为起点的周序号
+        return (days.astype(np.int64) + 3) // 7
+    if period == 'm':
+        return days.astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"未知的周期: {period}，可选 {', '.join(PERIODS)}")
+
+
+def _period_last_days(keys, period):
+    # 各周期的最后一个自然日（周日或月末）
+    if period == 'w':
+        return (keys * 7 + 3).astype('datetime64[D]')
+    return ((keys + 1).astype('datetime64[M]').astype('datetime64[D]') - np.timedelta64(1, 'D'))
+
+
+def last_trading_days(keys, period, calendar=None):
+    """各周期按交易日历的最后一个交易日；整个周期休市时为 NaT"""
+    calendar = calendar or trade_calendar.get_calendar()
+    first = np.datetime64(int(keys.min()) * 7 - 3, 'D') if period == 'w' else \
+        np.datetime64(int(keys.min()), 'M').astype('datetime64[D]')
+    last = _period_last_days(keys.max(), period)
+    days = np.array(calendar.between(str(first), str(last)), dtype='datetime64[D]')
+    result = np.full(len(keys), np.datetime64('NaT'), dtype='datetime64[D]')
+    if len(days):
+        day_keys = period_keys(days, period)
+        idx = np.searchsorted(day_keys, keys, side='right') - 1
+        found = (idx >= 0) & (day_keys[np.maximum(idx, 0)] == keys)
+        result[found] = days[idx[found]]
+    return result
+
+
+def resample_bars(daily, period='w', complete_only=False, calendar=None):
+    """daily 为按日期升序的日线（columnar 的列类型）；complete_only 时去掉还没走完的周期，
+    即最后一根日线早于该周期最后一个交易日的周期，与 baostock 只在周期结束后才有周线、月线一致"""
+    if daily.empty:
+        return daily.iloc[:0].copy()
+    dates = np.asarray(daily['date'], dtype='datetime64[D]')
+    keys = period_keys(dates, period)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+
+    columns = {}
+    for column in daily.columns:
+        values = daily[column].to_numpy()
+        if column == 'open':
+            columns[column] = values[starts]
+        elif column == 'high':
+            columns[column] = np.maximum.reduceat(values.astype(np.float64), starts)
+        elif column == 'low':
+            columns[column] = np.minimum.reduceat(values.astype(np.float64), starts)
+        elif column in SUM_COLUMNS:
+            columns[column] = np.add.reduceat(values.astype(np.float64), starts)
+        else:
+            columns[column] = values[ends]
+    result = pd.DataFrame(columns)
+
+    if complete_only:
+        complete = dates[ends] >= last_trading_days(keys[starts], period, calendar)
+        result = result[complete].reset_index(drop=True)
+    return result
@@ -0,0 +1,162 @@
+"""批量扫描：对自选列表或全市场计算日线/周线枢轴点，并按收盘价离最近支撑/压力位的距离排序
+
+用法:
+    python scanner.py --watchlist codes.txt --date 2024-05-10
+    python scanner.py --all --top 50 --output scan.csv
+"""
+import argparse
+import concurrent.futures
+import datetime
+import sys
+
+import numpy as np
+import pandas as pd
+
+import providers
+from columnar import date_string
+from pivots import DEFAULT_METHOD, LEVELS, METHODS, pivot_arrays
+from stock_data import load_bars, normalize_code
+
+# 沪深A股代码前缀：沪市主板/科创板、深市主板/中小板/创业板
+A_SHARE_PREFIXES = ('sh.60', 'sh.68', 'sz.00', 'sz.30')
+
+
+def load_watchlist(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [normalize_code(line.split('#')[0])
+                for line in f if line.split('#')[0].strip()]
+
+
+def query_trade_status(end_date, max_back_days=10):
+    """end_date 或之前最近一个有数据的交易日及当天沪深A股的交易状态，返回 (日期, {代码: 是否交易})；
+    tradeStatus 为 '0' 表示停牌，没有该列的数据源视为都在交易"""
+    # 非交易日（或当天还没发布时）query_all_stock 返回空表，向前找到最近的交易日
+    day = datetime.date.fromisoformat(end_date)
+    for _ in range(max_back_days):
+        stocks = providers.get_provider().all_stock(day.isoformat())
+        if not stocks.empty:
+            stocks = stocks[stocks['code'].str.startswith(A_SHARE_PREFIXES)]
+            trading = stocks['tradeStatus'] != '0' if 'tradeStatus' in stocks else [True] * len(stocks)
+            return day.isoformat(), dict(zip(stocks['code'], trading))
+        day -= datetime.timedelta(days=1)
+    raise RuntimeError(f"{end_date} 前 {max_back_days} 天内没有找到交易日")
+
+
+def query_universe(end_date, max_back_days=10):
+    return sorted(query_trade_status(end_date, max_back_days)[1])
+
+
+def scan_symbol(code, end_date, method=DEFAULT_METHOD):
+    """在工作进程中执行：取日线（走本地缓存）并合成周线，返回最近一根K线的枢轴点"""
+    daily, weekly = load_bars(code, end_date, lookback=1)
+    if daily.empty or weekly.empty:
+        return None
+
+    last_day = daily.iloc[-1]
+    last_week = weekly.iloc[-1]
+    row = {'code': code, 'date': date_string(last_day['date']),
+           'close': float(last_day['close'])}
+    day_levels = pivot_arrays(last_day['high'], last_day['low'], last_day['close'],
+                              method=method, open_price=last_day['open'])
+    week_levels = pivot_arrays(last_week['high'], last_week['low'], last_week['close'],
+                               method=method, open_price=last_week['open'])
+    for name in LEVELS:
+        row[name] = float(day_levels[name])
+        row['w' + name] = float(week_levels[name])
+    return row
+
+
+def _scan_one(args):
+    code = args[0]
+    try:
+        return scan_symbol(*args), None
+    except Exception as e:
+        return None, f"{code}: {e}"
+
+
+def rank_by_distance(result):
+    """按收盘价到最近支撑/压力位的相对距离升序排列"""
+    level_columns = LEVELS + ['w' + name for name in LEVELS]
+    levels = result[level_columns].to_numpy(dtype=np.float64)
+    close = result['close'].to_numpy(dtype=np.float64)[:, None]
+
+    below = np.where(levels <= close, levels, -np.inf)
+    above = np.where(levels > close, levels, np.inf)
+    support_idx = below.argmax(axis=1)
+    resistance_idx = above.argmin(axis=1)
+    rows = np.arange(len(result))
+    support = below[rows, support_idx]
+    resistance = above[rows, resistance_idx]
+
+    ranked = result.copy()
+    ranked['support'] = np.where(np.isfinite(support), support, np.nan)
+    ranked['support_level'] = np.array(level_columns)[support_idx]
+    ranked['resistance'] = np.where(np.isfinite(resistance), resistance, np.nan)
+    ranked['resistance_level'] = np.array(level_columns)[resistance_idx]
+    ranked.loc[ranked['support'].isna(), 'support_level'] = ''
+    ranked.loc[ranked['resistance'].isna(), 'resistance_level'] = ''
+    distance = np.fmin(close[:, 0] - support, resistance - close[:, 0])
+    ranked['distance_pct'] = distance / close[:, 0] * 100
+    return ranked.sort_values('distance_pct', ignore_index=True)
+
+
+def scan(codes, end_date, workers=4, method=DEFAULT_METHOD):
+    """并发扫描：每个工作进程有自己的 baostock 连接（baostock 单进程内只有一个全局 socket）"""
+    rows, errors = [], []
+    tasks = [(code, end_date, method) for code in codes]
+
+    def collect(outcomes):
+        for row, error in outcomes:
+            if row:
+                rows.append(row)
+            if error:
+                errors.append(error)
+
+    if workers <= 1:
+        collect(map(_scan_one, tasks))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            collect(pool.map(_scan_one, tasks, chunksize=16))
+    if not rows:
+        return pd.DataFrame(), errors
+    return rank_by_distance(pd.DataFrame(rows)), errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量计算枢轴点并按距离最近支撑/压力位排序")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--watchlist', help="股票代码文件，每行一个代码")
+    source.add_argument('--all', action='store_true', help="扫描全部沪深A股")
+    parser.add_argument('--date', default=datetime.date.today().isoformat(),
+                        help="截止日期 YYYY-MM-DD，默认今天")
+    parser.add_argument('--workers', type=int, default=4, help="并发进程数")
+    parser.add_argument('--method', choices=list(METHODS), default=DEFAULT_METHOD,
+                        help="枢轴点算法")
+    parser.add_argument('--top', type=int, default=0, help="只输出前 N 个")
+    parser.add_argument('--output', help="结果写入 CSV 文件，默认输出到终端")
+    parser.add_argument('--provider', help="数据源，例如 local:fixtures/、synthetic:latency=0.1，"
+                                           "默认取环境变量 FINCE_PROVIDER 或 baostock")
+    args = parser.parse_args(argv)
+    if args.provider:
+        providers.configure(args.provider)
+
+    codes = load_watchlist(args.watchlist) if args.watchlist else query_universe(args.date)
+    result, errors = scan(codes, args.date, workers=args.workers, method=args.method)
+    for error in errors:
+        print(f"扫描失败 {error}", file=sys.stderr)
+    if result.empty:
+        print("没有扫描到数据", file=sys.stderr)
+        return 1
+    if args.top:
+        result = result.head(args.top)
+    if args.output:
+        result.to_csv(args.output, index=False, encoding='utf-8-sig')
+    else:
+        columns = ['code', 'date', 'close', 'support_level', 'support',
+                   'resistance_level', 'resistance', 'distance_pct']
+        print(result[columns].to_string(index=False, float_format=lambda v: f'{v:.2f}'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""进程内的请求合并：同一个键同时只有一次上游调用在执行，期间到达的相同请求共享它的结果或异常。
+调用方应把共享的结果当作只读"""
+import concurrent.futures
+import threading
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        # 上游实际调用次数、被合并掉的请求数，供缓存统计显示
+        self.executed = 0
+        self.shared = 0
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._calls[key] = concurrent.futures.Future()
+            self.executed += 1
+            return future, True
+
+    def _forget(self, key, future):
+        # 先移出再通知：之后到达的请求重新发起，不会拿到已经过期的结果
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def do(self, key, func, *args):
+        """在当前线程执行（或等待正在执行的同键调用），返回结果"""
+        future, leader = self._join(key)
+        if leader:
+            try:
+                result = func(*args)
+            except Exception as e:
+                self._forget(key, future)
+                future.set_exception(e)
+                raise
+            self._forget(key, future)
+            future.set_result(result)
+            return result
+        return future.result()
+
+    def submit(self, key, submit, func, *args):
+        """用 submit(func, *args) 把调用交给线程池，返回 Future；同键的请求拿到同一个 Future，
+        等待时不占用线程池"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future
+            future = self._calls[key] = submit(func, *args)
+            self.executed += 1
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
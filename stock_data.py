@@ -0,0 +1,147 @@
+"""两个前端共用的数据获取：股票名称取自本地代码表（表里没有时才查询基本信息），日线查询与之并发执行，
+周线由日线在本地合成，结果汇总后再交给绘图"""
+import concurrent.futures
+import contextvars
+import datetime
+
+import numpy as np
+
+import bar_cache
+import providers
+import resample
+import symbols
+import timing
+import trade_calendar
+from single_flight import SingleFlight
+
+DEFAULT_LOOKBACK = 3
+
+CHINA_TZ = datetime.timezone(datetime.timedelta(hours=8))
+# 沪深连续竞价时段（含开盘集合竞价）
+TRADING_SESSIONS = ((datetime.time(9, 15), datetime.time(11, 30)),
+                    (datetime.time(13, 0), datetime.time(15, 0)))
+
+# 与 bs_session 的连接数一致，每个查询占一个连接
+_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=3, thread_name_prefix='stock-data')
+
+
+def _submit(func, *args):
+    # 带上当前的 contextvars，工作线程里的耗时记录归到发起请求的 trace 下
+    return _executor.submit(contextvars.copy_context().run, func, *args)
+
+
+# 多个会话同时查询同一只股票时共用进行中的请求，等待者不占用线程池；结果只读，共享同一个 DataFrame
+_flight = SingleFlight()
+
+
+def _stock_basic(code):
+    with timing.span('stock_basic', 'network'):
+        return providers.get_provider().stock_basic(code)
+
+
+def normalize_code(code):
+    """补全交易所前缀，只查本地代码表，见 symbols.SymbolMaster.resolve"""
+    return symbols.get_master().resolve(code)
+
+
+def data_version(end_date, live_interval=60, evening_interval=1800, now=None):
+    """行情数据的版本号，用作缓存键：交易时段内每 live_interval 秒变化一次，
+    收盘后等待当日数据入库期间每 evening_interval 秒变化一次，其余时间不变"""
+    now = now or datetime.datetime.now(CHINA_TZ)
+    today = now.date()
+    if end_date < today.isoformat():
+        return 'final'
+    if now.weekday() >= 5:
+        return today.isoformat()
+    now_time = now.time()
+    for session_start, session_end in TRADING_SESSIONS:
+        if session_start <= now_time <= session_end:
+            return f'live-{int(now.timestamp()) // live_interval}'
+    if now_time > TRADING_SESSIONS[-1][1]:
+        return f'evening-{int(now.timestamp()) // evening_interval}'
+    # 盘前和午休期间数据不会变化
+    phase = 'noon' if now_time > TRADING_SESSIONS[0][1] else 'pre'
+    return f'{today.isoformat()}-{phase}'
+
+
+def fetch_windows(end_date, lookback=DEFAULT_LOOKBACK):
+    """按交易日历计算日线、周线的请求起始日期，只请求需要的那几根K线"""
+    calendar = trade_calendar.get_calendar()
+    # 多取一个交易日，当天K线还没入库时仍能凑够 lookback 根
+    days = calendar.trading_days(end_date, lookback + 1)
+    start_date = days[0] if days else end_date
+
+    # 周线从上一个有交易的周的第一个交易日开始，本周的周线可能还没生成
+    this_week = calendar.trading_week(end_date)
+    previous = calendar.previous_trading_days(this_week[0] if this_week else end_date, 1)
+    last_week = calendar.trading_week(previous[-1]) if previous else []
+    week_start = last_week[0] if last_week else start_date
+    return start_date, week_start
+
+
+def split_bars(bars, start_date, week_start_date):
+    """把一次取到的日线拆成 start_date 起的日线，以及由 week_start_date 起的日线合成的已走完的周线"""
+    dates = bars['date'].to_numpy(dtype='datetime64[D]')
+    daily = bars[dates >= np.datetime64(start_date)].reset_index(drop=True)
+    with timing.span('resample', 'compute', period='w'):
+        weekly = resample.resample_bars(
+            bars[dates >= np.datetime64(week_start_date)].reset_index(drop=True),
+            'w', complete_only=True)
+    return daily, weekly
+
+
+def _month_start(end_date):
+    # 上个月的第一天：end_date 所在月没走完时，最近一根月线是上个月的
+    day = datetime.date.fromisoformat(end_date).replace(day=1) - datetime.timedelta(days=1)
+    return day.replace(day=1).isoformat()
+
+
+def last_bars(code, end_date):
+    """end_date 当天或之前最近的日线，以及由同一段日线合成的已走完的周线、月线，
+    返回 {'daily', 'weekly', 'monthly'}；只向缓存请求一段日线"""
+    start_date, week_start_date = fetch_windows(end_date, lookback=1)
+    first = min(start_date, week_start_date, _month_start(end_date))
+    bars = bar_cache.get_cache().get_bars(normalize_code(code), 'd', first, end_date)
+    daily, weekly = split_bars(bars, start_date, week_start_date)
+    return {'daily': daily, 'weekly': weekly,
+            'monthly': resample.resample_bars(bars, 'm', complete_only=True)}
+
+
+def load_bars(code, end_date, lookback=DEFAULT_LOOKBACK):
+    """同步版本：返回 (日线, 周线)，只向缓存请求一段日线；供扫描、命令行等批量工具使用"""
+    start_date, week_start_date = fetch_windows(end_date, lookback)
+    first = min(start_date, week_start_date)
+    bars = bar_cache.get_cache().get_bars(normalize_code(code), 'd', first, end_date)
+    return split_bars(bars, start_date, week_start_date)
+
+
+def fetch_stock_data(code, end_date, lookback=DEFAULT_LOOKBACK):
+    """返回 {'daily', 'weekly', 'name', 'code', 'lookback'}，daily 至少覆盖最近 lookback 个交易日；
+    找不到股票时抛出 LookupError"""
+    code = normalize_code(code)
+    name = symbols.get_master().name(code)
+    # 代码表还没建好或是新上市的代码时才查询基本信息
+    info_future = None if name else _flight.submit(('basic', code), _submit, _stock_basic, code)
+    start_date, week_start_date = fetch_windows(end_date, lookback)
+
+    # 周线所需的日线一并取回，本地合成周线，省掉单独的周线查询
+    first = min(start_date, week_start_date)
+    cache = bar_cache.get_cache()
+    bars_future = _flight.submit((code, 'd', first, end_date), _submit,
+                                 cache.get_bars, code, 'd', first, end_date)
+
+    if info_future is not None:
+        stock_info = info_future.result()
+        if stock_info.empty:
+            raise LookupError("没有找到股票信息")
+        name = stock_info['code_name'][0]
+    daily_data, weekly_data = split_bars(bars_future.result(), start_date, week_start_date)
+
+    return {
+        'daily': daily_data,
+        'weekly': weekly_data,
+        'name': name,
+        'code': code,
+        'lookback': lookback
+    }
@@ -0,0 +1,319 @@
+"""证券代码表：定期从 query_stock_basic 取全部证券（股票、指数、ETF 等）落盘到本地库，
+内存中按代码、名称、拼音首字母建有序前缀索引，用二分查找做输入联想；
+代码补全交易所前缀（sh./sz./bj.）和取股票名称都只查本地，不再请求服务器
+
+用法:
+    python symbols.py build
+    python symbols.py search gzmt
+"""
+import argparse
+import bisect
+import datetime
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+import bar_cache
+import providers
+import timing
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:
+    # 没有安装 pypinyin 时按 GB2312 编码顺序取一级汉字的首字母，常见多音词先查 _POLYPHONIC_WORDS，
+    # 二级汉字取不到首字母
+    lazy_pinyin = None
+
+# 代码表超过这么多天未更新时重新获取
+REFRESH_DAYS = 7
+# query_stock_basic 的 type 字段
+TYPES = {'1': '股票', '2': '指数', '3': '其它', '4': '可转债', '5': 'ETF'}
+# 同一个数字代码对应多个证券时（如 sh.000001 上证指数与 sz.000001 平安银行）优先股票
+_TYPE_ORDER = {'1': 0, '5': 1, '2': 2, '4': 3, '3': 4}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbols (
+    code TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    initials TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbol_builds (
+    built_on TEXT NOT NULL
+);
+"""
+
+# GB2312 一级汉字按拼音排序，各首字母的起始编码（没有 I、U、V 开头的拼音）
+_GB2312_INITIALS = (
+    (0xB0A1, 'a'), (0xB0C5, 'b'), (0xB2C1, 'c'), (0xB4EE, 'd'), (0xB6EA, 'e'), (0xB7A2, 'f'),
+    (0xB8C1, 'g'), (0xB9FE, 'h'), (0xBBF7, 'j'), (0xBFA6, 'k'), (0xC0AC, 'l'), (0xC2E8, 'm'),
+    (0xC4C3, 'n'), (0xC5B6, 'o'), (0xC5BE, 'p'), (0xC6DA, 'q'), (0xC8BB, 'r'), (0xC8F6, 's'),
+    (0xCBFA, 't'), (0xCDDA, 'w'), (0xCEF4, 'x'), (0xD1B9, 'y'), (0xD4D1, 'z'))
+_GB2312_LEVEL1_END = 0xD7F9
+_GB2312_STARTS = [start for start, _ in _GB2312_INITIALS]
+# 证券名称里常见的多音词，GB2312 排序取的是另一个读音（如 重庆 按 zhong、银行 按 xing）
+_POLYPHONIC_WORDS = {
+    '重庆': 'cq', '银行': 'yh', '商行': 'sh', '行业': 'hy', '西藏': 'xz', '藏药': 'zy',
+    '音乐': 'yy', '调味': 'tw', '单县': 'sx', '乐器': 'yq',
+}
+
+
+def _gb2312_initial(char):
+    try:
+        encoded = char.encode('gb2312')
+    except UnicodeEncodeError:
+        return ''
+    if len(encoded) != 2:
+        return ''
+    value = encoded[0] << 8 | encoded[1]
+    if not _GB2312_STARTS[0] <= value <= _GB2312_LEVEL1_END:
+        return ''
+    return _GB2312_INITIALS[bisect.bisect_right(_GB2312_STARTS, value) - 1][1]
+
+
+def pinyin_initials(name):
+    """名称的拼音首字母，字母和数字原样保留（小写），其余符号去掉，例如 '*ST海润' -> 'sthr'"""
+    # 全角字母（如 '万科Ａ'）先转成半角
+    name = unicodedata.normalize('NFKC', name)
+    if lazy_pinyin is not None:
+        parts = lazy_pinyin(name, style=Style.FIRST_LETTER)
+        return ''.join(ch for ch in ''.join(parts).lower() if ch.isascii() and ch.isalnum())
+    letters = []
+    i = 0
+    while i < len(name):
+        word = _POLYPHONIC_WORDS.get(name[i:i + 2])
+        if word:
+            letters.append(word)
+            i += 2
+            continue
+        char = name[i]
+        if char.isascii():
+            if char.isalnum():
+                letters.append(char.lower())
+        else:
+            letters.append(_gb2312_initial(char))
+        i += 1
+    return ''.join(letters)
+
+
+def guess_exchange(digits):
+    """代码表里没有的代码按编号规则推断交易所：北交所 4/8/92 开头，沪市 5/6/9、11 开头，其余深市"""
+    if digits.startswith(('4', '8', '92')):
+        return 'bj'
+    if digits.startswith(('5', '6', '9', '11')):
+        return 'sh'
+    return 'sz'
+
+
+def _split_code(text):
+    # 'sh.600519'、'SH600519'、'600519.SH' 拆成 ('sh', '600519')；没有交易所时返回 (None, text)
+    text = text.strip().lower()
+    for exchange in ('sh', 'sz', 'bj'):
+        if text.startswith(exchange) and text[2:].lstrip('.').isdigit():
+            return exchange, text[2:].lstrip('.')
+        if text.endswith('.' + exchange) and text[:-3].isdigit():
+            return exchange, text[:-3]
+    return None, text
+
+
+def query_symbols():
+    """从数据源取全部证券，返回 (code, name, type, status, initials) 列表"""
+    with timing.span('symbols', 'network'):
+        data = providers.get_provider().stock_basic(None)
+    if data.empty:
+        return []
+    names = data['code_name'].fillna('').astype(str)
+    types = data['type'] if 'type' in data else ['1'] * len(data)
+    statuses = data['status'] if 'status' in data else ['1'] * len(data)
+    return [(code, name, str(kind), str(status), pinyin_initials(name))
+            for code, name, kind, status in zip(data['code'], names, types, statuses)]
+
+
+class _Index:
+    """只读的内存索引，刷新时整体替换，查询不需要加锁"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.by_code = {row[0]: i for i, row in enumerate(rows)}
+        self.by_digits = {}
+        self.exact = {}
+        keys = []
+        for i, (code, name, _, _, initials) in enumerate(rows):
+            digits = code.split('.')[-1]
+            self.by_digits.setdefault(digits, []).append(i)
+            for key in {digits, code, name.lower(), initials}:
+                if key:
+                    keys.append((key, i))
+                    self.exact.setdefault(key, []).append(i)
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.positions = np.array([i for _, i in keys], dtype=np.int64)
+        # 排名：上市中的在前，其次按证券类型、代码；order[r] 为排名 r 的证券
+        self.order = np.array(sorted(range(len(rows)), key=lambda i: (
+            rows[i][3] != '1', _TYPE_ORDER.get(rows[i][2], 9), rows[i][0])), dtype=np.int64)
+        self.rank = np.empty(len(rows), dtype=np.int64)
+        self.rank[self.order] = np.arange(len(rows))
+
+    def best(self, indices):
+        return min(indices, key=self.rank.__getitem__)
+
+    def search(self, query, limit):
+        # 完全匹配的排在前缀匹配之前；范围很大（如只输入 '6'）时用 NumPy 取排名最前的几个
+        exact = sorted(self.exact.get(query, ()), key=self.rank.__getitem__)[:limit]
+        lo = bisect.bisect_left(self.keys, query)
+        hi = bisect.bisect_left(self.keys, query + '\uffff', lo)
+        ranks = np.unique(self.rank[self.positions[lo:hi]])[:limit + len(exact)]
+        prefixed = [i for i in self.order[ranks].tolist() if i not in exact]
+        return (exact + prefixed)[:limit]
+
+
+class SymbolMaster:
+    def __init__(self, path=bar_cache.DB_PATH, fetch=query_symbols):
+        self.path = path
+        self.fetch = fetch
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+            # 全市场一万条左右，启动时整体读入内存
+            rows = self._conn.execute(
+                "SELECT code, name, type, status, initials FROM symbols ORDER BY code").fetchall()
+            built = self._conn.execute("SELECT MAX(built_on) FROM symbol_builds").fetchone()
+        self.built_on = built[0]
+        self._index = _Index(rows)
+
+    def __len__(self):
+        return len(self._index.rows)
+
+    def is_stale(self, today=None):
+        today = today or datetime.date.today()
+        if self.built_on is None:
+            return True
+        return (today - datetime.date.fromisoformat(self.built_on)).days >= REFRESH_DAYS
+
+    def refresh(self, force=False):
+        """代码表过期（或 force）时从数据源重建，返回是否更新；数据源没有返回任何证券时保留旧表"""
+        if not force and not self.is_stale():
+            return False
+        rows = sorted(self.fetch())
+        if not rows:
+            return False
+        today = datetime.date.today().isoformat()
+        with self._lock:
+            self._conn.execute("DELETE FROM symbols")
+            self._conn.executemany("INSERT OR REPLACE INTO symbols VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.execute("DELETE FROM symbol_builds")
+            self._conn.execute("INSERT INTO symbol_builds VALUES (?)", (today,))
+            self._conn.commit()
+        self._index = _Index(rows)
+        self.built_on = today
+        return True
+
+    @staticmethod
+    def _symbol(index, i):
+        code, name, kind, status, _ = index.rows[i]
+        return {'code': code, 'name': name, 'type': TYPES.get(kind, kind), 'listed': status == '1'}
+
+    def search(self, query, limit=10):
+        """按代码、名称或拼音首字母前缀查找，返回 [{'code', 'name', 'type', 'listed'}]，
+        完全匹配和上市中的股票排在前面"""
+        exchange, text = _split_code(query)
+        if exchange:
+            text = f'{exchange}.{text}'
+        if not text:
+            return []
+        index = self._index
+        return [self._symbol(index, i) for i in index.search(text, limit)]
+
+    def resolve(self, code):
+        """补全交易所前缀：带前缀的原样返回，数字代码查代码表（多个匹配时优先股票），
+        也接受完整的名称或拼音首字母；代码表里没有时按编号规则推断"""
+        exchange, text = _split_code(code)
+        if exchange:
+            return f'{exchange}.{text}'
+        index = self._index
+        matches = index.by_digits.get(text)
+        if matches:
+            return index.rows[index.best(matches)][0]
+        if text and not text.isdigit():
+            found = index.search(text, 1)
+            if found and text in (index.rows[found[0]][1].lower(), index.rows[found[0]][4]):
+                return index.rows[found[0]][0]
+        return f'{guess_exchange(text)}.{text}'
+
+    def name(self, code):
+        """代码表中的名称，没有时返回 None"""
+        i = self._index.by_code.get(code)
+        return None if i is None else self._index.rows[i][1]
+
+
+_default_master = None
+_default_lock = threading.Lock()
+_refresh_started = False
+
+
+def get_master():
+    global _default_master
+    with _default_lock:
+        if _default_master is None:
+            _default_master = SymbolMaster(
+                providers.get_provider().cache_path or bar_cache.DB_PATH)
+    return _default_master
+
+
+def start_refresh():
+    """在后台线程里按需重建代码表，每个进程只启动一次；界面启动时调用，不阻塞首次显示"""
+    global _refresh_started
+    with _default_lock:
+        if _refresh_started:
+            return
+        _refresh_started = True
+
+    def run():
+        try:
+            get_master().refresh()
+        except Exception as e:
+            # 离线时继续使用本地旧表和编号规则
+            print(f"更新代码表失败: {e}", file=sys.stderr)
+
+    threading.Thread(target=run, name='symbols-refresh', daemon=True).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="证券代码表")
+    parser.add_argument('--provider', help="数据源，默认取环境变量 FINCE_PROVIDER 或 baostock")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help="从数据源重建代码表")
+    search = commands.add_parser('search', help="按代码、名称或拼音首字母查找")
+    search.add_argument('query')
+    search.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args(argv)
+    if args.provider:
+        providers.configure(args.provider)
+
+    master = get_master()
+    if args.command == 'build':
+        master.refresh(force=True)
+        print(f"代码表共 {len(master)} 条，更新于 {master.built_on}")
+        return 0 if len(master) else 1
+    master.refresh()
+    start = time.perf_counter()
+    results = master.search(args.query, args.limit)
+    elapsed = time.perf_counter() - start
+    for symbol in results:
+        listed = '' if symbol['listed'] else '（已退市）'
+        print(f"{symbol['code']:<12}{symbol['name']}  {symbol['type']}{listed}")
+    print(f"{len(results)} 条，查找耗时 {elapsed * 1e6:.0f} µs（代码表 {len(master)} 条）",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
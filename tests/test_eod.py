@@ -0,0 +1,72 @@
+"""盘后任务的测试：用合成行情和内存库，验证证券列表、当天日线还没发布时的处理"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pytest
+
+import bar_cache
+import eod
+import providers
+import symbols
+import trade_calendar
+
+TRADE_DATE = '2024-05-29'
+SESSION = '2024-05-30'
+
+
+@pytest.fixture
+def synthetic(monkeypatch):
+    monkeypatch.setenv(providers.ENV_VAR, 'synthetic')
+    monkeypatch.setattr(providers, '_default_provider', None)
+    for module, name in ((bar_cache, '_default_cache'), (trade_calendar, '_default_calendar'),
+                         (symbols, '_default_master')):
+        monkeypatch.setattr(module, name, None)
+    return providers.get_provider()
+
+
+def unpublished(provider, monkeypatch, day=TRADE_DATE):
+    # day 当天的证券列表还没发布，query_all_stock 返回空表
+    all_stock = provider.all_stock
+    monkeypatch.setattr(provider, 'all_stock', lambda d: (
+        pd.DataFrame(columns=['code', 'code_name']) if d >= day else all_stock(d)))
+
+
+def test_universe_falls_back_to_previous_trading_day(synthetic, monkeypatch):
+    unpublished(synthetic, monkeypatch)
+    store = eod.LevelStore(':memory:')
+    completed, total, errors = eod.run(TRADE_DATE, workers=1, store=store)
+    assert total == 50 and completed == total and not errors
+    levels = store.session_levels('sh.600000', SESSION)
+    assert levels['daily']['date'] == TRADE_DATE
+    assert store.runs()[0][5] is not None
+
+
+def test_lagging_code_finishes_from_latest_bar_without_trade_status(synthetic, monkeypatch):
+    unpublished(synthetic, monkeypatch)
+    last_bars = eod.last_bars
+    monkeypatch.setattr(eod, 'last_bars', lambda code, date: last_bars(
+        code, '2024-05-28' if code == 'sh.600000' else date))
+    store = eod.LevelStore(':memory:')
+    completed, total, _ = eod.run(TRADE_DATE, workers=1, store=store, batch_size=7)
+    assert completed == total == 50
+    assert store.session_levels('sh.600000', SESSION)['daily']['date'] == '2024-05-28'
+
+
+def test_bars_missing_market_wide_are_retried(synthetic, monkeypatch):
+    last_bars = eod.last_bars
+    monkeypatch.setattr(eod, 'last_bars', lambda code, date: last_bars(code, '2024-05-28'))
+    store = eod.LevelStore(':memory:')
+    completed, total, _ = eod.run(TRADE_DATE, workers=1, store=store)
+    assert (completed, total) == (0, 50)
+    assert store.runs()[0][5] is None
+
+
+def test_empty_universe_fails_the_run(synthetic, monkeypatch):
+    unpublished(synthetic, monkeypatch, day='2000-01-01')
+    store = eod.LevelStore(':memory:')
+    with pytest.raises(RuntimeError):
+        eod.run(TRADE_DATE, workers=1, store=store)
+    assert store.runs() == []
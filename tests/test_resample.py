@@ -0,0 +1,101 @@
+"""由日线合成周线、月线的测试：节假日日历下的周期划分，以及与 baostock 录制夹具的比较
+
+夹具用 python bench/check_resample.py <代码...> --fixtures fixtures/resample --record 录制
+"""
+import glob
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+import pandas as pd
+
+import check_resample
+import providers
+import resample
+import trade_calendar
+from columnar import date_strings
+
+FIXTURES = os.path.join(ROOT, 'fixtures', 'resample')
+
+# 2023-09 到 2025-01 的休市日（周末以外）：中秋国庆、元旦、春节等
+HOLIDAYS = {
+    '2023-09-29', '2023-10-02', '2023-10-03', '2023-10-04', '2023-10-05', '2023-10-06',
+    '2024-01-01', '2024-02-09', '2024-02-12', '2024-02-13', '2024-02-14', '2024-02-15',
+    '2024-02-16', '2024-04-04', '2024-04-05', '2024-05-01', '2024-05-02', '2024-05-03',
+    '2024-06-10', '2024-09-16', '2024-09-17', '2024-10-01', '2024-10-02', '2024-10-03',
+    '2024-10-04', '2024-10-07', '2025-01-01', '2025-01-28', '2025-01-29', '2025-01-30',
+    '2025-01-31',
+}
+# 节前节后和跨年的几周日线
+DAYS = [
+    '2023-09-25', '2023-09-26', '2023-09-27', '2023-09-28',
+    '2023-10-09', '2023-10-10', '2023-10-11', '2023-10-12', '2023-10-13',
+    '2024-02-05', '2024-02-06', '2024-02-07', '2024-02-08',
+    '2024-02-19', '2024-02-20', '2024-02-21', '2024-02-22', '2024-02-23',
+    '2024-12-30', '2024-12-31', '2025-01-02', '2025-01-03',
+]
+
+
+def holiday_calendar(tmp_path):
+    days = [day.strftime('%Y-%m-%d') for day in pd.bdate_range('2023-01-01', '2025-12-31')]
+    trading = [day for day in days if day not in HOLIDAYS]
+    return trade_calendar.TradeCalendar(
+        str(tmp_path / 'calendar.db'),
+        fetch=lambda start, end: [day for day in trading if start <= day <= end])
+
+
+def daily_bars(days=DAYS):
+    # 第 i 根：开 10+i、高 12+i、低 9+i、收 11+i，合成结果可以直接手算
+    i = pd.Series(range(len(days)), dtype='float64')
+    return pd.DataFrame({'date': pd.to_datetime(days), 'open': 10 + i, 'high': 12 + i,
+                         'low': 9 + i, 'close': 11 + i})
+
+
+def rows(bars):
+    return [(date, *values) for date, values in zip(
+        date_strings(bars['date']),
+        bars[['open', 'high', 'low', 'close']].itertuples(index=False, name=None))]
+
+
+def test_weekly_bars_follow_holidays(tmp_path):
+    # 国庆、春节整周休市的周没有周线；节前最后一周以周四收盘；跨年的周合成一根
+    bars = resample.resample_bars(daily_bars(), 'w', complete_only=True,
+                                  calendar=holiday_calendar(tmp_path))
+    assert rows(bars) == [
+        ('2023-09-28', 10, 15, 9, 14),
+        ('2023-10-13', 14, 20, 13, 19),
+        ('2024-02-08', 19, 24, 18, 23),
+        ('2024-02-23', 23, 29, 22, 28),
+        ('2025-01-03', 28, 33, 27, 32),
+    ]
+
+
+def test_monthly_bars_drop_incomplete_months(tmp_path):
+    # 10 月、2 月、1 月的日线没到月末最后一个交易日，不算走完
+    bars = resample.resample_bars(daily_bars(), 'm', complete_only=True,
+                                  calendar=holiday_calendar(tmp_path))
+    assert rows(bars) == [
+        ('2023-09-28', 10, 15, 9, 14),
+        ('2024-12-31', 28, 31, 27, 30),
+    ]
+
+
+def test_week_before_holiday_is_incomplete_until_its_last_trading_day(tmp_path):
+    bars = resample.resample_bars(daily_bars(DAYS[:12]), 'w', complete_only=True,
+                                  calendar=holiday_calendar(tmp_path))
+    assert date_strings(bars['date']).tolist() == ['2023-09-28', '2023-10-13']
+
+
+def test_matches_recorded_baostock_bars(monkeypatch):
+    codes = sorted(os.path.basename(path)[:-len('.d.csv')]
+                   for path in glob.glob(os.path.join(FIXTURES, '*.d.csv')))
+    # 夹具缺失时直接失败，不能因为删掉夹具而跳过比较
+    assert codes, ("fixtures/resample 下没有录制的夹具，先运行 python bench/check_resample.py "
+                   "600519 000001 sh.000001 --fixtures fixtures/resample --record")
+    # main() 会切换全局数据源，测试结束后恢复
+    monkeypatch.setenv(providers.ENV_VAR, os.environ.get(providers.ENV_VAR, providers.DEFAULT_SPEC))
+    monkeypatch.setattr(providers, '_default_provider', None)
+    assert check_resample.main(codes + ['--fixtures', FIXTURES]) == 0
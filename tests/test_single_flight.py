@@ -0,0 +1,86 @@
+"""请求合并的测试：按上游调用计数断言，不依赖耗时"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from single_flight import SingleFlight
+
+THREADS = 8
+
+
+class Upstream:
+    """计数的上游调用：release 之前一直阻塞，保证所有请求都在它执行期间到达"""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+        self.release = threading.Event()
+
+    def __call__(self, value):
+        self.calls += 1
+        self.release.wait(10)
+        if self.error:
+            raise self.error
+        return value
+
+
+def run_threads(flight, upstream, key='sh.600519'):
+    outcomes = [None] * THREADS
+
+    def request(i):
+        try:
+            outcomes[i] = flight.do(key, upstream, 'bars')
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    # 等到其余请求都已并入正在执行的调用再放行
+    deadline = time.monotonic() + 10
+    while flight.shared < THREADS - 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    upstream.release.set()
+    for thread in threads:
+        thread.join(10)
+    return outcomes
+
+
+def test_concurrent_requests_share_one_upstream_call():
+    flight, upstream = SingleFlight(), Upstream()
+    outcomes = run_threads(flight, upstream)
+    assert upstream.calls == 1
+    assert (flight.executed, flight.shared) == (1, THREADS - 1)
+    assert outcomes == ['bars'] * THREADS
+    assert flight.in_flight() == 0
+
+
+def test_exception_reaches_every_waiter():
+    error = RuntimeError('网络错误')
+    flight, upstream = SingleFlight(), Upstream(error)
+    outcomes = run_threads(flight, upstream)
+    assert upstream.calls == 1
+    assert all(outcome is error for outcome in outcomes)
+    assert flight.in_flight() == 0
+
+
+def test_call_after_completion_fetches_again():
+    flight, upstream = SingleFlight(), Upstream()
+    upstream.release.set()
+    assert flight.do('sh.600519', upstream, 'first') == 'first'
+    assert flight.do('sh.600519', upstream, 'second') == 'second'
+    assert upstream.calls == 2
+
+    # 失败的调用也不会留下，下一次请求重新发起
+    failing = Upstream(RuntimeError('网络错误'))
+    failing.release.set()
+    with pytest.raises(RuntimeError):
+        flight.do('sz.000001', failing, 'bars')
+    failing.error = None
+    assert flight.do('sz.000001', failing, 'bars') == 'bars'
+    assert failing.calls == 2
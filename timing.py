@@ -0,0 +1,113 @@
+"""请求级别的耗时记录：trace() 包住一次查询，内部各处用 span() 记录登录、查询、解析、计算、绘图的耗时。
+当前 trace 放在 contextvars 里，提交到线程池的任务用 contextvars.copy_context().run 包一层即可继续记录。
+
+设置环境变量 FINCE_TIMING_LOG=路径 时，每个 trace 结束后追加一行 JSON 到该文件"""
+import contextlib
+import contextvars
+import datetime
+import json
+import os
+import threading
+import time
+
+LOG_ENV_VAR = 'FINCE_TIMING_LOG'
+# 分类用于区分慢在哪里：网络、解析、计算还是绘图
+CATEGORIES = [('network', '网络'), ('parse', '解析'), ('compute', '计算'), ('render', '绘图')]
+
+_current = contextvars.ContextVar('fince_trace', default=None)
+_log_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = []
+        self.total_ms = None
+
+    def add(self, name, category, start, end, fields):
+        span = {'name': name, 'category': category,
+                'start_ms': (start - self._start) * 1000, 'duration_ms': (end - start) * 1000,
+                'thread': threading.current_thread().name}
+        span.update(fields)
+        with self._lock:
+            self.spans.append(span)
+
+    def by_category(self):
+        """各分类的耗时合计；并发的查询按实际重叠后的墙钟时间计算，不重复累加"""
+        with self._lock:
+            spans = list(self.spans)
+        result = {}
+        for category, _ in CATEGORIES:
+            intervals = sorted((s['start_ms'], s['start_ms'] + s['duration_ms'])
+                               for s in spans if s['category'] == category)
+            total, cursor = 0.0, float('-inf')
+            for start, end in intervals:
+                if end > cursor:
+                    total += end - max(start, cursor)
+                    cursor = end
+            result[category] = total
+        return result
+
+    def summary(self):
+        """一行摘要，例如 '网络 120 ms · 解析 3 ms · 计算 2 ms · 绘图 85 ms（共 215 ms）'"""
+        totals = self.by_category()
+        parts = [f"{label} {totals[category]:.0f} ms" for category, label in CATEGORIES]
+        total = self.total_ms if self.total_ms is not None else (time.perf_counter() - self._start) * 1000
+        return ' · '.join(parts) + f"（共 {total:.0f} ms）"
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s['start_ms'])
+        return {'name': self.name, 'started_at': self.started_at.isoformat(timespec='milliseconds'),
+                'total_ms': self.total_ms, 'by_category': self.by_category(), 'spans': spans}
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self._start) * 1000
+        path = os.environ.get(LOG_ENV_VAR)
+        if path:
+            line = json.dumps(self.to_dict(), ensure_ascii=False)
+            with _log_lock, open(path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+@contextlib.contextmanager
+def trace(name):
+    """开始一次新的请求记录，结束时写日志（如果开启）"""
+    current = Trace(name)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        current.finish()
+
+
+@contextlib.contextmanager
+def resume(current):
+    """在另一个线程或稍后的回调里继续往已有的 trace 里记录"""
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def span(name, category='compute', **fields):
+    """记录一段耗时；没有活动的 trace 时什么也不做"""
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.add(name, category, start, time.perf_counter(), fields)
+
+
+def current_trace():
+    return _current.get()
@@ -0,0 +1,154 @@
+"""交易日历：按年向 baostock 请求交易日并落盘到本地库，内存中保存有序日期列表，
+用二分查找回答“某日之前的 N 个交易日”和“某日所在交易周”"""
+import bisect
+import datetime
+import sqlite3
+import threading
+
+import bar_cache
+import providers
+import timing
+
+# A股每年大约 240-245 个交易日，用来估算需要加载几年的日历
+TRADING_DAYS_PER_YEAR = 240
+FIRST_YEAR = 1990
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trade_dates (
+    date TEXT PRIMARY KEY
+);
+-- 每年日历的获取日期：年度结束后获取的视为定稿，否则每天最多刷新一次
+CREATE TABLE IF NOT EXISTS calendar_years (
+    year INTEGER PRIMARY KEY,
+    fetched_on TEXT NOT NULL
+);
+"""
+
+
+def _to_date(value):
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def query_trade_dates(start_date, end_date):
+    with timing.span('trade_dates', 'network'):
+        data = providers.get_provider().trade_dates(start_date, end_date)
+    if data.empty:
+        return []
+    return list(data.loc[data['is_trading_day'] == '1', 'calendar_date'])
+
+
+class TradeCalendar:
+    def __init__(self, path=bar_cache.DB_PATH, fetch=query_trade_dates):
+        self.path = path
+        self.fetch = fetch
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+            # 日历只有几千行，启动时整体读入内存
+            self._fetched = dict(self._conn.execute(
+                "SELECT year, fetched_on FROM calendar_years"))
+            self._dates = [row[0] for row in self._conn.execute(
+                "SELECT date FROM trade_dates ORDER BY date")]
+
+    def _is_fresh(self, year, today):
+        fetched_on = self._fetched.get(year)
+        if fetched_on is None:
+            return False
+        return fetched_on > f'{year}-12-31' or fetched_on == today.isoformat()
+
+    def _load_years(self, first, last):
+        today = datetime.date.today()
+        for year in range(max(first, FIRST_YEAR), last + 1):
+            if self._is_fresh(year, today):
+                continue
+            try:
+                dates = sorted(self.fetch(f'{year}-01-01', f'{year}-12-31'))
+            except Exception:
+                # 离线时沿用本地已有的旧日历，只在内存里标记，当天不再重试
+                if year in self._fetched:
+                    self._fetched[year] = today.isoformat()
+                    continue
+                raise
+            self._store(year, dates, today)
+
+    def _store(self, year, dates, today):
+        lo = bisect.bisect_left(self._dates, f'{year}-01-01')
+        hi = bisect.bisect_right(self._dates, f'{year}-12-31')
+        self._dates[lo:hi] = dates
+        self._fetched[year] = today.isoformat()
+        self._conn.execute("DELETE FROM trade_dates WHERE date BETWEEN ? AND ?",
+                           (f'{year}-01-01', f'{year}-12-31'))
+        self._conn.executemany("INSERT OR REPLACE INTO trade_dates VALUES (?)",
+                               [(date,) for date in dates])
+        self._conn.execute("INSERT OR REPLACE INTO calendar_years VALUES (?, ?)",
+                           (year, today.isoformat()))
+        self._conn.commit()
+
+    def is_trading_day(self, date):
+        day = _to_date(date)
+        with self._lock:
+            self._load_years(day.year, day.year)
+            idx = bisect.bisect_left(self._dates, day.isoformat())
+            return idx < len(self._dates) and self._dates[idx] == day.isoformat()
+
+    def trading_days(self, end_date, n):
+        """截止 end_date（含）的最近 n 个交易日，按日期升序返回"""
+        end = _to_date(end_date)
+        first = end.year - n // TRADING_DAYS_PER_YEAR
+        with self._lock:
+            self._load_years(first, end.year)
+            while True:
+                idx = bisect.bisect_right(self._dates, end.isoformat())
+                if idx >= n or first <= FIRST_YEAR:
+                    return self._dates[max(0, idx - n):idx]
+                # 节假日较多时往前多加载一年
+                first -= 1
+                self._load_years(first, first)
+
+    def previous_trading_days(self, date, n):
+        """date 之前（不含）的 n 个交易日，按日期升序返回"""
+        return self.trading_days(_to_date(date) - datetime.timedelta(days=1), n)
+
+    def between(self, start_date, end_date):
+        """start_date 到 end_date（都含）之间的交易日，按日期升序返回"""
+        start, end = _to_date(start_date), _to_date(end_date)
+        with self._lock:
+            self._load_years(start.year, end.year)
+            lo = bisect.bisect_left(self._dates, start.isoformat())
+            hi = bisect.bisect_right(self._dates, end.isoformat())
+            return self._dates[lo:hi]
+
+    def next_trading_day(self, date, max_days=40):
+        """date 之后（不含）的第一个交易日，日历里还没有时返回 None"""
+        day = _to_date(date)
+        days = self.between(day + datetime.timedelta(days=1), day + datetime.timedelta(days=max_days))
+        return days[0] if days else None
+
+    def trading_week(self, date):
+        """date 所在自然周（周一到周日）内的交易日，整周休市时返回空列表"""
+        day = _to_date(date)
+        monday = day - datetime.timedelta(days=day.weekday())
+        sunday = monday + datetime.timedelta(days=6)
+        with self._lock:
+            self._load_years(monday.year, sunday.year)
+            lo = bisect.bisect_left(self._dates, monday.isoformat())
+            hi = bisect.bisect_right(self._dates, sunday.isoformat())
+            return self._dates[lo:hi]
+
+
+_default_calendar = None
+_default_lock = threading.Lock()
+
+
+def get_calendar():
+    global _default_calendar
+    with _default_lock:
+        if _default_calendar is None:
+            _default_calendar = TradeCalendar(
+                providers.get_provider().cache_path or bar_cache.DB_PATH)
+    return _default_calendar
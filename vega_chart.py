@@ -0,0 +1,88 @@
+"""浏览器端渲染的K线与枢轴点图：服务器只生成 Vega-Lite 规格和一张紧凑的K线表，
+缩放、平移、悬停提示都在浏览器里完成，交互时不再需要服务器重新绘图"""
+import numpy as np
+import pandas as pd
+
+from columnar import date_strings
+from kline_chart import LEVEL_COLUMNS, LEVEL_STYLES, OHLC_COLUMNS, downsample
+
+# 超过这个数量的K线先在服务器端合并，长历史的数据量也保持在几十 KB
+MAX_BARS = 800
+UP_COLOR, DOWN_COLOR = 'red', 'green'
+WEEK_LABELS = {column: label for column, label, _, _ in LEVEL_STYLES}
+
+
+def chart_frame(levels, max_bars=MAX_BARS):
+    """只保留绘图需要的列，价格转成 float32，K线过多时合并"""
+    levels = downsample(levels, max_bars)
+    frame = pd.DataFrame({'date': date_strings(levels['date'])})
+    for column in OHLC_COLUMNS + LEVEL_COLUMNS:
+        frame[column] = levels[column].to_numpy(dtype=np.float32)
+    return frame
+
+
+def _week_values(week):
+    if week is None or week.empty:
+        return []
+    last = week.iloc[-1]
+    return [{'level': WEEK_LABELS[column], 'price': round(float(last[column]), 3)}
+            for column in LEVEL_COLUMNS if not np.isnan(last[column])]
+
+
+def kline_spec(title, week=None, height=400):
+    """K线（影线 + 实体）、每根K线的枢轴点短横线、最近一周的周线枢轴点水平线；
+    数据通过 st.vega_lite_chart 的 data 参数单独传入"""
+    x = {'field': 'date', 'type': 'temporal', 'timeUnit': 'yearmonthdate', 'title': None,
+         'axis': {'format': '%m-%d', 'labelOverlap': True}}
+    y = {'type': 'quantitative', 'scale': {'zero': False}, 'title': '价格'}
+    direction = {'condition': {'test': 'datum.close >= datum.open', 'value': UP_COLOR},
+                 'value': DOWN_COLOR}
+    tooltip = [{'field': 'date', 'type': 'temporal', 'title': '日期'}] + [
+        {'field': column, 'type': 'quantitative', 'format': '.2f'}
+        for column in OHLC_COLUMNS + LEVEL_COLUMNS]
+
+    layers = [
+        {
+            # 按 x 方向缩放和平移，双击复原
+            'params': [{'name': 'zoom', 'select': {'type': 'interval', 'encodings': ['x']},
+                        'bind': 'scales'}],
+            'mark': {'type': 'rule'},
+            'encoding': {'x': x, 'y': dict(y, field='low'), 'y2': {'field': 'high'},
+                         'color': direction},
+        },
+        {
+            'mark': {'type': 'bar', 'width': {'band': 0.6}},
+            'encoding': {'x': x, 'y': {'field': 'open', 'type': 'quantitative'},
+                         'y2': {'field': 'close'}, 'color': direction, 'tooltip': tooltip},
+        },
+        {
+            # 宽表在浏览器端展开成 (level, price)，传输时每根K线只有一行
+            'transform': [{'fold': LEVEL_COLUMNS, 'as': ['level', 'price']},
+                          {'filter': 'isValid(datum.price)'}],
+            'mark': {'type': 'tick', 'orient': 'horizontal', 'thickness': 1.5},
+            'encoding': {
+                'x': x, 'y': {'field': 'price', 'type': 'quantitative'},
+                'color': {'field': 'level', 'type': 'nominal', 'title': None,
+                          'scale': {'domain': LEVEL_COLUMNS,
+                                    'range': [day for _, _, day, _ in LEVEL_STYLES]},
+                          'legend': None},
+            },
+        },
+    ]
+    week_values = _week_values(week)
+    if week_values:
+        layers.append({
+            'data': {'values': week_values},
+            'mark': {'type': 'rule', 'strokeDash': [4, 3], 'color': 'purple', 'opacity': 0.6},
+            'encoding': {'y': {'field': 'price', 'type': 'quantitative'}},
+        })
+        layers.append({
+            'data': {'values': week_values},
+            'mark': {'type': 'text', 'align': 'left', 'dx': 2, 'dy': -6,
+                     'color': 'purple', 'fontSize': 10},
+            'encoding': {'x': {'value': 0}, 'y': {'field': 'price', 'type': 'quantitative'},
+                         'text': {'field': 'level'}},
+        })
+
+    return {'title': title, 'height': height, 'layer': layers,
+            'config': {'view': {'stroke': None}}}